@@ -0,0 +1,259 @@
+"""
+Shared cache API of the project.
+
+Cached values live under keys built by ``make_key`` from a name, key arguments and
+tags. Every tag has a version stored in the cache, and the versions of its tags are
+part of a key, so ``invalidate`` drops every value cached under a tag at once by moving
+its version on: the old keys are never read again and expire by themselves.
+
+Values and pages built from the data of a user depend on the version of that data, one
+per user and model, tagged ``version_tag(user_id, model)``, e.g. the duplicate contacts
+of ``app_contacts.dedup``::
+
+    groups = cached("contacts:duplicates", user.pk, fetch=find, tags=[version_tag(user.pk, Contact)])
+
+The signals of the apps call ``bump_version`` whenever a row of a user changes, as do
+the bulk operations that bypass the signals, and ``cached_page`` serves the pages of a
+view from the cache until then.
+
+``rate_limit`` limits how often a client may call a view, with fixed-window counters
+in the same cache.
+
+The cache is the Redis of docker-compose when REDIS_URL is set, shared by all
+processes, and the memory of the process otherwise. Tag versions only work when every
+process sees the same ones, so values with tags and pages are only cached with a shared
+cache, see ``versions_shared``; without one they are computed on every request.
+"""
+import functools
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse
+
+DEFAULT_TIMEOUT = 5 * 60
+PAGE_CACHE_TIMEOUT = 10 * 60
+# Longer keys are hashed, keeping them within the limits of every cache backend.
+MAX_KEY_LENGTH = 200
+
+
+def tag_key(tag):
+    return f"tag:{tag}"
+
+
+def version_tag(user_id, model):
+    return f"user:{user_id}:{model._meta.label_lower}"
+
+
+def tag_versions(tags):
+    """
+    Return the versions of tags, starting those that have none yet.
+
+    Args:
+    tags (iterable): The tag names.
+
+    Returns:
+    list: The versions, in the order of the tags.
+    """
+    tags = list(tags)
+    stored = cache.get_many([tag_key(tag) for tag in tags])
+    versions = []
+    for tag in tags:
+        version = stored.get(tag_key(tag))
+        if version is None:
+            version = time.time_ns()
+            if not cache.add(tag_key(tag), version, None):
+                # Started concurrently by another process.
+                version = cache.get(tag_key(tag), version)
+        versions.append(version)
+    return versions
+
+
+def versions_shared():
+    """
+    Whether the tag versions are shared by all processes, so that invalidating a tag
+    in one of them drops its values in all of them.
+    """
+    return settings.SHARED_CACHE
+
+
+def make_key(name, *args, tags=()):
+    """
+    Build the cache key of a value.
+
+    Args:
+    name (str): The name of the cached data, e.g. "files:counts".
+    *args: The arguments the value depends on.
+    tags (iterable, optional): The tags that invalidate the value.
+
+    Returns:
+    str: The key, valid until one of the tags is invalidated.
+    """
+    key = ":".join([name, *(str(arg) for arg in args)])
+    if tags:
+        key += ":v" + ".".join(str(version) for version in tag_versions(tags))
+    if len(key) > MAX_KEY_LENGTH:
+        key = f"{name}:{hashlib.sha256(key.encode()).hexdigest()}"
+    return key
+
+
+def cached(name, *args, fetch, timeout=DEFAULT_TIMEOUT, tags=()):
+    """
+    Return a cached value, computing and caching it on a miss. Values with tags are
+    only cached when the versions are shared, see ``versions_shared``.
+
+    Args:
+    name (str): The name of the cached data.
+    *args: The arguments the value depends on.
+    fetch (callable): Computes the value.
+    timeout (int, optional): Seconds the value is cached for; None caches it until invalidated.
+    tags (iterable, optional): The tags that invalidate the value.
+
+    Returns:
+    The cached or computed value.
+    """
+    if tags and not versions_shared():
+        return fetch()
+    return cache.get_or_set(make_key(name, *args, tags=tags), fetch, timeout)
+
+
+def invalidate(*tags):
+    """
+    Drop every value cached under any of the tags.
+    """
+    if tags:
+        cache.set_many({tag_key(tag): time.time_ns() for tag in tags}, None)
+
+
+def bump_version(user_id, *models):
+    """
+    Move the versions of a user's data in the models on, right away for the rest of the
+    current transaction and again once it commits, as other requests may cache the
+    uncommitted data under the first new versions meanwhile.
+
+    Args:
+    user_id (int): The owner of the changed rows.
+    *models: The changed models.
+    """
+    tags = [version_tag(user_id, model) for model in models]
+    invalidate(*tags)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: invalidate(*tags))
+
+
+def cached_page(name, *models, timeout=PAGE_CACHE_TIMEOUT):
+    """
+    Decorator caching the pages of a view per user, URL and version of the user's data
+    in the models.
+
+    Only GET and HEAD requests of signed-in users are cached, and only when the versions
+    are shared, see ``versions_shared``. The forms of the pages
+    carry CSRF tokens derived from the CSRF cookie, so pages are cached per cookie, and
+    not at all for requests without a valid one. Requests with pending messages are rendered
+    as usual, so the messages are shown once.
+
+    Args:
+    name (str): The name of the page.
+    *models: The models whose data the page shows.
+    timeout (int, optional): Seconds the pages are cached for.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            csrf_secret = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+            if (
+                not versions_shared()
+                or request.method not in ("GET", "HEAD")
+                or not request.user.is_authenticated
+                or not csrf_secret
+                or len(messages.get_messages(request))
+            ):
+                return view(request, *args, **kwargs)
+
+            user_id = request.user.pk
+            variant = hashlib.sha256(f"{csrf_secret}:{request.get_full_path()}".encode()).hexdigest()
+            key = make_key(f"page:{name}", user_id, variant, tags=[version_tag(user_id, model) for model in models])
+            page = cache.get(key)
+            if page is not None:
+                content, content_type = page
+                return HttpResponse(content, content_type=content_type)
+
+            response = view(request, *args, **kwargs)
+            if (
+                response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and request.META.get("CSRF_COOKIE") == csrf_secret
+            ):
+                cache.set(key, (response.content, response["Content-Type"]), timeout)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def client_key(request):
+    """
+    Identify the client of a request: the user when signed in, the address otherwise.
+    """
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def hit(name, limit, period):
+    """
+    Count a call in the current window of a rate limit.
+
+    Args:
+    name (str): The limit and the client, e.g. "signin:ip:127.0.0.1".
+    limit (int): The most calls per window.
+    period (int): The length of the windows in seconds.
+
+    Returns:
+    int: 0 if the call is allowed, the seconds until the next window otherwise.
+    """
+    now = time.time()
+    key = f"ratelimit:{name}:{int(now // period)}"
+    cache.add(key, 0, period)
+    try:
+        calls = cache.incr(key)
+    except ValueError:
+        # The window expired between add and incr.
+        cache.set(key, 1, period)
+        calls = 1
+    return 0 if calls <= limit else int(period - now % period) + 1
+
+
+def rate_limit(name, limit, period, methods=("POST",), key=client_key):
+    """
+    Decorator answering the calls of a view beyond ``limit`` per ``period`` seconds and
+    client with 429 Too Many Requests.
+
+    Args:
+    name (str): The name of the limit.
+    limit (int): The most calls per window.
+    period (int): The length of the windows in seconds.
+    methods (tuple, optional): The limited HTTP methods.
+    key (callable, optional): Identifies the client of a request.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = hit(f"{name}:{key(request)}", limit, period)
+                if retry_after:
+                    response = HttpResponse("Забагато запитів. Спробуйте пізніше.", status=429)
+                    response["Retry-After"] = str(retry_after)
+                    return response
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,94 @@
+"""
+Migration operations that only touch the database on a given backend.
+
+The project runs on PostgreSQL, but local runs and tests may use SQLite. Indexes,
+extensions and triggers that only exist on one backend are wrapped in
+``VendorOperation`` so the migration state stays the same everywhere while the
+schema change is skipped where it cannot be applied.
+
+``AddIndexConcurrently`` and ``RemoveIndexConcurrently`` build or drop indexes without
+locking writes on PostgreSQL and fall back to the plain operations elsewhere. Like
+the PostgreSQL originals they need a migration with ``atomic = False``.
+"""
+from django.contrib.postgres import operations as postgres_operations
+from django.db.migrations.operations import AddIndex, RemoveIndex
+from django.db.migrations.operations.base import Operation
+
+
+class VendorOperation(Operation):
+    """
+    Run the wrapped operation against the database only on the given vendor.
+
+    Attributes:
+    vendor (str): The ``connection.vendor`` the operation applies to, e.g. "postgresql".
+    operation (Operation): The wrapped migration operation.
+    """
+
+    def __init__(self, vendor, operation):
+        self.vendor = vendor
+        self.operation = operation
+
+    def deconstruct(self):
+        return self.__class__.__qualname__, [self.vendor, self.operation], {}
+
+    @property
+    def reversible(self):
+        return self.operation.reversible
+
+    @property
+    def atomic(self):
+        return getattr(self.operation, "atomic", True)
+
+    def state_forwards(self, app_label, state):
+        self.operation.state_forwards(app_label, state)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            self.operation.database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            self.operation.database_backwards(app_label, schema_editor, from_state, to_state)
+
+    def describe(self):
+        return f"{self.operation.describe()} (on {self.vendor} only)"
+
+    @property
+    def migration_name_fragment(self):
+        return self.operation.migration_name_fragment
+
+
+def postgres_only(operation):
+    return VendorOperation("postgresql", operation)
+
+
+def sqlite_only(operation):
+    return VendorOperation("sqlite", operation)
+
+
+class AddIndexConcurrently(postgres_operations.AddIndexConcurrently):
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class RemoveIndexConcurrently(postgres_operations.RemoveIndexConcurrently):
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            RemoveIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            RemoveIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
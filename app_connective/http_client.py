@@ -0,0 +1,155 @@
+"""
+Shared HTTP client for the outbound integrations of the project.
+
+All upstream calls go through one ``requests.Session`` with a pooled adapter, so
+connections to a host are kept alive and reused. Every request gets a default
+connect/read timeout and idempotent requests are retried with exponential backoff.
+Conditional requests revalidate the ``ETag``/``Last-Modified`` validators and the body of
+the last response saved with ``save_validators``, so an unchanged upstream page costs a
+304 instead of a download. Callers save them only once the response has been processed,
+so a page that failed to be processed is downloaded and processed again next time.
+
+Async code uses ``async_client``, an ``httpx.AsyncClient`` with the same timeouts, to be
+used as ``async with async_client() as http:`` so its connections are closed when done.
+"""
+import hashlib
+import logging
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = (3.05, 10)
+VALIDATORS_TIMEOUT = 7 * 24 * 60 * 60
+
+
+class HttpClient:
+    """
+    Pooled HTTP client with default timeouts, retries and conditional GETs.
+
+    Attributes:
+    timeout (tuple): Default (connect, read) timeout in seconds.
+    session (requests.Session): The session holding the per-host connection pools.
+    """
+
+    def __init__(self, timeout=None, retries=3, backoff_factor=0.5, pool_connections=10, pool_maxsize=10):
+        self.timeout = timeout or getattr(settings, "HTTP_CLIENT_TIMEOUT", DEFAULT_TIMEOUT)
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url, params=None, conditional=False, **kwargs):
+        """
+        Send a GET request.
+
+        Args:
+        url (str): The URL to request.
+        params (dict, optional): The query string parameters.
+        conditional (bool, optional): Revalidate the last stored response with its validators.
+        **kwargs: Other arguments of ``requests.Session.get``.
+
+        Returns:
+        requests.Response: The response. A 304 to a conditional request is returned as the
+        stored 200 response with ``from_cache`` set to True. Other responses to conditional
+        requests are not stored until passed to ``save_validators``.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        if not conditional:
+            return self.session.get(url, params=params, **kwargs)
+
+        key = self.validators_key(url, params)
+        stored = cache.get(key)
+        headers = dict(kwargs.pop("headers", None) or {})
+        if stored:
+            if stored["etag"]:
+                headers["If-None-Match"] = stored["etag"]
+            if stored["last_modified"]:
+                headers["If-Modified-Since"] = stored["last_modified"]
+
+        response = self.session.get(url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and stored:
+            return self.stored_response(response, stored)
+
+        response.from_cache = False
+        response.validators_key = key
+        return response
+
+    @staticmethod
+    def save_validators(response):
+        """
+        Store the validators and the body of a response to a conditional request, to be
+        revalidated by the next one.
+
+        Args:
+        response (requests.Response): A response returned by ``get`` with ``conditional=True``.
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.from_cache or response.status_code != 200 or not (etag or last_modified):
+            return
+        cache.set(
+            response.validators_key,
+            {
+                "etag": etag,
+                "last_modified": last_modified,
+                "content": response.content,
+                "encoding": response.encoding,
+                "content_type": response.headers.get("Content-Type"),
+            },
+            VALIDATORS_TIMEOUT,
+        )
+
+    @staticmethod
+    def validators_key(url, params):
+        prepared = requests.Request("GET", url, params=params).prepare()
+        return "http_client:" + hashlib.sha256(prepared.url.encode()).hexdigest()
+
+    @staticmethod
+    def stored_response(not_modified, stored):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.headers.update(not_modified.headers)
+        if stored["content_type"]:
+            response.headers["Content-Type"] = stored["content_type"]
+        response.encoding = stored["encoding"]
+        response._content = stored["content"]
+        response.from_cache = True
+        logger.debug("%s not modified", response.url)
+        return response
+
+
+client = HttpClient()
+
+def async_client():
+    """
+    Create an async HTTP client with the default timeouts and retries.
+
+    A new client is created for every upstream call and closed with ``async with``
+    right after it. The async providers refresh in background tasks that may outlive
+    the request and the event loop they started in, so a client shared by a loop or a
+    request would either be closed under them or never be closed. They call every host
+    minutes apart, so there is no open connection worth keeping between calls anyway.
+
+    Returns:
+    httpx.AsyncClient: The client.
+    """
+    connect, read = getattr(settings, "HTTP_CLIENT_TIMEOUT", DEFAULT_TIMEOUT)
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(read, connect=connect),
+        transport=httpx.AsyncHTTPTransport(retries=2),
+    )
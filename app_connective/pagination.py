@@ -0,0 +1,216 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of ``OFFSET n LIMIT k`` every page continues from the ordering values of the
+last row of the previous page, e.g. ``WHERE name >= %s AND (name > %s OR (name = %s
+AND id > %s)) ORDER BY name, id``. The bound on the leading field lets an index on the
+ordering fields start reading at the cursor, so deep pages are as cheap as the first
+one, and rows inserted meanwhile do not shift the pages. The ordering has to end with a
+unique field (normally ``id``) and its fields must not be NULL.
+
+Page tokens are opaque, URL-safe strings; a tampered token just restarts from the
+first page.
+"""
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+
+COUNT_CACHE_TIMEOUT = 60
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    JSON encoder keeping the microseconds that DjangoJSONEncoder drops, so no row
+    between two timestamps of the same millisecond is skipped.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPage:
+    """
+    A page of a keyset paginated queryset.
+
+    Attributes:
+    object_list (list): The rows of the page.
+    has_next (bool): Whether there is a page after this one.
+    has_previous (bool): Whether there is a page before this one.
+    next_cursor (str): Token of the next page, or None.
+    previous_cursor (str): Token of the previous page, or None.
+    count (int): Total number of rows when the paginator was asked to count them, else None.
+    next_url (str): Query string of the next page, set by ``paginate``.
+    previous_url (str): Query string of the previous page, set by ``paginate``.
+    """
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor, count=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.count = count
+        self.next_url = None
+        self.previous_url = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class CursorPaginator:
+    """
+    Keyset paginator over an ordered queryset.
+
+    Attributes:
+    queryset (QuerySet): The rows to paginate.
+    ordering (tuple): Field names, optionally prefixed with "-", ending with a unique field.
+    per_page (int): Rows per page.
+    count (str): None to skip counting, "exact" for COUNT(*), "cached" for a COUNT(*) cached
+    for a minute, or "estimate" for the PostgreSQL planner estimate.
+    """
+
+    def __init__(self, queryset, ordering=None, per_page=10, count=None):
+        self.ordering = tuple(ordering or queryset.query.order_by)
+        if not self.ordering:
+            raise ValueError("CursorPaginator needs an ordered queryset.")
+        self.queryset = queryset.order_by(*self.ordering)
+        self.per_page = per_page
+        self.count = count
+
+    def page(self, cursor=None):
+        """
+        Return the page identified by a token.
+
+        Args:
+        cursor (str, optional): A next or previous token of another page. Defaults to the first page.
+
+        Returns:
+        CursorPage: The page.
+        """
+        direction, values = self.decode(cursor)
+        queryset = self.queryset
+        if direction == "previous":
+            queryset = queryset.order_by(*(self.reverse(field) for field in self.ordering))
+        if values is not None:
+            queryset = queryset.filter(self.after(values, reverse=direction == "previous"))
+
+        rows = list(queryset[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if direction == "previous":
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        return CursorPage(
+            rows,
+            has_next=has_next,
+            has_previous=has_previous,
+            next_cursor=self.encode("next", rows[-1]) if has_next and rows else None,
+            previous_cursor=self.encode("previous", rows[0]) if has_previous and rows else None,
+            count=self.total(),
+        )
+
+    def after(self, values, reverse=False):
+        """
+        Build the filter selecting the rows that come after the given ordering values.
+
+        The rows after (v0, v1) are ``name > v0 OR (name = v0 AND id > v1)``. Databases
+        cannot seek an index to that OR on their own, so it is combined with the bound
+        ``name >= v0`` on the leading field, which an index starting with it turns into a
+        range scan beginning at the cursor.
+        """
+        condition = Q()
+        for position, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            descending = field.startswith("-") != reverse
+            step = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[position]})
+            for previous_field, value in zip(self.ordering[:position], values):
+                step &= Q(**{previous_field.lstrip("-"): value})
+            condition |= step
+        leading = self.ordering[0]
+        descending = leading.startswith("-") != reverse
+        return Q(**{f"{leading.lstrip('-')}__{'lte' if descending else 'gte'}": values[0]}) & condition
+
+    def encode(self, direction, row):
+        values = [getattr(row, field.lstrip("-")) for field in self.ordering]
+        data = json.dumps([direction, values], cls=CursorEncoder).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+    def decode(self, cursor):
+        if not cursor:
+            return "next", None
+        try:
+            data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            direction, values = json.loads(data)
+        except (binascii.Error, ValueError, TypeError):
+            return "next", None
+        if direction not in ("next", "previous") or len(values) != len(self.ordering):
+            return "next", None
+        return direction, [self.to_python(field, value) for field, value in zip(self.ordering, values)]
+
+    def to_python(self, field, value):
+        name = field.lstrip("-")
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field.to_python(value)
+        return self.queryset.model._meta.get_field(name).to_python(value)
+
+    @staticmethod
+    def reverse(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    def total(self):
+        if self.count is None:
+            return None
+        queryset = self.queryset.order_by()
+        if self.count == "estimate" and connection.vendor == "postgresql":
+            plan = json.loads(queryset.explain(format="json"))
+            return plan[0]["Plan"]["Plan Rows"]
+        if self.count in ("cached", "estimate"):
+            sql, params = queryset.query.sql_with_params()
+            key = "pagination:count:" + hashlib.sha256(f"{sql}{params}".encode()).hexdigest()
+            return cache.get_or_set(key, queryset.count, COUNT_CACHE_TIMEOUT)
+        return queryset.count()
+
+
+def paginate(request, queryset, ordering=None, per_page=10, count=None):
+    """
+    Return the page of a queryset requested by the ``cursor`` GET parameter.
+
+    The ``next_url`` and ``previous_url`` of the page keep the other GET parameters,
+    such as the search query.
+
+    Args:
+    request (HttpRequest): The request object.
+    queryset (QuerySet): The rows to paginate.
+    ordering (tuple, optional): The keyset ordering. Defaults to the ordering of the queryset.
+    per_page (int, optional): Rows per page. Defaults to 10.
+    count (str, optional): The counting mode of CursorPaginator.
+
+    Returns:
+    CursorPage: The requested page.
+    """
+    page = CursorPaginator(queryset, ordering, per_page, count).page(request.GET.get("cursor"))
+    for attribute, cursor in (("next_url", page.next_cursor), ("previous_url", page.previous_cursor)):
+        if cursor:
+            params = request.GET.copy()
+            params["cursor"] = cursor
+            setattr(page, attribute, "?" + params.urlencode())
+    return page
@@ -49,6 +49,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     "app_main",
     "users",
     "app_contacts",
@@ -91,6 +92,11 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'app_connective.wsgi.application'
+ASGI_APPLICATION = 'app_connective.asgi.application'
+
+# Serve the main page (app_main root) with main_async instead of main, for ASGI servers
+# such as daphne. The news feed is async either way.
+ASYNC_VIEWS = env.bool("ASYNC_VIEWS", default=False)
 
 
 # Database
@@ -146,6 +152,42 @@ USE_I18N = True
 USE_TZ = True
 
 
+# Cache
+# The Redis service of docker-compose when REDIS_URL is set (e.g. redis://localhost:6379/0),
+# shared by all processes; the memory of each process otherwise, e.g. in development and tests
+
+REDIS_URL = env("REDIS_URL", default="")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "connective",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "connective",
+        }
+    }
+
+# The cached pages and fragments of a user's data are dropped by moving the versions of
+# that data on, which every process has to see: a per-process cache would keep serving
+# the old versions in the processes that did not make the change. They are only cached
+# with a shared cache, i.e. Redis, or when SHARED_CACHE is set for a single process
+SHARED_CACHE = env.bool("SHARED_CACHE", default=bool(REDIS_URL))
+
+# Sessions are read from the cache and written through to the database. Without Redis
+# they stay in the database, as a per-process cache would keep serving a session that
+# another process ended
+SESSION_ENGINE = env(
+    "SESSION_ENGINE",
+    default="django.contrib.sessions.backends.cached_db" if REDIS_URL else "django.contrib.sessions.backends.db",
+)
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.0/howto/static-files/
 
@@ -153,6 +195,17 @@ STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
+# Seconds after which the main page providers are refreshed in the background
+DASHBOARD_CACHE_TTL = {
+    "ip": 60 * 60,
+    "geo": 24 * 60 * 60,
+    "weather": 10 * 60,
+    "exchange": 60 * 60,
+}
+
+# Default (connect, read) timeout of the shared outbound HTTP client
+HTTP_CLIENT_TIMEOUT = (3.05, 10)
+
 LOGIN_URL = "/users/signin"
 LOGIN_REDIRECT_URL = "/"
 
@@ -170,4 +223,29 @@ CLOUDINARY_STORAGE = {
     "API_SECRET": env("CLOUDINARY_API_SECRET"),
 }
 
-DEFAULT_FILE_STORAGE = "cloudinary_storage.storage.RawMediaCloudinaryStorage"
+# Overridable, e.g. with "django.core.files.storage.FileSystemStorage" for local runs
+DEFAULT_FILE_STORAGE = env(
+    "DEFAULT_FILE_STORAGE", default="app_files.storage.ChunkedRawMediaCloudinaryStorage"
+)
+
+# User file uploads: largest accepted file, largest chunk of a resumable upload, the
+# local directory that stages uploads before they are sent to the storage, and the
+# hours after which unfinished resumable uploads are discarded
+FILE_UPLOAD_MAX_SIZE = env.int("FILE_UPLOAD_MAX_SIZE", default=1024 * 1024 * 1024)
+FILE_UPLOAD_CHUNK_MAX_SIZE = env.int("FILE_UPLOAD_CHUNK_MAX_SIZE", default=8 * 1024 * 1024)
+FILE_UPLOAD_STAGING_DIR = env("FILE_UPLOAD_STAGING_DIR", default=str(BASE_DIR / "upload_staging"))
+FILE_UPLOAD_SESSION_HOURS = env.int("FILE_UPLOAD_SESSION_HOURS", default=24)
+
+# How user files are sent: "django" streams them from the app, "x-accel-redirect"
+# hands them to nginx through an internal location at FILE_SERVE_ACCEL_PREFIX that
+# aliases MEDIA_ROOT, "x-sendfile" hands them to Apache/lighttpd
+FILE_SERVE_MODE = env("FILE_SERVE_MODE", default="django")
+FILE_SERVE_ACCEL_PREFIX = env("FILE_SERVE_ACCEL_PREFIX", default="/protected-media/")
+
+# Whether processes delete the stored files queued by a transaction in a background
+# thread once it commits; the process_storage_deletions command deletes the rest
+STORAGE_CLEANUP_ON_COMMIT = env.bool("STORAGE_CLEANUP_ON_COMMIT", default=True)
+
+# Processes rendering thumbnails and video posters after uploads; 0 renders them in
+# the request once the upload is committed
+THUMBNAIL_WORKERS = env.int("THUMBNAIL_WORKERS", default=2)
@@ -0,0 +1,43 @@
+"""
+Helpers shared by the test suites of the apps.
+"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class ConstantQueriesMixin:
+    """
+    Test case mixin checking that a page runs the same number of queries however many
+    rows it shows, e.g. because it loads related rows with select_related() or
+    prefetch_related() instead of one query per row.
+
+    Test cases using it implement ``create_rows(count)``, which adds ``count`` more rows
+    of the kind the page lists for the logged in user.
+    """
+
+    few_rows = 2
+    many_rows = 20
+
+    def create_rows(self, count):
+        raise NotImplementedError
+
+    def assertConstantQueries(self, url, params=None):
+        """
+        Load a page with a few rows and again with many more, expecting as many queries.
+
+        Args:
+        url (str): The URL of the page.
+        params (dict, optional): The GET parameters.
+
+        Returns:
+        HttpResponse: The response with many rows.
+        """
+        self.create_rows(self.few_rows)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+
+        self.create_rows(self.many_rows)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
@@ -0,0 +1,255 @@
+"""
+Birthday lookups.
+
+Contacts store the day of the year of their birthday, counted in a leap year
+(``Contact.birthday_ordinal``), next to an index on (user, birthday_ordinal). A window
+of dates becomes a range of ordinals, or two ranges when it wraps past December 31,
+so a window costs one indexed query whatever months and years it spans. In years
+without February 29 those birthdays are celebrated on February 28.
+
+The birthday calendar groups the birthdays of a range of months by day in one query.
+Rendered months are cached per user under the version of the user's contacts, which
+the contact signals move on whenever a contact changes (see ``app_connective.cache``).
+"""
+import calendar
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from app_connective.cache import tag_versions, version_tag, versions_shared
+from .models import LEAP_YEAR, Contact, birthday_ordinal
+from .selectors import BIRTHDAY_FIELDS
+
+Birthday = namedtuple("Birthday", ["contact", "date", "age"])
+
+CALENDAR_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def occurrence(birthdate, year):
+    """
+    Return the date a birthday is celebrated in a year.
+    """
+    if birthdate.month == 2 and birthdate.day == 29 and not calendar.isleap(year):
+        return date(year, 2, 28)
+    return birthdate.replace(year=year)
+
+
+def occurrences(birthdate, start, end):
+    """
+    Yield the dates a birthday is celebrated from start to end, from the year of birth on.
+    """
+    for year in range(max(start.year, birthdate.year), end.year + 1):
+        day = occurrence(birthdate, year)
+        if start <= day <= end:
+            yield day
+
+
+def ordinal_range(start, end):
+    """
+    Build the filter selecting the birthdays celebrated from start to end, both included.
+
+    Args:
+    start (date): The first day of the window.
+    end (date): The last day of the window, less than a year after start.
+
+    Returns:
+    Q: The filter on ``birthday_ordinal``.
+    """
+    first = birthday_ordinal(start)
+    last = birthday_ordinal(end)
+    # February 29 birthdays fall on February 28 in common years.
+    if end.month == 2 and end.day == 28 and not calendar.isleap(end.year):
+        last = birthday_ordinal(date(LEAP_YEAR, 2, 29))
+    if first <= last:
+        return Q(birthday_ordinal__gte=first, birthday_ordinal__lte=last)
+    return Q(birthday_ordinal__gte=first) | Q(birthday_ordinal__lte=last)
+
+
+def in_window(user, start, end):
+    """
+    Return the user's contacts with a birthday from start to end.
+    """
+    if end < start:
+        return Contact.objects.none()
+    contacts = Contact.objects.filter(user=user, birthdate__isnull=False).only(*BIRTHDAY_FIELDS)
+    if (end - start).days < 365:
+        contacts = contacts.filter(ordinal_range(start, end))
+    return contacts
+
+
+def birthdays_between(user, start, end):
+    """
+    Return the birthdays of the user's contacts celebrated in a window of dates.
+
+    Args:
+    user (User): The owner of the contacts.
+    start (date): The first day of the window.
+    end (date): The last day of the window, both included.
+
+    Returns:
+    list: Birthday tuples of (contact, date celebrated, age turned), in date order.
+    """
+    birthdays = [
+        Birthday(contact, day, day.year - contact.birthdate.year)
+        for contact in in_window(user, start, end)
+        for day in occurrences(contact.birthdate, start, end)
+    ]
+    birthdays.sort(key=lambda birthday: (birthday.date, birthday.contact.name, birthday.contact.id))
+    return birthdays
+
+
+def next_days(user, days, today=None):
+    """
+    Return the birthdays from today through the next days.
+
+    Args:
+    user (User): The owner of the contacts.
+    days (int): The length of the window, 1 for today only.
+    today (date, optional): The first day of the window. Defaults to today.
+
+    Returns:
+    list: Birthday tuples in date order.
+    """
+    today = today or date.today()
+    return birthdays_between(user, today, today + timedelta(days=days - 1))
+
+
+def this_week(user, today=None):
+    """
+    Return the birthdays from Monday through Sunday of the current week.
+    """
+    today = today or date.today()
+    monday = today - timedelta(days=today.weekday())
+    return birthdays_between(user, monday, monday + timedelta(days=6))
+
+
+def this_month(user, today=None):
+    """
+    Return the birthdays of the current month.
+    """
+    today = today or date.today()
+    last_day = calendar.monthrange(today.year, today.month)[1]
+    return birthdays_between(user, today.replace(day=1), today.replace(day=last_day))
+
+
+def buckets(birthdays, today=None):
+    """
+    Split birthdays into the ones already passed, today's and the upcoming ones.
+
+    Args:
+    birthdays (list): Birthday tuples in date order.
+    today (date, optional): The day to split at. Defaults to today.
+
+    Returns:
+    dict: Lists of Birthday tuples under "passed", "today" and "upcoming".
+    """
+    today = today or date.today()
+    result = {"passed": [], "today": [], "upcoming": []}
+    for birthday in birthdays:
+        if birthday.date < today:
+            result["passed"].append(birthday)
+        elif birthday.date == today:
+            result["today"].append(birthday)
+        else:
+            result["upcoming"].append(birthday)
+    return result
+
+
+def birthdays_by_day(user, start, end):
+    """
+    Group the birthdays celebrated from start to end by date, reading only the fields
+    the calendar shows.
+
+    Args:
+    user (User): The owner of the contacts.
+    start (date): The first day of the window.
+    end (date): The last day of the window, both included.
+
+    Returns:
+    dict: Lists of {"id", "name", "age"} dicts by date, ordered by name.
+    """
+    days = defaultdict(list)
+    contacts = in_window(user, start, end).values("id", "name", "birthdate")
+    # Sorted here, so the planner is free to walk the birthday index instead of the name one.
+    for contact in sorted(contacts, key=lambda contact: (contact["name"], contact["id"])):
+        for day in occurrences(contact["birthdate"], start, end):
+            days[day].append(
+                {"id": contact["id"], "name": contact["name"], "age": day.year - contact["birthdate"].year}
+            )
+    return days
+
+
+def month_weeks(year, month, days, today):
+    """
+    Lay out a month as weeks from Monday to Sunday.
+
+    Args:
+    year (int): The year.
+    month (int): The month.
+    days (dict): Birthdays by date, as returned by ``birthdays_by_day``.
+    today (date): The day highlighted as today.
+
+    Returns:
+    list: Weeks of seven cells, None outside the month, else a dict with the "day" number,
+    whether it is "today" or "passed", and its "birthdays".
+    """
+    weeks = []
+    for week in calendar.Calendar().monthdatescalendar(year, month):
+        weeks.append(
+            [
+                {"day": day.day, "today": day == today, "passed": day < today, "birthdays": days.get(day, [])}
+                if day.month == month
+                else None
+                for day in week
+            ]
+        )
+    return weeks
+
+
+def calendar_version(user_id):
+    return tag_versions([version_tag(user_id, Contact)])[0]
+
+
+def calendar_months(user, year, month, count, render_month, today=None):
+    """
+    Return consecutive rendered calendar months, from the cache where possible. Without
+    a shared cache nothing is cached, see ``app_connective.cache.versions_shared``.
+
+    The months missing from the cache are built from a single query over their span.
+
+    Args:
+    user (User): The owner of the contacts.
+    year (int): The year of the first month.
+    month (int): The first month.
+    count (int): The number of months.
+    render_month (callable): Renders the HTML of a month from its first day and weeks.
+    today (date, optional): The day highlighted as today. Defaults to today.
+
+    Returns:
+    list: (first day of the month, HTML) pairs.
+    """
+    today = today or date.today()
+    firsts = []
+    for offset in range(count):
+        index = year * 12 + month - 1 + offset
+        firsts.append(date(index // 12, index % 12 + 1, 1))
+
+    shared = versions_shared()
+    version = calendar_version(user.pk) if shared else None
+    keys = {first: f"contacts:calendar:{user.pk}:{version}:{first:%Y-%m}:{today}" for first in firsts}
+    cached = cache.get_many(keys.values()) if shared else {}
+    missing = [first for first in firsts if keys[first] not in cached]
+    if missing:
+        last = missing[-1]
+        end = last.replace(day=calendar.monthrange(last.year, last.month)[1])
+        days = birthdays_by_day(user, missing[0], end)
+        rendered = {
+            keys[first]: render_month(first, month_weeks(first.year, first.month, days, today))
+            for first in missing
+        }
+        if shared:
+            cache.set_many(rendered, CALENDAR_CACHE_TIMEOUT)
+        cached.update(rendered)
+    return [(first, cached[keys[first]]) for first in firsts]
@@ -0,0 +1,279 @@
+"""
+Duplicate contact detection and merging.
+
+Contacts of a user are duplicates when they share a phone number or an email once both
+are normalized: phones to E.164, e.g. "+380501234567" for "050 123-45-67", and emails
+to lower case without the dots and +tags Gmail ignores. Contacts with the same name and
+surname, ignoring case, are duplicates too unless their birthdates differ.
+
+Rather than comparing every pair of contacts, each contact is filed into blocks by its
+keys: its normalized phones, its email and its full name. Contacts sharing a phone or
+an email block are duplicates without further checks, and only the contacts in a name
+block are compared pairwise, so the work grows with the number of contacts instead of
+its square. Blocks of more than MAX_BLOCK_SIZE contacts, like the switchboard number of
+a whole company, say nothing about duplicates and are skipped. The duplicate pairs are
+joined into groups with a disjoint-set forest.
+
+``merge_contacts`` folds the duplicates of a group into one of its contacts.
+"""
+import re
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from app_connective.cache import bump_version, cached, version_tag
+from .models import Address, Contact
+
+DEFAULT_COUNTRY_CODE = "380"
+MAX_BLOCK_SIZE = 20
+MAX_MERGE_SIZE = 100
+DUPLICATES_CACHE_TIMEOUT = 60 * 60
+PHONE_FIELDS = ("mobile_phone", "work_phone", "home_phone")
+DEDUP_FIELDS = ("id", "name", "surname", "email", *PHONE_FIELDS, "birthdate")
+# Fields a merged contact takes from its duplicates when it has no value of its own.
+MERGED_FIELDS = ("surname", "email", "birthdate", "facebook", "instagram", "tiktok")
+GMAIL_DOMAINS = {"gmail.com", "googlemail.com"}
+NON_DIGITS_RE = re.compile(r"\D")
+
+
+class MergeError(ValueError):
+    pass
+
+
+def normalize_phone(phone, country_code=DEFAULT_COUNTRY_CODE):
+    """
+    Return a phone number in E.164 form.
+
+    Numbers with a + or the 00 prefix are international; national numbers starting
+    with the trunk prefix 0 get the country code.
+
+    Args:
+    phone (str): The phone number as entered, e.g. "+380(50)123-4567" or "050 123 45 67".
+    country_code (str, optional): The country code of national numbers.
+
+    Returns:
+    str: The number, e.g. "+380501234567", or None if it has too few or too many digits.
+    """
+    if not phone:
+        return None
+    digits = NON_DIGITS_RE.sub("", phone)
+    if not phone.lstrip().startswith("+"):
+        if digits.startswith("00"):
+            digits = digits[2:]
+        elif digits.startswith("0"):
+            digits = country_code + digits[1:]
+    if not 8 <= len(digits) <= 15:
+        return None
+    return f"+{digits}"
+
+
+def normalize_email(email):
+    """
+    Return an email in canonical form: lower case, and for Gmail without the dots and
+    the +tag of the local part, which Gmail ignores.
+    """
+    if not email or "@" not in email:
+        return None
+    local, _, domain = email.strip().lower().rpartition("@")
+    if domain in GMAIL_DOMAINS:
+        local = local.split("+", 1)[0].replace(".", "")
+        domain = "gmail.com"
+    return f"{local}@{domain}"
+
+
+def name_key(name, surname):
+    """
+    Return the full name ignoring case and spacing, or None without a surname, as a
+    first name alone is too common to tell duplicates.
+    """
+    if not name or not surname:
+        return None
+    return " ".join(f"{name} {surname}".casefold().split())
+
+
+def blocking_keys(contact):
+    """
+    Yield the blocks a contact belongs to.
+
+    Args:
+    contact (dict): The DEDUP_FIELDS of the contact.
+
+    Yields:
+    tuple: The kind of the block, "phone", "email" or "name", and its key.
+    """
+    phones = {normalize_phone(contact[field]) for field in PHONE_FIELDS}
+    for phone in phones - {None}:
+        yield "phone", phone
+    email = normalize_email(contact["email"])
+    if email:
+        yield "email", email
+    name = name_key(contact["name"], contact["surname"])
+    if name:
+        yield "name", name
+
+
+def block_contacts(contacts):
+    """
+    File contacts into blocks by their keys.
+
+    Args:
+    contacts (iterable): Dicts of the DEDUP_FIELDS of the contacts.
+
+    Returns:
+    dict: The (ID, birthdate) of the contacts in every block, by block.
+    """
+    blocks = defaultdict(list)
+    for contact in contacts:
+        for key in blocking_keys(contact):
+            blocks[key].append((contact["id"], contact["birthdate"]))
+    return blocks
+
+
+class DisjointSet:
+    """
+    Disjoint-set forest with path compression, whose roots are the smallest members.
+    """
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        root = self.parent.setdefault(item, item)
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, first, second):
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+    def groups(self):
+        """
+        Return the sets of more than one member, each sorted, ordered by their smallest member.
+        """
+        groups = defaultdict(list)
+        for item in self.parent:
+            groups[self.find(item)].append(item)
+        return [sorted(group) for _, group in sorted(groups.items()) if len(group) > 1]
+
+
+def duplicate_groups(blocks, max_block_size=MAX_BLOCK_SIZE):
+    """
+    Join the contacts of the blocks into groups of duplicates.
+
+    Args:
+    blocks (dict): The blocks, as returned by ``block_contacts``.
+    max_block_size (int, optional): Larger blocks are skipped.
+
+    Returns:
+    list: The groups, lists of contact IDs.
+    """
+    sets = DisjointSet()
+    for (kind, _), members in blocks.items():
+        if not 1 < len(members) <= max_block_size:
+            continue
+        if kind != "name":
+            for contact_id, _ in members[1:]:
+                sets.union(members[0][0], contact_id)
+            continue
+        for index, (first, first_birthdate) in enumerate(members):
+            for second, second_birthdate in members[index + 1 :]:
+                if not (first_birthdate and second_birthdate and first_birthdate != second_birthdate):
+                    sets.union(first, second)
+    return sets.groups()
+
+
+def contact_rows(user):
+    """
+    Stream the DEDUP_FIELDS of the user's contacts.
+    """
+    return Contact.objects.filter(user=user).values(*DEDUP_FIELDS).iterator(chunk_size=2000)
+
+
+def find_duplicates(user):
+    """
+    Return the groups of duplicates among the user's contacts, cached until they change
+    when the cache is shared, see ``app_connective.cache.cached``.
+
+    Args:
+    user (User): The owner of the contacts.
+
+    Returns:
+    list: The groups, lists of contact IDs.
+    """
+    return cached(
+        "contacts:duplicates",
+        user.pk,
+        fetch=lambda: duplicate_groups(block_contacts(contact_rows(user))),
+        timeout=DUPLICATES_CACHE_TIMEOUT,
+        tags=[version_tag(user.pk, Contact)],
+    )
+
+
+def merge_contacts(user, primary_id, contact_ids):
+    """
+    Merge contacts of the user into one of them.
+
+    The primary contact keeps its values and takes the missing ones from the others in
+    the order of their IDs, phones only if it has no equal number yet. It is a favorite
+    if any of them is, and it takes over their addresses. The other contacts are deleted.
+
+    Args:
+    user (User): The owner of the contacts.
+    primary_id (int): The ID of the contact to keep.
+    contact_ids (list): The IDs of the contacts to merge into it.
+
+    Returns:
+    Contact: The merged contact.
+
+    Raises:
+    MergeError: If there are no contacts to merge, too many of them, or some of them are
+    not the user's.
+    """
+    duplicate_ids = set(contact_ids) - {primary_id}
+    if not duplicate_ids:
+        raise MergeError("Select the contacts to merge.")
+    if len(duplicate_ids) > MAX_MERGE_SIZE:
+        raise MergeError(f"At most {MAX_MERGE_SIZE} contacts can be merged at once.")
+
+    with transaction.atomic():
+        contacts = {
+            contact.pk: contact
+            for contact in Contact.objects.select_for_update().filter(user=user, pk__in=[primary_id, *duplicate_ids])
+        }
+        primary = contacts.pop(primary_id, None)
+        if primary is None or len(contacts) != len(duplicate_ids):
+            raise MergeError("Unknown contacts.")
+        duplicates = sorted(contacts.values(), key=lambda contact: contact.pk)
+
+        for field in MERGED_FIELDS:
+            if not getattr(primary, field):
+                setattr(primary, field, next((getattr(c, field) for c in duplicates if getattr(c, field)), None))
+        phones = {normalize_phone(getattr(primary, field)) for field in PHONE_FIELDS} - {None}
+        for duplicate in duplicates:
+            for field in PHONE_FIELDS:
+                phone = getattr(duplicate, field)
+                if phone and normalize_phone(phone) not in phones:
+                    free = next((f for f in (field, *PHONE_FIELDS) if not getattr(primary, f)), None)
+                    if free:
+                        setattr(primary, free, phone)
+                        phones.add(normalize_phone(phone))
+        primary.is_favorite = primary.is_favorite or any(duplicate.is_favorite for duplicate in duplicates)
+
+        empty = Q()
+        for field in ("country", "city", "address"):
+            empty &= Q(**{f"{field}__isnull": True}) | Q(**{field: ""})
+        group_addresses = Address.objects.filter(contact__in=[primary, *duplicates])
+        if group_addresses.exclude(empty).exists():
+            group_addresses.filter(empty).delete()
+        # The update bypasses the signals; saving the primary contact below refreshes
+        # its search vector over the moved addresses.
+        Address.objects.filter(contact__in=duplicates).update(contact=primary)
+        bump_version(user.pk, Address)
+        Contact.objects.filter(pk__in=duplicate_ids).delete()
+        primary.save()
+    return primary
@@ -0,0 +1,179 @@
+import random
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app_contacts.dedup import (
+    MAX_BLOCK_SIZE,
+    block_contacts,
+    blocking_keys,
+    contact_rows,
+    duplicate_groups,
+)
+from app_contacts.models import Contact, birthday_ordinal
+
+SYLLABLES = ["ан", "ол", "ен", "ко", "ма", "ри", "на", "ів", "се", "рг", "ій", "ле", "пе", "тр", "да", "ус"]
+DOMAINS = ["gmail.com", "ukr.net", "example.com"]
+SWITCHBOARDS = [f"+38044{n:07d}" for n in range(10)]
+
+
+def word(rng, syllables=3):
+    return "".join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+
+def phone_formats(digits):
+    """
+    Spellings of the Ukrainian mobile number +380XXXXXXXXX that all normalize to it.
+    """
+    operator, number = digits[3:5], digits[5:]
+    return [
+        f"+{digits}",
+        f"+380({operator}){number[:3]}-{number[3:]}",
+        f"0{operator} {number[:3]} {number[3:5]} {number[5:]}",
+        f"{digits}",
+        f"00{digits}",
+    ]
+
+
+def synthetic_contacts(rng, count, duplicate_share):
+    """
+    Build contacts of which about ``duplicate_share`` are duplicates of earlier ones that
+    differ in phone formatting, email spelling or name case.
+
+    Returns:
+    tuple: The contacts as dicts of the DEDUP_FIELDS, and the planted (original, duplicate)
+    ID pairs.
+    """
+    contacts, planted = [], []
+    for contact_id in range(1, count + 1):
+        if contacts and rng.random() < duplicate_share:
+            original = rng.choice(contacts)
+            contact = dict(original, id=contact_id)
+            variant = rng.randrange(3)
+            if variant == 0 and original["mobile_phone"]:
+                contact["mobile_phone"] = rng.choice(phone_formats(original["mobile_phone"].lstrip("+")))
+                contact["email"] = None
+            elif variant == 1 and original["email"]:
+                local, domain = original["email"].split("@")
+                if domain == "gmail.com":
+                    local = ".".join(local[i : i + 4] for i in range(0, len(local), 4)) + "+contacts"
+                contact["email"] = f"{local}@{domain}".upper()
+                contact["mobile_phone"] = None
+            else:
+                contact["name"], contact["surname"] = contact["name"].upper(), contact["surname"].lower()
+                contact["mobile_phone"] = contact["email"] = None
+            planted.append((original["id"], contact_id))
+        else:
+            contact = {
+                "id": contact_id,
+                "name": word(rng),
+                "surname": word(rng, 4),
+                "email": f"user{contact_id}@{rng.choice(DOMAINS)}",
+                "mobile_phone": f"+38050{contact_id:07d}",
+                "work_phone": rng.choice(SWITCHBOARDS) if rng.random() < 0.05 else None,
+                "home_phone": None,
+                "birthdate": date(rng.randrange(1950, 2010), rng.randrange(1, 13), rng.randrange(1, 29)),
+            }
+        contacts.append(contact)
+    return contacts, planted
+
+
+def pairwise_duplicates(contacts):
+    """
+    The O(n²) reference: compare the keys of every pair of contacts.
+    """
+    keys = [(contact, set(blocking_keys(contact))) for contact in contacts]
+    pairs = 0
+    for index, (first, first_keys) in enumerate(keys):
+        for second, second_keys in keys[index + 1 :]:
+            shared = first_keys & second_keys
+            if any(kind != "name" for kind, _ in shared) or (
+                shared and not (first["birthdate"] and second["birthdate"] and first["birthdate"] != second["birthdate"])
+            ):
+                pairs += 1
+    return pairs
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the duplicate contact detection on synthetic contacts of one user, against "
+        "comparing every pair. With --db the contacts are stored and read back inside a "
+        "transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--contacts", type=int, default=100_000, help="Contacts of the user.")
+        parser.add_argument("--duplicates", type=float, default=0.1, help="Share of planted duplicates.")
+        parser.add_argument("--pairwise-sample", type=int, default=2000, help="Contacts compared pairwise.")
+        parser.add_argument("--max-block-size", type=int, default=MAX_BLOCK_SIZE, help="Larger blocks are skipped.")
+        parser.add_argument("--db", action="store_true", help="Also time reading the contacts from the database.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        count = options["contacts"]
+        contacts, planted = synthetic_contacts(rng, count, options["duplicates"])
+
+        started = time.perf_counter()
+        blocks = block_contacts(contacts)
+        blocked = time.perf_counter()
+        groups = duplicate_groups(blocks, options["max_block_size"])
+        grouped = time.perf_counter()
+
+        candidate_pairs = sum(
+            len(members) * (len(members) - 1) // 2
+            for members in blocks.values()
+            if 1 < len(members) <= options["max_block_size"]
+        )
+        skipped = sum(len(members) > options["max_block_size"] for members in blocks.values())
+        group_of = {contact_id: index for index, group in enumerate(groups) for contact_id in group}
+        found = sum(group_of.get(first, -1) == group_of.get(second) for first, second in planted)
+        self.stdout.write(
+            f"{count} contacts, {len(blocks)} blocks ({skipped} skipped as too large), "
+            f"{candidate_pairs} candidate pairs, {len(groups)} groups"
+        )
+        self.stdout.write(f"Planted duplicates found: {found} of {len(planted)}")
+        self.stdout.write(
+            f"blocking {(blocked - started) * 1000:9.1f} ms\n"
+            f"grouping {(grouped - blocked) * 1000:9.1f} ms\n"
+            f"total    {(grouped - started) * 1000:9.1f} ms"
+        )
+
+        total = grouped - started
+        sample = contacts[: options["pairwise_sample"]]
+        started = time.perf_counter()
+        pairwise_duplicates(sample)
+        per_pair = (time.perf_counter() - started) / max(len(sample) * (len(sample) - 1) // 2, 1)
+        estimate = per_pair * count * (count - 1) / 2
+        self.stdout.write(
+            f"pairwise {estimate * 1000:9.1f} ms, estimated from {len(sample)} contacts: "
+            f"x{estimate / total:.0f} the blocking"
+        )
+
+        if options["db"]:
+            self.database(contacts)
+
+    def database(self, contacts):
+        with transaction.atomic():
+            user, _ = User.objects.get_or_create(username="bench_contacts_dedup")
+            started = time.perf_counter()
+            rows = [
+                Contact(
+                    user=user,
+                    birthday_ordinal=birthday_ordinal(contact["birthdate"]),
+                    **{field: value for field, value in contact.items() if field != "id"},
+                )
+                for contact in contacts
+            ]
+            Contact.objects.bulk_create(rows, batch_size=5000)
+            self.stdout.write(f"Stored {len(rows)} contacts in {time.perf_counter() - started:.1f} s")
+
+            started = time.perf_counter()
+            groups = duplicate_groups(block_contacts(contact_rows(user)))
+            self.stdout.write(
+                f"database {(time.perf_counter() - started) * 1000:9.1f} ms for {len(groups)} groups, "
+                "reading included"
+            )
+            transaction.set_rollback(True)
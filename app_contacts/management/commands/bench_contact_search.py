@@ -0,0 +1,93 @@
+import random
+import time
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from app_contacts.models import Contact, Address, birthday_ordinal
+from app_contacts.search import search_contacts, update_search_vectors
+
+SYLLABLES = ["ан", "ол", "ен", "ко", "ма", "ри", "на", "ів", "се", "рг", "ій", "ле", "на", "пе", "тр", "да"]
+CITIES = ["Київ", "Львів", "Одеса", "Харків", "Дніпро", "Вінниця"]
+QUERIES = ["олен", "ма ри", "0501", "example", "львів", "1990"]
+
+
+def word(rng, syllables=3):
+    return "".join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the contact search over synthetic contacts. The contacts are created "
+        "inside a transaction that is rolled back afterwards unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--contacts", type=int, default=1_000_000, help="Contacts in total.")
+        parser.add_argument("--users", type=int, default=10, help="Users the contacts are spread over.")
+        parser.add_argument("--batch", type=int, default=10_000, help="Rows per bulk insert.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per query.")
+        parser.add_argument("--keep", action="store_true", help="Keep the synthetic contacts.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        with transaction.atomic():
+            users = [
+                User.objects.get_or_create(username=f"bench_contacts_{n}")[0]
+                for n in range(options["users"])
+            ]
+            started = time.perf_counter()
+            self.create_contacts(rng, users, options["contacts"], options["batch"])
+            self.stdout.write(f"Created {options['contacts']} contacts in {time.perf_counter() - started:.1f} s")
+
+            started = time.perf_counter()
+            update_search_vectors(Contact.objects.filter(user__in=users))
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE app_contacts_contact")
+                    cursor.execute("ANALYZE app_contacts_address")
+            self.stdout.write(f"Indexed in {time.perf_counter() - started:.1f} s")
+
+            for query in QUERIES:
+                contacts = search_contacts(users[0], query)[:10]
+                timings = []
+                for _ in range(options["repeat"]):
+                    started = time.perf_counter()
+                    found = list(contacts.all())
+                    timings.append(time.perf_counter() - started)
+                self.stdout.write(
+                    f"{query!r:12} {min(timings) * 1000:8.2f} ms  {len(found)} results"
+                )
+                if options["verbosity"] > 1:
+                    self.stdout.write(contacts.explain())
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+    def create_contacts(self, rng, users, total, batch_size):
+        created = 0
+        while created < total:
+            size = min(batch_size, total - created)
+            contacts = [
+                Contact(
+                    user=users[(created + n) % len(users)],
+                    name=word(rng),
+                    surname=word(rng, 4),
+                    email=f"user{created + n}@example.com",
+                    mobile_phone=f"+38050{rng.randrange(10 ** 7):07d}",
+                    birthdate=date(rng.randrange(1950, 2010), rng.randrange(1, 13), rng.randrange(1, 29)),
+                )
+                for n in range(size)
+            ]
+            for contact in contacts:
+                contact.birthday_ordinal = birthday_ordinal(contact.birthdate)
+            contacts = Contact.objects.bulk_create(contacts)
+            Address.objects.bulk_create(
+                [
+                    Address(contact=contact, country="Україна", city=rng.choice(CITIES), address=word(rng))
+                    for contact in contacts
+                ]
+            )
+            created += size
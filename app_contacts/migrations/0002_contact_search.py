@@ -0,0 +1,76 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:31
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations
+
+from app_connective.db_operations import AddIndexConcurrently, postgres_only
+
+
+def backfill_search_vectors(apps, schema_editor):
+    from app_contacts.search import update_search_vectors
+
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Contact = apps.get_model("app_contacts", "Contact")
+    Address = apps.get_model("app_contacts", "Address")
+    # Every batch is an UPDATE of its own, so writes to the other contacts go on meanwhile.
+    ids = Contact.objects.order_by("pk").values_list("pk", flat=True)
+    last = 0
+    while batch := list(ids.filter(pk__gt=last)[:2000]):
+        update_search_vectors(Contact.objects.filter(pk__in=batch), Address)
+        last = batch[-1]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("app_contacts", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        postgres_only(django.contrib.postgres.operations.TrigramExtension()),
+        migrations.AddField(
+            model_name="contact",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+        postgres_only(
+            AddIndexConcurrently(
+                model_name="contact",
+                index=django.contrib.postgres.indexes.GinIndex(
+                    fields=["search_vector"], name="contact_search_vector_idx"
+                ),
+            )
+        ),
+        postgres_only(
+            AddIndexConcurrently(
+                model_name="contact",
+                index=django.contrib.postgres.indexes.GinIndex(
+                    fields=["mobile_phone", "work_phone", "home_phone"],
+                    name="contact_phones_trgm_idx",
+                    opclasses=["gin_trgm_ops", "gin_trgm_ops", "gin_trgm_ops"],
+                ),
+            )
+        ),
+        postgres_only(
+            AddIndexConcurrently(
+                model_name="contact",
+                index=django.contrib.postgres.indexes.GinIndex(
+                    django.contrib.postgres.indexes.OpClass(
+                        django.db.models.functions.text.Upper("email"),
+                        name="gin_trgm_ops",
+                    ),
+                    name="contact_email_trgm_idx",
+                ),
+            )
+        ),
+    ]
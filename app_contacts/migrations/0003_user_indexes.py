@@ -0,0 +1,34 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:37
+
+import django.db.models.functions.datetime
+from django.conf import settings
+from django.db import migrations, models
+
+from app_connective.db_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("app_contacts", "0002_contact_search"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="contact",
+            index=models.Index(
+                fields=["user", "name", "id"], name="contact_user_name_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="contact",
+            index=models.Index(
+                models.F("user"),
+                django.db.models.functions.datetime.ExtractMonth("birthdate"),
+                django.db.models.functions.datetime.ExtractDay("birthdate"),
+                name="contact_user_birthday_idx",
+            ),
+        ),
+    ]
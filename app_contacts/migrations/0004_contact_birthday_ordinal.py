@@ -0,0 +1,51 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+from app_connective.db_operations import AddIndexConcurrently, RemoveIndexConcurrently
+
+
+def backfill_birthday_ordinals(apps, schema_editor):
+    from app_contacts.models import birthday_ordinal
+
+    Contact = apps.get_model("app_contacts", "Contact")
+    contacts = Contact.objects.filter(birthdate__isnull=False).only("birthdate")
+    batch = []
+    for contact in contacts.iterator(chunk_size=2000):
+        contact.birthday_ordinal = birthday_ordinal(contact.birthdate)
+        batch.append(contact)
+        if len(batch) == 2000:
+            Contact.objects.bulk_update(batch, ["birthday_ordinal"])
+            batch = []
+    Contact.objects.bulk_update(batch, ["birthday_ordinal"])
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("app_contacts", "0003_user_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name="contact",
+            name="contact_user_birthday_idx",
+        ),
+        migrations.AddField(
+            model_name="contact",
+            name="birthday_ordinal",
+            field=models.PositiveSmallIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            backfill_birthday_ordinals, migrations.RunPython.noop, atomic=True
+        ),
+        AddIndexConcurrently(
+            model_name="contact",
+            index=models.Index(
+                fields=["user", "birthday_ordinal"], name="contact_user_birthday_idx"
+            ),
+        ),
+    ]
@@ -1,10 +1,32 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 
 """
 Basic models for contacts
 """
 
+# Birthdays are numbered by their day of a leap year, so February 29 has an ordinal too.
+LEAP_YEAR = 2000
+
+
+def birthday_ordinal(birthdate):
+    """
+    Return the day of the year of a birthday, counted in a leap year.
+
+    Args:
+    birthdate (date): The date of birth, or None.
+
+    Returns:
+    int: 1 for January 1, 60 for February 29, 61 for March 1 and 366 for December 31,
+    or None without a birthdate.
+    """
+    if birthdate is None:
+        return None
+    return birthdate.replace(year=LEAP_YEAR).timetuple().tm_yday
+
 
 # Create your models here.
 class Contact(models.Model):
@@ -15,18 +37,43 @@ class Contact(models.Model):
     work_phone = models.CharField(max_length=20, null=True, unique=False)
     home_phone = models.CharField(max_length=20, null=True, unique=False)
     birthdate = models.DateField(null=True, blank=True)
+    birthday_ordinal = models.PositiveSmallIntegerField(null=True, editable=False)
     is_favorite = models.BooleanField(default=False)
     facebook = models.URLField(null=True, blank=True)
     instagram = models.URLField(null=True, blank=True)
     tiktok = models.URLField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True)
     updated_at = models.DateTimeField(auto_now=True, null=True)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
 
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="contact_search_vector_idx"),
+            GinIndex(
+                fields=["mobile_phone", "work_phone", "home_phone"],
+                opclasses=["gin_trgm_ops"] * 3,
+                name="contact_phones_trgm_idx",
+            ),
+            GinIndex(OpClass(Upper("email"), name="gin_trgm_ops"), name="contact_email_trgm_idx"),
+            models.Index(fields=["user", "name", "id"], name="contact_user_name_idx"),
+            models.Index(fields=["user", "birthday_ordinal"], name="contact_user_birthday_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name} {self.surname}"
 
+    def save(self, **kwargs):
+        """
+        Overwrites the save method to keep the birthday ordinal in step with the birthdate.
+        """
+        self.birthday_ordinal = birthday_ordinal(self.birthdate)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "birthdate" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "birthday_ordinal"}
+        super().save(**kwargs)
+
 
 class Address(models.Model):
     country = models.CharField(max_length=20, null=True)
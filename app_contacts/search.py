@@ -0,0 +1,117 @@
+"""
+Contact search.
+
+On PostgreSQL every contact keeps a ``search_vector`` over its name, email, phones and
+addresses, kept up to date by the signals in ``app_contacts.signals``. Words of the
+query are matched as prefixes against the vector and ranked, while phone numbers and
+emails are also matched as substrings through trigram indexes. Other databases fall
+back to ``icontains`` lookups. Every search is scoped to the user's own contacts.
+"""
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Cast, Concat
+
+from .models import Contact, Address
+
+SEARCH_CONFIG = "simple"
+WORD_RE = re.compile(r"\w+")
+YEAR_RE = re.compile(r"^\d{4}$")
+
+
+def search_vector(address_model=Address):
+    """
+    Build the expression of a contact's search vector.
+
+    Args:
+    address_model (Model, optional): The Address model, historical models in migrations.
+
+    Returns:
+    CombinedSearchVector: Names weighted A, email and phones weighted B, addresses weighted C.
+    """
+    addresses = (
+        address_model.objects.filter(contact=OuterRef("pk"))
+        .values("contact")
+        .annotate(
+            text=StringAgg(
+                Concat("country", Value(" "), "city", Value(" "), "address", output_field=TextField()),
+                delimiter=" ",
+            )
+        )
+        .values("text")[:1]
+    )
+    return (
+        SearchVector("name", "surname", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("email", "mobile_phone", "work_phone", "home_phone", weight="B", config=SEARCH_CONFIG)
+        + SearchVector(Subquery(addresses, output_field=TextField()), weight="C", config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(contacts, address_model=Address):
+    """
+    Recompute the search vector of the given contacts in a single UPDATE.
+
+    Args:
+    contacts (QuerySet): The contacts to update.
+    address_model (Model, optional): The Address model, historical models in migrations.
+    """
+    if connection.vendor == "postgresql":
+        contacts.update(search_vector=search_vector(address_model))
+
+
+def search_query(query):
+    words = WORD_RE.findall(query)
+    if not words:
+        return None
+    raw = " & ".join(f"{word}:*" for word in words)
+    return SearchQuery(raw, search_type="raw", config=SEARCH_CONFIG)
+
+
+def search_contacts(user, query):
+    """
+    Find the user's contacts matching a query, best matches first.
+
+    Args:
+    user (User): The owner of the contacts.
+    query (str): The search text.
+
+    Returns:
+    QuerySet: The matching contacts.
+    """
+    query = query.strip()
+    contacts = Contact.objects.filter(user=user)
+    substring = (
+        Q(mobile_phone__contains=query)
+        | Q(work_phone__contains=query)
+        | Q(home_phone__contains=query)
+        | Q(email__icontains=query)
+    )
+    if YEAR_RE.match(query):
+        substring |= Q(birthdate__year=int(query))
+
+    if connection.vendor != "postgresql":
+        return (
+            contacts.filter(
+                substring
+                | Q(name__icontains=query)
+                | Q(surname__icontains=query)
+                | Q(address__country__icontains=query)
+                | Q(address__city__icontains=query)
+                | Q(address__address__icontains=query)
+            )
+            .distinct()
+            .order_by("name", "id")
+        )
+
+    text_query = search_query(query)
+    if text_query is None:
+        return contacts.filter(substring).order_by("name", "id")
+    return (
+        contacts.filter(Q(search_vector=text_query) | substring)
+        # ts_rank() is a real; as a double precision it survives the round trip through page cursors.
+        .annotate(rank=Cast(SearchRank(F("search_vector"), text_query), FloatField()))
+        .order_by("-rank", "name", "id")
+    )
@@ -0,0 +1,100 @@
+"""
+Contact projections.
+
+Every contact page reads the user's contacts through one of these projections, which
+select only the columns the page renders:
+
+- ``contact_list`` and ``contact_search``: the rows of the contacts list.
+- ``contact_detail``: the contact with its address for the details page, and
+  ``editable_contact`` for the update form, each in a single query that LEFT JOINs the
+  address, so contacts without one are shown too.
+- ``BIRTHDAY_FIELDS``: the birthday lists, see ``app_contacts.birthdays``.
+
+All of them are scoped to the user's own contacts.
+"""
+from django.db.models import F
+from django.http import Http404
+
+from .models import Address, Contact
+from .search import search_contacts
+
+LIST_FIELDS = ("id", "name", "surname")
+BIRTHDAY_FIELDS = ("id", "name", "birthdate")
+DETAIL_FIELDS = (
+    "id",
+    "name",
+    "surname",
+    "email",
+    "mobile_phone",
+    "work_phone",
+    "home_phone",
+    "birthdate",
+    "is_favorite",
+    "facebook",
+    "instagram",
+    "tiktok",
+)
+# The update form saves every field, including the ones the signals and save() derive.
+EDIT_FIELDS = (*DETAIL_FIELDS, "user", "birthday_ordinal", "created_at", "updated_at")
+ADDRESS_FIELDS = ("id", "country", "city", "address")
+
+
+def contact_list(user):
+    """
+    Return the user's contacts for the contacts list, by name.
+    """
+    return Contact.objects.filter(user=user).only(*LIST_FIELDS).order_by("name", "id")
+
+
+def contact_search(user, query):
+    """
+    Return the user's contacts matching a query for the contacts list, best matches first.
+    """
+    return search_contacts(user, query).only(*LIST_FIELDS)
+
+
+def with_address(user, contact_id, fields):
+    """
+    Load a contact of the user and its first address in one query.
+
+    Args:
+    user (User): The owner of the contact.
+    contact_id (int): The ID of the contact.
+    fields (tuple): The contact fields to load.
+
+    Returns:
+    tuple: The contact and its address, None if it has none.
+
+    Raises:
+    Http404: If the user has no such contact.
+    """
+    contact = (
+        Contact.objects.filter(user=user, pk=contact_id)
+        .only(*fields)
+        .annotate(**{f"address_{field}": F(f"address__{field}") for field in ADDRESS_FIELDS})
+        .order_by("address__id")
+        .first()
+    )
+    if contact is None:
+        raise Http404("Контакт не знайдено")
+    address = None
+    if contact.address_id is not None:
+        address = Address(contact=contact, **{field: getattr(contact, f"address_{field}") for field in ADDRESS_FIELDS})
+        # Loaded from the database, so saving it updates the row.
+        address._state.adding = False
+        address._state.db = contact._state.db
+    return contact, address
+
+
+def contact_detail(user, contact_id):
+    """
+    Return a contact of the user and its address for the details page.
+    """
+    return with_address(user, contact_id, DETAIL_FIELDS)
+
+
+def editable_contact(user, contact_id):
+    """
+    Return a contact of the user and its address for the update form.
+    """
+    return with_address(user, contact_id, EDIT_FIELDS)
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from app_connective.cache import bump_version
+from .models import Contact, Address
+from .search import update_search_vectors
+
+
+@receiver(post_save, sender=Contact)
+def contact_saved(sender, instance, **kwargs):
+    update_search_vectors(Contact.objects.filter(pk=instance.pk))
+    if instance.user_id:
+        bump_version(instance.user_id, Contact)
+
+
+@receiver(post_delete, sender=Contact)
+def contact_deleted(sender, instance, **kwargs):
+    if instance.user_id:
+        bump_version(instance.user_id, Contact)
+
+
+@receiver(post_save, sender=Address)
+@receiver(post_delete, sender=Address)
+def address_changed(sender, instance, **kwargs):
+    if instance.contact_id:
+        update_search_vectors(Contact.objects.filter(pk=instance.contact_id))
+        user_id = Contact.objects.filter(pk=instance.contact_id).values_list("user_id", flat=True).first()
+        if user_id:
+            bump_version(user_id, Address)
@@ -1,3 +1,389 @@
-from django.test import TestCase
+import io
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from app_connective.testing import ConstantQueriesMixin
+from .birthdays import calendar_months, next_days, this_month, this_week
+from .dedup import (
+    MergeError,
+    block_contacts,
+    duplicate_groups,
+    merge_contacts,
+    normalize_email,
+    normalize_phone,
+)
+from .models import Address, Contact, birthday_ordinal
+from .transfer import import_rows, read_csv
+
+
+class ContactQueryCountTests(ConstantQueriesMixin, TestCase):
+    """
+    The contact pages read the contacts through the projections of
+    ``app_contacts.selectors``, so their number of queries does not grow with the
+    contacts of the user.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="contacts", password="password")
+        self.client.force_login(self.user)
+        self.created = 0
+
+    many_rows = 25
+
+    def create_rows(self, count):
+        for _ in range(count):
+            contact = Contact.objects.create(
+                user=self.user, name=f"Olena{self.created:03d}", surname="Koval", mobile_phone="+380501234567"
+            )
+            Address.objects.create(contact=contact, country="Україна", city="Київ")
+            self.created += 1
+
+    def test_contacts_list(self):
+        response = self.assertConstantQueries(reverse("app_contacts:contacts"))
+        self.assertContains(response, "Olena000")
+
+    def test_search(self):
+        response = self.assertConstantQueries(reverse("app_contacts:contacts"), {"q": "olena"})
+        self.assertContains(response, "Olena000")
+
+    def test_contact_details(self):
+        self.create_rows(1)
+        contact = Contact.objects.get(user=self.user)
+        url = reverse("app_contacts:contact_details", args=[contact.pk])
+        # The session, the user, and the contact with its address in one query.
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, "Київ")
+
+    def test_contact_details_of_another_user(self):
+        other = User.objects.create_user(username="other", password="password")
+        contact = Contact.objects.create(user=other, name="Petro", surname="Sirko")
+        response = self.client.get(reverse("app_contacts:contact_details", args=[contact.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+class BirthdayTests(TestCase):
+    """
+    Birthday windows, each read with one query, across the end of the year and
+    February 29.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="birthdays", password="password")
+        self.client.force_login(self.user)
+
+    def born(self, *birthdates):
+        for birthdate in birthdates:
+            Contact.objects.create(user=self.user, name=f"{birthdate:%m%d}", birthdate=birthdate)
+
+    def dates(self, birthdays):
+        return [(birthday.date, birthday.age) for birthday in birthdays]
+
+    def test_week_across_new_year(self):
+        self.born(date(1990, 12, 20), date(1990, 12, 30), date(1991, 1, 2), date(1991, 1, 10))
+        # Wednesday, December 31, in a week from December 29 to January 4.
+        with self.assertNumQueries(1):
+            birthdays = this_week(self.user, today=date(2025, 12, 31))
+        self.assertEqual(self.dates(birthdays), [(date(2025, 12, 30), 35), (date(2026, 1, 2), 35)])
+
+    def test_december(self):
+        self.born(date(1990, 11, 30), date(1990, 12, 1), date(1990, 12, 31), date(1991, 1, 1))
+        birthdays = this_month(self.user, today=date(2025, 12, 15))
+        self.assertEqual(self.dates(birthdays), [(date(2025, 12, 1), 35), (date(2025, 12, 31), 35)])
+
+        birthdays = next_days(self.user, 20, today=date(2025, 12, 20))
+        self.assertEqual(self.dates(birthdays), [(date(2025, 12, 31), 35), (date(2026, 1, 1), 35)])
+
+    def test_calendar_from_december(self):
+        self.born(date(1990, 12, 31), date(1991, 1, 1), date(1991, 2, 1))
+
+        def render_month(first, weeks):
+            return [cell["day"] for week in weeks for cell in week if cell and cell["birthdays"]]
+
+        with self.assertNumQueries(1):
+            months = calendar_months(self.user, 2025, 12, 2, render_month, today=date(2025, 12, 1))
+        self.assertEqual(months, [(date(2025, 12, 1), [31]), (date(2026, 1, 1), [1])])
+
+    def test_february_29(self):
+        self.born(date(2000, 2, 29), date(2001, 2, 28))
+        # In common years February 29 birthdays are celebrated on February 28.
+        birthdays = next_days(self.user, 1, today=date(2025, 2, 28))
+        self.assertEqual(self.dates(birthdays), [(date(2025, 2, 28), 24), (date(2025, 2, 28), 25)])
+        self.assertEqual(self.dates(next_days(self.user, 1, today=date(2025, 3, 1))), [])
+
+        birthdays = next_days(self.user, 1, today=date(2024, 2, 28))
+        self.assertEqual(self.dates(birthdays), [(date(2024, 2, 28), 23)])
+        birthdays = this_month(self.user, today=date(2024, 2, 1))
+        self.assertEqual(self.dates(birthdays), [(date(2024, 2, 28), 23), (date(2024, 2, 29), 24)])
+
+    def test_upcoming(self):
+        today = date.today()
+        soon, later = today + timedelta(days=5), today + timedelta(days=20)
+        # Years of birth 28 years back keep February 29 a valid date.
+        self.born(*(day.replace(year=day.year - 28) for day in (today, soon, later)))
+        url = reverse("app_contacts:contact_birthday")
+
+        response = self.client.get(url, {"period": "upcoming", "days": 10})
+        self.assertEqual([birthday.date for birthday in response.context["birthday_contacts"]], [today, soon])
+        self.assertEqual([birthday.date for birthday in response.context["today_birthdays"]], [today])
+        self.assertEqual([birthday.date for birthday in response.context["upcoming_this_month"]], [soon])
+
+        response = self.client.get(url, {"period": "upcoming"})
+        self.assertEqual([birthday.date for birthday in response.context["birthday_contacts"]], [today, soon, later])
+
+
+class MergedContactTransferTests(TestCase):
+    """
+    A contact that took over the addresses of its merged duplicates is exported once, so
+    importing the export does not duplicate it.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="transfer", password="password")
+        self.client.force_login(self.user)
+        self.contacts = []
+        for city, phone in (("Київ", "+380501234567"), ("Львів", "050 123 45 67")):
+            contact = Contact.objects.create(user=self.user, name="Olena", surname="Koval", mobile_phone=phone)
+            Address.objects.create(contact=contact, country="Україна", city=city)
+            self.contacts.append(contact)
+        self.client.post(
+            reverse("app_contacts:merge"),
+            {"primary": self.contacts[0].pk, "contacts": [contact.pk for contact in self.contacts]},
+        )
+
+    def export(self, file_format):
+        response = self.client.get(reverse("app_contacts:export_contacts"), {"format": file_format})
+        return b"".join(response.streaming_content)
+
+    def test_export_and_import(self):
+        self.assertEqual(Address.objects.filter(contact=self.contacts[0]).count(), 2)
+        for file_format in ("csv", "vcf"):
+            with self.subTest(file_format=file_format):
+                content = self.export(file_format)
+                if file_format == "csv":
+                    self.assertEqual(len(content.decode("utf-8-sig").splitlines()), 2)
+                else:
+                    self.assertEqual(content.count(b"BEGIN:VCARD"), 1)
+                self.assertIn("Київ".encode(), content)
+
+                other = User.objects.create_user(username=f"import-{file_format}", password="password")
+                self.client.force_login(other)
+                upload = SimpleUploadedFile(f"contacts.{file_format}", content)
+                self.client.post(reverse("app_contacts:import_contacts"), {"file": upload})
+                self.assertEqual(Contact.objects.filter(user=other).count(), 1)
+                self.client.force_login(self.user)
+
+
+class ContactImportTests(TestCase):
+    """
+    Imports skip and report the invalid rows and create the valid contacts in batches,
+    ready for the birthday and search lookups.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="import", password="password")
+        self.client.force_login(self.user)
+
+    def upload(self, name, lines):
+        content = "\r\n".join(lines).encode() if isinstance(lines, list) else lines
+        return self.client.post(reverse("app_contacts:import_contacts"), {"file": SimpleUploadedFile(name, content)})
+
+    def errors(self, report):
+        return [(line, sorted(errors)) for line, errors in report.errors]
+
+    def test_csv(self):
+        response = self.upload(
+            "contacts.csv",
+            [
+                "Name,Surname,Email,Mobile_phone,Birthdate,City,Notes",
+                "Olena,Koval,olena@example.com,050 123 45 67,1990-12-31,Київ,colleague",
+                "Ol,Koval,,,,,",
+                "Petro,Sirko,not an email,,,,",
+                "Ivan,Franko,,,31/02/1990,,",
+                "Taras,Shevchenko,,+380(50)123-4567,09/03/1814,Черкаси,",
+            ],
+        )
+        report = response.context["report"]
+        self.assertEqual(report.imported, 2)
+        self.assertEqual(self.errors(report), [(3, ["name"]), (4, ["email"]), (5, ["birthdate"])])
+        self.assertContains(response, "Пропущено рядків з помилками: 3")
+
+        contact = Contact.objects.get(user=self.user, name="Olena")
+        self.assertEqual((contact.mobile_phone, contact.birthdate), ("0501234567", date(1990, 12, 31)))
+        self.assertEqual(contact.birthday_ordinal, birthday_ordinal(contact.birthdate))
+        self.assertEqual(list(contact.address_set.values_list("city", flat=True)), ["Київ"])
+        response = self.client.get(reverse("app_contacts:contacts"), {"q": "Черкаси"})
+        self.assertContains(response, "Shevchenko")
+        self.assertNotContains(response, "Koval")
+
+    def test_vcard(self):
+        response = self.upload(
+            "contacts.vcf",
+            [
+                "BEGIN:VCARD",
+                "VERSION:3.0",
+                "N:Koval;Olena;;;",
+                "TEL;TYPE=CELL:+380501234567",
+                "BDAY:2000-02-29",
+                "ADR:;;вул. Хрещатик\\, 1;Київ;;;Україна",
+                "END:VCARD",
+                "BEGIN:VCARD",
+                "VERSION:3.0",
+                "FN:Al",
+                "EMAIL:broken",
+                "END:VCARD",
+            ],
+        )
+        report = response.context["report"]
+        self.assertEqual(report.imported, 1)
+        self.assertEqual(self.errors(report), [(8, ["email", "name"])])
+
+        contact = Contact.objects.get(user=self.user)
+        self.assertEqual((contact.name, contact.surname, contact.birthday_ordinal), ("Olena", "Koval", 60))
+        address = contact.address_set.get()
+        self.assertEqual(
+            (address.country, address.city, address.address), ("Україна", "Київ", "вул. Хрещатик, 1")
+        )
+        self.assertContains(self.client.get(reverse("app_contacts:contacts"), {"q": "Хрещатик"}), "Koval")
+
+    def test_unreadable_files(self):
+        for name, content in (
+            ("contacts.csv", b"surname\r\nKoval"),
+            ("contacts.csv", b"name\r\n\xff"),
+            ("contacts.vcf", b"\xff"),
+        ):
+            with self.subTest(name=name, content=content):
+                self.assertContains(self.upload(name, content), "Не вдалося прочитати файл")
+        self.assertFalse(Contact.objects.exists())
+
+    def test_batches(self):
+        def rows(count):
+            lines = ["name,surname"] + [f"Contact{n},Koval" for n in range(count)]
+            return read_csv(io.BytesIO("\n".join(lines).encode()))
+
+        for count, batches in ((4, 2), (5, 3), (1, 1), (0, 0)):
+            with self.subTest(count=count):
+                with CaptureQueriesContext(connection) as queries:
+                    report = import_rows(self.user, rows(count), batch_size=2)
+                self.assertEqual(report.imported, count)
+                inserts = [query for query in queries if query["sql"].startswith('INSERT INTO "app_contacts_contact"')]
+                self.assertEqual(len(inserts), batches)
+        self.assertEqual(Contact.objects.filter(user=self.user).count(), 10)
+        self.assertEqual(Address.objects.filter(contact__user=self.user).count(), 10)
+
+
+class DuplicateDetectionTests(SimpleTestCase):
+    """
+    Normalized phones, emails and names file contacts into blocks of duplicates.
+    """
+
+    def contact(self, contact_id, name="Olena", surname="Koval", email=None, phone=None, birthdate=None):
+        return {
+            "id": contact_id,
+            "name": name,
+            "surname": surname,
+            "email": email,
+            "mobile_phone": phone,
+            "work_phone": None,
+            "home_phone": None,
+            "birthdate": birthdate,
+        }
+
+    def test_phones(self):
+        for phone in ("050 123 45 67", "+380(50)123-4567", "00380 50 123 45 67", "+380501234567"):
+            with self.subTest(phone=phone):
+                self.assertEqual(normalize_phone(phone), "+380501234567")
+        self.assertEqual(normalize_phone("+1 (212) 555-0100"), "+12125550100")
+        for phone in (None, "", "0501", "+3805012345678901"):
+            with self.subTest(phone=phone):
+                self.assertIsNone(normalize_phone(phone))
+
+    def test_emails(self):
+        for email in ("Olena.Koval@gmail.com", "olenakoval+work@gmail.com", "o.lena.koval@googlemail.com"):
+            with self.subTest(email=email):
+                self.assertEqual(normalize_email(email), "olenakoval@gmail.com")
+        # Other providers may not ignore dots and +tags.
+        self.assertEqual(normalize_email("Olena.Koval+work@Example.com"), "olena.koval+work@example.com")
+        self.assertIsNone(normalize_email("not an email"))
+
+    def test_groups(self):
+        contacts = [
+            self.contact(1, phone="050 123 45 67"),
+            self.contact(2, name="Mama", surname="", phone="+380(50)123-4567"),
+            self.contact(3, name="Petro", surname="Sirko", email="petro.sirko@gmail.com"),
+            self.contact(4, name="P.", surname="S.", email="petrosirko+news@gmail.com"),
+            self.contact(5, name="Ivan", surname="Franko"),
+            self.contact(6, name=" ivan ", surname="FRANKO"),
+            self.contact(7, name="Taras", surname="Shevchenko"),
+        ]
+        self.assertEqual(duplicate_groups(block_contacts(contacts)), [[1, 2], [3, 4], [5, 6]])
+
+    def test_same_name_with_different_birthdates(self):
+        contacts = [
+            self.contact(1, birthdate=date(1990, 1, 1)),
+            self.contact(2, birthdate=date(1985, 5, 5)),
+            self.contact(3),
+        ]
+        # The contact without a birthdate may be either of them, so all three are grouped.
+        self.assertEqual(duplicate_groups(block_contacts(contacts)), [[1, 2, 3]])
+        self.assertEqual(duplicate_groups(block_contacts(contacts[:2])), [])
+
+    def test_large_blocks_are_skipped(self):
+        switchboard = [
+            self.contact(n, name=f"Name{n}", surname=f"Surname{n}", phone="044 123 45 67") for n in range(5)
+        ]
+        self.assertEqual(duplicate_groups(block_contacts(switchboard), max_block_size=5), [[0, 1, 2, 3, 4]])
+        self.assertEqual(duplicate_groups(block_contacts(switchboard), max_block_size=4), [])
+
+        # A skipped block still lets the other blocks of its contacts group them.
+        switchboard[0]["email"] = switchboard[1]["email"] = "office@example.com"
+        self.assertEqual(duplicate_groups(block_contacts(switchboard), max_block_size=4), [[0, 1]])
+
+
+class MergeContactsTests(TestCase):
+    """
+    Merging folds duplicates into one contact of the same user.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="merge", password="password")
+
+    def contact(self, user=None, city=None, **fields):
+        contact = Contact.objects.create(user=user or self.user, name="Olena", surname="Koval", **fields)
+        Address.objects.create(contact=contact, country="Україна" if city else None, city=city)
+        return contact
+
+    def test_merge(self):
+        primary = self.contact(mobile_phone="+380501234567", city="Київ")
+        first = self.contact(mobile_phone="050 123 45 67", email="olena@example.com", city="Львів")
+        second = self.contact(mobile_phone="+380671234567", birthdate=date(1990, 5, 1), is_favorite=True)
+
+        merged = merge_contacts(self.user, primary.pk, [primary.pk, first.pk, second.pk])
+        self.assertEqual(list(Contact.objects.filter(user=self.user)), [merged])
+        self.assertEqual(
+            (merged.mobile_phone, merged.work_phone, merged.email, merged.birthdate, merged.is_favorite),
+            ("+380501234567", "+380671234567", "olena@example.com", date(1990, 5, 1), True),
+        )
+        # Addresses are moved, and the empty one of the second contact is dropped.
+        self.assertEqual(sorted(merged.address_set.values_list("city", flat=True)), ["Київ", "Львів"])
+        self.assertEqual(Address.objects.count(), 2)
+
+    def test_contacts_of_another_user(self):
+        primary = self.contact(city="Київ")
+        other = self.contact(user=User.objects.create_user(username="other", password="password"), city="Львів")
+        for primary_id, contact_ids in (
+            (primary.pk, [other.pk]),
+            (other.pk, [primary.pk]),
+            (primary.pk, [primary.pk]),
+        ):
+            with self.subTest(primary_id=primary_id, contact_ids=contact_ids):
+                with self.assertRaises(MergeError):
+                    merge_contacts(self.user, primary_id, contact_ids)
+        self.assertEqual(Contact.objects.count(), 2)
+        self.assertEqual(other.address_set.get().city, "Львів")
@@ -0,0 +1,383 @@
+"""
+Bulk import and export of contacts as CSV and vCard.
+
+Imports are parsed as a stream, one row or card at a time, and every row is validated
+with ``ContactForm`` and ``AddressForm``, so imported contacts follow the same rules as
+the ones added by hand. The valid rows are written with ``bulk_create`` in batches of
+``BATCH_SIZE`` inside one transaction, contacts first and then their addresses. Each
+batch also does what the skipped ``save()`` and signals would: birthday ordinals,
+search vectors, and the cached pages and calendar. Invalid rows are skipped and
+reported with their line numbers.
+
+Exports stream the user's contacts with their first address from a database cursor, so
+memory use does not depend on the number of contacts.
+"""
+import csv
+import io
+import quopri
+import re
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from app_connective.cache import bump_version
+from .forms import AddressForm, ContactForm
+from .models import Address, Contact, birthday_ordinal
+from .search import update_search_vectors
+
+BATCH_SIZE = 500
+EXPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+
+CONTACT_FIELDS = ContactForm.Meta.fields
+ADDRESS_FIELDS = AddressForm.Meta.fields
+COLUMNS = [*CONTACT_FIELDS, *ADDRESS_FIELDS]
+TRUE_VALUES = {"1", "true", "yes", "y", "on", "так", "+"}
+BIRTHDATE_FORMAT = "%d/%m/%Y"
+# Separators people type into phone numbers that the phone validator does not accept.
+PHONE_SEPARATORS = re.compile(r"[\s.]")
+ISO_DATE_RE = re.compile(r"^(\d{4})-?(\d{2})-?(\d{2})")
+VCARD_SPECIAL_RE = re.compile(r"([\\,;])")
+VCARD_SOCIAL_HOSTS = {"facebook.com": "facebook", "instagram.com": "instagram", "tiktok.com": "tiktok"}
+VCARD_PHONE_TYPES = {"CELL": "mobile_phone", "MOBILE": "mobile_phone", "WORK": "work_phone", "HOME": "home_phone"}
+VCARD_FAVORITE = "X-CONNECTIVE-FAVORITE"
+VCARD_LINE_LENGTH = 75
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+class ImportReport:
+    """
+    The outcome of an import.
+
+    Attributes:
+    imported (int): The number of contacts created.
+    error_count (int): The number of skipped rows.
+    errors (list): (line, messages) of the first MAX_REPORTED_ERRORS skipped rows.
+    """
+
+    def __init__(self):
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []
+
+    def skip(self, line, messages):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, messages))
+
+
+def form_data(values):
+    """
+    Turn the raw values of a row into the form data of ContactForm and AddressForm.
+    """
+    data = {field: (values.get(field) or "").strip() for field in COLUMNS}
+    for field in ("mobile_phone", "work_phone", "home_phone"):
+        data[field] = PHONE_SEPARATORS.sub("", data[field])
+    match = ISO_DATE_RE.match(data["birthdate"])
+    if match:
+        year, month, day = match.groups()
+        data["birthdate"] = f"{day}/{month}/{year}"
+    data["is_favorite"] = "true" if data["is_favorite"].lower() in TRUE_VALUES else "false"
+    return data
+
+
+def read_csv(file):
+    """
+    Parse CSV contacts with a header row naming the columns, as written by ``export_csv``.
+    Unknown columns are ignored.
+
+    Args:
+    file (file): The binary CSV file, UTF-8 encoded.
+
+    Yields:
+    tuple: The line number and the form data of every row.
+
+    Raises:
+    ImportFileError: If the file is not UTF-8 CSV with a "name" column.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.DictReader(text)
+        header = [column.strip().lower() for column in reader.fieldnames or []]
+        if "name" not in header:
+            raise ImportFileError('перший рядок має містити назви колонок, зокрема "name".')
+        reader.fieldnames = header
+        for values in reader:
+            yield reader.line_num, form_data(values)
+    except (csv.Error, UnicodeDecodeError) as error:
+        raise ImportFileError(f"це не CSV у кодуванні UTF-8 ({error}).")
+    finally:
+        text.detach()
+
+
+def unfold(lines):
+    """
+    Join the folded vCard lines, which continue on lines starting with a space or tab.
+
+    Yields:
+    tuple: The number of the first line and the unfolded line.
+    """
+    start, current = 0, None
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield start, current
+        start, current = number, line
+    if current:
+        yield start, current
+
+
+def vcard_property(line):
+    """
+    Split a vCard line into its name, its parameters and its value.
+
+    Returns:
+    tuple: The upper-case name without group, a dict of the upper-case parameters with
+    sets of values, and the value, decoded if quoted-printable.
+    """
+    head, _, value = line.partition(":")
+    name, *parameters = head.split(";")
+    params = {}
+    for parameter in parameters:
+        key, has_value, values = parameter.partition("=")
+        # vCard 2.1 lists bare types, e.g. TEL;CELL:...
+        key, values = (key, values) if has_value else ("TYPE", key)
+        params.setdefault(key.upper(), set()).update(v.strip('"').upper() for v in values.split(","))
+    if "QUOTED-PRINTABLE" in params.get("ENCODING", ()):
+        charset = next(iter(params.get("CHARSET", ())), "UTF-8")
+        value = quopri.decodestring(value.encode()).decode(charset, errors="replace")
+    return name.rsplit(".", 1)[-1].upper(), params, value
+
+
+def vcard_values(value):
+    """
+    Split a structured vCard value at unescaped semicolons and unescape the parts.
+    """
+    parts = re.split(r"(?<!\\);", value)
+    return [re.sub(r"\\(.)", lambda m: "\n" if m.group(1) in "nN" else m.group(1), part) for part in parts]
+
+
+def card_values(properties):
+    """
+    Map the properties of a vCard to contact fields.
+    """
+    values = {}
+    for name, params, value in properties:
+        parts = vcard_values(value)
+        if name == "N":
+            values.setdefault("surname", parts[0])
+            values.setdefault("name", parts[1] if len(parts) > 1 else "")
+        elif name == "FN" and "name" not in values:
+            values["name"], _, values["surname"] = parts[0].partition(" ")
+        elif name == "EMAIL":
+            values.setdefault("email", parts[0])
+        elif name == "TEL":
+            types = [VCARD_PHONE_TYPES[kind] for kind in params.get("TYPE", ()) if kind in VCARD_PHONE_TYPES]
+            for field in [*types, "mobile_phone", "work_phone", "home_phone"]:
+                if field not in values:
+                    values[field] = parts[0]
+                    break
+        elif name == "BDAY":
+            values.setdefault("birthdate", parts[0])
+        elif name == "ADR":
+            parts += [""] * (7 - len(parts))
+            values.setdefault("address", parts[2])
+            values.setdefault("city", parts[3])
+            values.setdefault("country", parts[6])
+        elif name == "URL":
+            for host, field in VCARD_SOCIAL_HOSTS.items():
+                if host in parts[0].lower():
+                    values.setdefault(field, parts[0])
+        elif name == VCARD_FAVORITE:
+            values["is_favorite"] = parts[0]
+    return values
+
+
+def read_vcard(file):
+    """
+    Parse vCard 2.1, 3.0 and 4.0 contacts.
+
+    Args:
+    file (file): The binary vCard file, UTF-8 encoded.
+
+    Yields:
+    tuple: The line number of BEGIN:VCARD and the form data of every card.
+
+    Raises:
+    ImportFileError: If the file is not UTF-8 text.
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig")
+    try:
+        start, properties = None, None
+        for number, line in unfold(text):
+            name, params, value = vcard_property(line)
+            if name == "BEGIN" and value.upper() == "VCARD":
+                start, properties = number, []
+            elif name == "END" and value.upper() == "VCARD" and properties is not None:
+                yield start, form_data(card_values(properties))
+                properties = None
+            elif properties is not None:
+                properties.append((name, params, value))
+    except UnicodeDecodeError as error:
+        raise ImportFileError(f"це не текст у кодуванні UTF-8 ({error}).")
+    finally:
+        text.detach()
+
+
+def validate(form, data, instance):
+    """
+    Validate form data with a bound form that is reused for every row, which saves
+    copying its fields for each one.
+
+    Returns:
+    dict: The error messages by field, empty if the data is valid.
+    """
+    form.data = data
+    form.instance = instance
+    form.full_clean()
+    return {field: list(messages) for field, messages in form.errors.items()}
+
+
+def write_batch(contacts, addresses):
+    Contact.objects.bulk_create(contacts)
+    Address.objects.bulk_create(addresses)
+    update_search_vectors(Contact.objects.filter(pk__in=[contact.pk for contact in contacts]))
+
+
+def import_rows(user, rows, batch_size=BATCH_SIZE):
+    """
+    Create contacts with their addresses from parsed rows.
+
+    Args:
+    user (User): The owner of the new contacts.
+    rows (iterable): (line, form data) pairs, as yielded by ``read_csv`` and ``read_vcard``.
+    batch_size (int, optional): The most contacts per INSERT.
+
+    Returns:
+    ImportReport: The number of imported contacts and the errors of the skipped rows.
+
+    Raises:
+    ImportFileError: If the file cannot be parsed; nothing is imported then.
+    """
+    report = ImportReport()
+    contact_form, address_form = ContactForm({}), AddressForm({})
+    contacts, addresses = [], []
+    with transaction.atomic():
+        for line, data in rows:
+            contact, address = Contact(user=user), Address()
+            errors = validate(contact_form, data, contact)
+            errors.update(validate(address_form, data, address))
+            if errors:
+                report.skip(line, errors)
+                continue
+            # bulk_create() skips Contact.save().
+            contact.birthday_ordinal = birthday_ordinal(contact.birthdate)
+            address.contact = contact
+            contacts.append(contact)
+            addresses.append(address)
+            if len(contacts) == batch_size:
+                write_batch(contacts, addresses)
+                report.imported += len(contacts)
+                contacts, addresses = [], []
+        if contacts:
+            write_batch(contacts, addresses)
+            report.imported += len(contacts)
+        if report.imported:
+            # Also drops the cached birthday calendar, see birthdays.calendar_version.
+            bump_version(user.pk, Contact, Address)
+    return report
+
+
+def exported_rows(user):
+    """
+    Stream the user's contacts with their first address, by name.
+
+    Every contact is exported once, like on its details page, even when merging
+    duplicates gave it several addresses, so importing the export does not duplicate it.
+
+    Yields:
+    dict: The values of every contact by column.
+    """
+    first_address = Address.objects.filter(contact=OuterRef("pk")).order_by("id")
+    rows = (
+        Contact.objects.filter(user=user)
+        .annotate(
+            **{f"address_{field}": Subquery(first_address.values(field)[:1]) for field in ADDRESS_FIELDS}
+        )
+        .order_by("name", "id")
+        .values_list(*CONTACT_FIELDS, *(f"address_{field}" for field in ADDRESS_FIELDS))
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for row in rows:
+        yield dict(zip(COLUMNS, row))
+
+
+class Echo:
+    """
+    File-like object handing what is written to it back, for csv.writer to format lines.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_csv(user):
+    """
+    Write the user's contacts as CSV lines, readable by ``read_csv``.
+    """
+    writer = csv.writer(Echo())
+    # The byte order mark makes spreadsheets read the file as UTF-8.
+    yield "\ufeff" + writer.writerow(COLUMNS)
+    for values in exported_rows(user):
+        if values["birthdate"]:
+            values["birthdate"] = values["birthdate"].strftime(BIRTHDATE_FORMAT)
+        values["is_favorite"] = "1" if values["is_favorite"] else "0"
+        yield writer.writerow([values[column] or "" for column in COLUMNS])
+
+
+def vcard_escape(value):
+    return VCARD_SPECIAL_RE.sub(r"\\\1", str(value or "")).replace("\n", "\\n")
+
+
+def vcard_line(name, *values):
+    """
+    Format a vCard property line, folded after VCARD_LINE_LENGTH characters.
+    """
+    line = f"{name}:{';'.join(vcard_escape(value) for value in values)}"
+    folded = [line[i : i + VCARD_LINE_LENGTH] for i in range(0, len(line), VCARD_LINE_LENGTH)]
+    return "\r\n ".join(folded) + "\r\n"
+
+
+def export_vcard(user):
+    """
+    Write the user's contacts as vCard 3.0 cards, readable by ``read_vcard``.
+    """
+    for values in exported_rows(user):
+        lines = [
+            "BEGIN:VCARD\r\n",
+            "VERSION:3.0\r\n",
+            vcard_line("N", values["surname"], values["name"], "", "", ""),
+            vcard_line("FN", f"{values['name']} {values['surname'] or ''}".strip()),
+        ]
+        if values["email"]:
+            lines.append(vcard_line("EMAIL;TYPE=INTERNET", values["email"]))
+        for field, kind in (("mobile_phone", "CELL"), ("work_phone", "WORK"), ("home_phone", "HOME")):
+            if values[field]:
+                lines.append(vcard_line(f"TEL;TYPE={kind}", values[field]))
+        if values["birthdate"]:
+            lines.append(vcard_line("BDAY", values["birthdate"].isoformat()))
+        if values["country"] or values["city"] or values["address"]:
+            lines.append(vcard_line("ADR", "", "", values["address"], values["city"], "", "", values["country"]))
+        for field in ("facebook", "instagram", "tiktok"):
+            if values[field]:
+                lines.append(vcard_line("URL", values[field]))
+        if values["is_favorite"]:
+            lines.append(vcard_line(VCARD_FAVORITE, "TRUE"))
+        lines.append("END:VCARD\r\n")
+        yield "".join(lines)
@@ -8,6 +8,10 @@ urlpatterns = [
     path("", views.main, name="contacts"),
     path("<int:page>", views.main, name="index_paginate"),
     path("add_contact/", views.add_contact, name="add_contact"),
+    path("import/", views.import_contacts, name="import_contacts"),
+    path("export/", views.export_contacts, name="export_contacts"),
+    path("duplicates/", views.duplicates, name="duplicates"),
+    path("merge/", views.merge, name="merge"),
     path("contact_details/<int:contact_id>/", views.contact_details, name="contact_details"),
     path("delete_contact/<int:contact_id>/", views.delete_contact, name="delete_contact"),
     path("contact_update/<int:contact_id>/", views.contact_update, name="contact_update"),
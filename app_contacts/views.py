@@ -1,72 +1,54 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.http import Http404
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.db.models import Q
-from datetime import datetime, timedelta
-from calendar import monthcalendar
-
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from django.template.loader import render_to_string
+from datetime import date, timedelta
+
+from app_connective.cache import cached_page
+from app_connective.pagination import paginate
+from .birthdays import buckets, calendar_months, next_days, this_month, this_week
+from .dedup import MergeError, find_duplicates, merge_contacts
 from .forms import ContactForm, AddressForm
 from .models import Contact, Address
+from .selectors import DETAIL_FIELDS, contact_detail, contact_list, contact_search, editable_contact
+from .transfer import ImportFileError, export_csv, export_vcard, import_rows, read_csv, read_vcard
+
+MAX_GROUPS_SHOWN = 50
+EXPORT_FORMATS = {
+    "csv": (export_csv, "text/csv; charset=utf-8"),
+    "vcf": (export_vcard, "text/vcard; charset=utf-8"),
+}
 
 
 @login_required
+@cached_page("contacts", Contact, Address)
 def main(request, page=1):
     """
-    Display the main contacts page with pagination and search functionality.
+    Display the main contacts page with cursor pagination and search functionality.
 
     Args:
     request (HttpRequest): The request object.
-    page (int, optional): The page number for pagination. Defaults to 1.
+    page (int, optional): Kept for the old page URLs; pages are selected by the cursor GET parameter.
 
     Returns:
     HttpResponse: Rendered contacts page.
     """
-    contacts = (
-        Contact.objects.filter(user=request.user).all().order_by("name")
-        if request.user.is_authenticated
-        else []
-    )
-    total_contacts = contacts.count()
-    if not contacts:
-        error_message = "У вас немає контактів"
-    else:
-        error_message = None
     query = request.GET.get("q")
-
     if query:
-        contacts = Contact.objects.filter(
-            Q(
-                address__in=Address.objects.filter(
-                    Q(country__icontains=query.strip())
-                    | Q(city__icontains=query.strip())
-                    | Q(address__icontains=query.strip())
-                )
-            )
-            | Q(name__icontains=query.strip())
-            | Q(surname__icontains=query.strip())
-            | Q(email__icontains=query.strip())
-            | Q(mobile_phone__icontains=query.strip())
-            | Q(home_phone__icontains=query.strip())
-            | Q(work_phone__icontains=query.strip())
-            | Q(birthdate__icontains=query.strip())
-        ).distinct()
-
-        if not contacts:
-            error_message = "Контактів не знайдено"
-        else:
-            error_message = None
+        contacts_on_page = paginate(request, contact_search(request.user, query), per_page=10)
+        total_contacts = Contact.objects.filter(user=request.user).count()
+    else:
+        contacts_on_page = paginate(request, contact_list(request.user), per_page=10, count="exact")
+        total_contacts = contacts_on_page.count
 
-    per_page = 10
-    paginator = Paginator(contacts, per_page)
-    page = request.GET.get("page", 1)
-    try:
-        contacts_on_page = paginator.page(page)
-    except PageNotAnInteger:
-        contacts_on_page = paginator.page(1)
-    except EmptyPage:
-        contacts_on_page = paginator.page(paginator.num_pages)
+    if not total_contacts:
+        error_message = "У вас немає контактів"
+    elif not contacts_on_page:
+        error_message = "Контактів не знайдено"
+    else:
+        error_message = None
 
     return render(
         request,
@@ -120,6 +102,126 @@ def add_contact(request):
     )
 
 
+@login_required
+def import_contacts(request):
+    """
+    Import contacts from an uploaded CSV or vCard file.
+
+    The format is chosen by the extension of the file: .vcf and .vcard are read as vCard,
+    anything else as CSV. Invalid rows are skipped and listed with their errors.
+
+    Args:
+    request (HttpRequest): The request object.
+
+    Returns:
+    HttpResponse: Rendered import page, with the report after an upload.
+    """
+    report = None
+    if request.method == "POST":
+        upload = request.FILES.get("file")
+        if upload is None:
+            messages.error(request, "Оберіть файл для імпорту.")
+        else:
+            read = read_vcard if upload.name.lower().endswith((".vcf", ".vcard")) else read_csv
+            try:
+                report = import_rows(request.user, read(upload.file))
+            except ImportFileError as error:
+                messages.error(request, f"Не вдалося прочитати файл: {error}")
+            else:
+                messages.success(request, f"Імпортовано контактів: {report.imported}")
+    return render(request, "app_contacts/import_contacts.html", context={"report": report})
+
+
+@login_required
+def export_contacts(request):
+    """
+    Stream all contacts of the user as a CSV or vCard file.
+
+    Args:
+    request (HttpRequest): The request object, with the format "csv" (default) or "vcf".
+
+    Returns:
+    StreamingHttpResponse: The file as an attachment.
+    """
+    file_format = request.GET.get("format", "csv")
+    if file_format not in EXPORT_FORMATS:
+        raise Http404("Невідомий формат")
+    export, content_type = EXPORT_FORMATS[file_format]
+    response = StreamingHttpResponse(export(request.user), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="contacts.{file_format}"'
+    return response
+
+
+@login_required
+def duplicates(request):
+    """
+    Display the groups of duplicate contacts, see ``app_contacts.dedup``.
+
+    With ``format=json`` the groups are returned as lists of contact IDs instead.
+
+    Args:
+    request (HttpRequest): The request object.
+
+    Returns:
+    HttpResponse: Rendered duplicates page with the first MAX_GROUPS_SHOWN groups.
+    """
+    groups = find_duplicates(request.user)
+    if request.GET.get("format") == "json":
+        return JsonResponse({"groups": groups})
+
+    shown = groups[:MAX_GROUPS_SHOWN]
+    contacts = Contact.objects.filter(user=request.user).only(*DETAIL_FIELDS).in_bulk(
+        [contact_id for group in shown for contact_id in group]
+    )
+    return render(
+        request,
+        "app_contacts/duplicates.html",
+        context={
+            "groups": [[contacts[pk] for pk in group if pk in contacts] for group in shown],
+            "total_groups": len(groups),
+        },
+    )
+
+
+@login_required
+@require_POST
+def merge(request):
+    """
+    Merge duplicate contacts into one.
+
+    The POST data holds the ``primary`` contact ID and the ``contacts`` IDs to merge into
+    it, repeated as needed; see ``app_contacts.dedup.merge_contacts``. Requests accepting
+    JSON get the result as JSON, form submissions are redirected to the duplicates page.
+
+    Args:
+    request (HttpRequest): The request object.
+
+    Returns:
+    JsonResponse: The primary contact ID and the number of merged contacts, or the error
+    with status 400.
+    """
+    wants_json = "application/json" in request.headers.get("Accept", "")
+    try:
+        primary_id = int(request.POST.get("primary", ""))
+        contact_ids = {int(contact_id) for contact_id in request.POST.getlist("contacts")} - {primary_id}
+        primary = merge_contacts(request.user, primary_id, contact_ids)
+    except MergeError as error:
+        if wants_json:
+            return JsonResponse({"error": str(error)}, status=400)
+        messages.error(request, f"Не вдалося об'єднати контакти: {error}")
+        return redirect(to="app_contacts:duplicates")
+    except ValueError:
+        if wants_json:
+            return JsonResponse({"error": "Contact IDs must be integers."}, status=400)
+        messages.error(request, "Оберіть основний контакт.")
+        return redirect(to="app_contacts:duplicates")
+
+    if wants_json:
+        return JsonResponse({"primary": primary.pk, "merged": len(contact_ids)})
+    messages.success(request, f"Контакти об'єднано в '{primary.name} {primary.surname}'")
+    return redirect(to="app_contacts:duplicates")
+
+
 @login_required
 def contact_details(request, contact_id):
     """
@@ -132,12 +234,11 @@ def contact_details(request, contact_id):
     Returns:
     HttpResponse: Rendered contact details page.
     """
-    a = get_object_or_404(Contact, id=contact_id)
-    b = get_object_or_404(Address, contact_id=contact_id)
+    contact, address = contact_detail(request.user, contact_id)
     return render(
         request,
         "app_contacts/contact_details.html",
-        context={"Title": "Контактні дані", "contact": a, "address": b},
+        context={"Title": "Контактні дані", "contact": contact, "address": address},
     )
 
 
@@ -153,13 +254,12 @@ def delete_contact(request, contact_id):
     Returns:
     HttpResponse: Redirect to the contacts page.
     """
-    try:
-        a = get_object_or_404(Contact, id=contact_id)
-        a.delete()
-        messages.success(request, f"Контакт '{a.name} {a.surname}' видалено")
-        return redirect(to="app_contacts:contacts")
-    except Contact.DoesNotExist:
-        raise Http404("Контакт не знайдено")
+    contact = get_object_or_404(
+        Contact.objects.only("id", "name", "surname", "user"), id=contact_id, user=request.user
+    )
+    contact.delete()
+    messages.success(request, f"Контакт '{contact.name} {contact.surname}' видалено")
+    return redirect(to="app_contacts:contacts")
 
 
 @login_required
@@ -178,8 +278,7 @@ def contact_update(request, contact_id=None):
     b = None
 
     if contact_id:
-        a = get_object_or_404(Contact, id=contact_id)
-        b = get_object_or_404(Address, contact_id=contact_id)
+        a, b = editable_contact(request.user, contact_id)
 
     if request.method == "POST":
         form = ContactForm(request.POST, instance=a)
@@ -220,6 +319,9 @@ def contact_birthday(request):
     """
     Display contacts with birthdays within a specified period.
 
+    The period is "today", "week" (Monday to Sunday), "month" or "upcoming" (the next
+    ``days`` days, 30 by default). Each period is a single query on the birthday index.
+
     Args:
     request (HttpRequest): The request object.
 
@@ -227,58 +329,29 @@ def contact_birthday(request):
     HttpResponse: Rendered contact birthday page.
     """
     period = request.GET.get("period")
-
-    today = datetime.now()
-    current_month = today.month
-    current_day = today.day
-    passed_this_year = []
-    today_birthdays = []
-    upcoming_this_month = []
+    today = date.today()
+    birthdays = []
 
     if period == "today":
-        contacts = Contact.objects.filter(
-            birthdate__month=current_month,
-            birthdate__day=current_day,
-            user=request.user,
-        )
+        birthdays = next_days(request.user, 1, today)
     elif period == "week":
-        start_date = today - timedelta(days=today.weekday())
-        end_date = start_date + timedelta(days=6)
-        current_year = today.year
-
-        contacts = Contact.objects.filter(
-            Q(birthdate__year=current_year) &
-            Q(birthdate__month=start_date.month) | Q(birthdate__month=end_date.month),
-            Q(birthdate__day__gte=start_date.day) & Q(birthdate__day__lte=end_date.day),
-            user=request.user,
-        )
-
+        birthdays = this_week(request.user, today)
     elif period == "month":
-        passed_this_year = Contact.objects.filter(
-            birthdate__month=current_month,
-            birthdate__day__lt=current_day,
-            user=request.user,
-        )
-        today_birthdays = Contact.objects.filter(
-            birthdate__month=current_month,
-            birthdate__day=current_day,
-            user=request.user,
-        )
-        upcoming_this_month = Contact.objects.filter(
-            birthdate__month=current_month,
-            birthdate__day__gt=current_day,
-            user=request.user,
-        )
-        contacts = []
-    else:
-        contacts = []
-
+        birthdays = this_month(request.user, today)
+    elif period == "upcoming":
+        try:
+            days = min(max(int(request.GET.get("days", 30)), 1), 366)
+        except ValueError:
+            days = 30
+        birthdays = next_days(request.user, days, today)
+
+    split = buckets(birthdays, today)
     context = {
-        "passed_this_year": passed_this_year,
-        "today_birthdays": today_birthdays,
-        "upcoming_this_month": upcoming_this_month,
+        "passed_this_year": split["passed"],
+        "today_birthdays": split["today"],
+        "upcoming_this_month": split["upcoming"],
         "period": period,
-        "birthday_contacts": contacts,
+        "birthday_contacts": birthdays,
     }
     return render(request, "app_contacts/contact_birthday.html", context=context)
 
@@ -288,37 +361,42 @@ def calendar(request):
     """
     Display a calendar with birthday contacts for a specified month and year.
 
+    The ``months`` GET parameter shows up to 12 consecutive months, and ``view=year``
+    shows the whole year. Birthdays are grouped by day in one query and the rendered
+    months are cached per user until one of their contacts changes.
+
     Args:
     request (HttpRequest): The request object.
 
     Returns:
     HttpResponse: Rendered calendar page.
     """
-    year = request.GET.get('year')
-    month = request.GET.get('month')
-
-    today = datetime.now()
-    day_today = today.day
-
-    if month is None or year is None:
-        year = today.year
-        month = today.month
-
-    month = int(month)
-    year = int(year)
-
-    cal_date = monthcalendar(year, month)
-
-    birthday_contacts = Contact.objects.filter(
-        user=request.user,
-        birthdate__month=month,
-        birthdate__year__lte=year
-    )
+    today = date.today()
+    try:
+        year = int(request.GET.get("year", today.year))
+        month = int(request.GET.get("month", today.month))
+        count = int(request.GET.get("months", 1))
+    except ValueError:
+        year, month, count = today.year, today.month, 1
+    # Keeps the previous and the next month of the shown ones within the supported dates.
+    if not (2 <= year <= 9998 and 1 <= month <= 12):
+        year, month = today.year, today.month
+    if request.GET.get("view") == "year":
+        month, count = 1, 12
+    count = min(max(count, 1), 12)
+
+    def render_month(first, weeks):
+        return render_to_string("app_contacts/calendar_month.html", {"first": first, "weeks": weeks})
+
+    months = calendar_months(request.user, year, month, count, render_month, today)
+    first = months[0][0]
+    previous_month = first - timedelta(days=1)
+    next_month = months[-1][0] + timedelta(days=31)
     context = {
-        'day_today': day_today,
-        'calendar': cal_date,
-        'birthday_contacts': birthday_contacts
+        "months": months,
+        "year": first.year,
+        "count": count,
+        "previous_month": previous_month.replace(day=1),
+        "next_month": next_month.replace(day=1),
     }
-
-    return render(request, 'app_contacts/calendar.html', context=context)
-
+    return render(request, "app_contacts/calendar.html", context=context)
@@ -0,0 +1,181 @@
+"""
+Content-addressed storage of user files.
+
+The content of user files is stored once per SHA-256 as a ``FileBlob``, which counts
+the user files pointing at it. ``attach`` stores new content only when no blob has its
+digest yet, before the short transaction that records it, and ``release`` removes a
+blob and queues its stored file and thumbnails for deletion (see ``app_files.cleanup``)
+once its count drops to zero, when the last user file pointing at it is deleted (see
+``app_files.signals``). Blob rows are locked while their count changes, so concurrent
+uploads and deletes of the same content agree on whether it is still stored.
+
+Files uploaded before deduplication have no blob and keep their own stored file until
+the ``dedupe_files`` command moves them to blobs.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .classifier import EXTENSION_TYPES, SNIFF_SIZE, get_file_type, storage_name
+from .cleanup import queue_deletion
+from .models import FileBlob, StorageDeletion
+from .thumbnails import schedule_thumbnails
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 64 * 1024
+# Stored content no blob refers to after this long is deleted, see store_content.
+UNCLAIMED_CONTENT_DELAY = timedelta(hours=1)
+
+
+def content_sha256(content):
+    """
+    Hash a file in blocks and rewind it.
+
+    Args:
+    content (File): The file to hash.
+
+    Returns:
+    str: The SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    content.seek(0)
+    for block in iter(lambda: content.read(BLOCK_SIZE), b""):
+        digest.update(block)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(sha256, filename):
+    return f"blobs/{sha256[:2]}/{sha256}{Path(storage_name(filename)).suffix}"
+
+
+def read_head(content):
+    """
+    Read the first bytes of a file for sniffing its type and rewind it.
+    """
+    content.seek(0)
+    head = content.read(SNIFF_SIZE)
+    content.seek(0)
+    return head
+
+
+def store_content(content, sha256):
+    """
+    Store the content of a file under its blob name, unless a blob has it already.
+
+    The content is stored before the transaction recording its blob, so a slow storage
+    does not hold database locks, and it is queued for deletion after
+    UNCLAIMED_CONTENT_DELAY right away. ``acquire_blob`` drops the queued deletion once a
+    blob refers to the file; if its transaction rolls back instead, the file is deleted.
+    Has to run outside a transaction.
+
+    Args:
+    content (File): The file, with a name for the extension of the stored file.
+    sha256 (str): The SHA-256 hex digest of the content.
+
+    Returns:
+    str: The name of the stored file, or None if a blob already has the content.
+    """
+    if FileBlob.objects.filter(sha256=sha256).exists():
+        return None
+    name = default_storage.save(blob_name(sha256, content.name), content)
+    queue_deletion([name], delay=UNCLAIMED_CONTENT_DELAY)
+    return name
+
+
+def acquire_blob(sha256, stored, size):
+    """
+    Add a reference to the blob with the given content, creating the blob for the content
+    ``store_content`` stored when there is none. Has to run in a transaction.
+
+    Args:
+    sha256 (str): The SHA-256 hex digest of the content.
+    stored (str): The name returned by ``store_content``.
+    size (int): The size of the content in bytes.
+
+    Returns:
+    FileBlob: The blob, with the new reference counted, or None if the blob was deleted
+    since ``store_content`` found it and the content has to be stored again.
+    """
+    blob = FileBlob.objects.select_for_update().filter(sha256=sha256).first()
+    if blob is None and stored:
+        try:
+            with transaction.atomic():
+                blob = FileBlob.objects.create(sha256=sha256, file=stored, size=size)
+        except IntegrityError:
+            # Stored concurrently by another upload; the queued deletion removes this copy.
+            blob = FileBlob.objects.select_for_update().get(sha256=sha256)
+    if blob is None:
+        return None
+    if blob.file.name == stored:
+        StorageDeletion.objects.filter(name=stored).delete()
+    FileBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+    blob.ref_count += 1
+    return blob
+
+
+def attach(user_file, content, sha256=None, head=None):
+    """
+    Save a user file with the given content, sharing the stored content with every file
+    that has the same, and classify it by its name or, for unknown extensions, its content.
+    Has to run outside a transaction, see ``store_content``.
+
+    Args:
+    user_file (UserFile): The unsaved user file.
+    content (File): The content, named as the user named the file.
+    sha256 (str, optional): The SHA-256 hex digest of the content, computed if missing.
+    head (bytes, optional): The first bytes of the content, read if needed and missing.
+
+    Returns:
+    UserFile: The saved user file.
+    """
+    sha256 = sha256 or content_sha256(content)
+    blob = None
+    while blob is None:
+        stored = store_content(content, sha256)
+        with transaction.atomic():
+            blob = acquire_blob(sha256, stored, content.size)
+            if blob is None:
+                continue
+            user_file.blob = blob
+            user_file.filepath = blob.file.name
+            user_file.filename = Path(content.name).name
+            if head is None and Path(user_file.filename).suffix.lower() not in EXTENSION_TYPES:
+                head = read_head(content)
+            user_file.file_type = get_file_type(user_file.filename, head)
+            user_file.save()
+            schedule_thumbnails(user_file)
+    return user_file
+
+
+def release(blob_id):
+    """
+    Drop a reference to a blob, and with the last one delete the blob and queue its stored
+    file and thumbnails for deletion.
+
+    Args:
+    blob_id (int): The ID of the blob.
+    """
+    with transaction.atomic():
+        blob = FileBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            FileBlob.objects.filter(pk=blob_id).update(ref_count=F("ref_count") - 1)
+            return
+        references = blob.user_files.count()
+        if references:
+            # The count drifted, e.g. through rows written around acquire_blob. Keep the
+            # blob and correct the count; reconcile_storage corrects all of them.
+            logger.warning("Blob %s had no references counted but %s user files", blob_id, references)
+            FileBlob.objects.filter(pk=blob_id).update(ref_count=references)
+            return
+        names = [blob.file.name, *blob.thumbnails.values()]
+        blob.delete()
+        queue_deletion(names)
@@ -0,0 +1,85 @@
+"""
+File browser queries.
+
+A listing filters the user's files by search text and upload dates, counts the
+matches of every file type in one aggregate query, and pages through the matches of
+the selected type (or of all types) with cursors, reading only the columns the
+listing shows.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Count, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import FILE_TYPES, UserFile
+
+# Keyset orderings by sort name; each ends with the unique id.
+SORTS = {
+    "newest": ("-uploaded_at", "-id"),
+    "oldest": ("uploaded_at", "id"),
+    "name": ("sort_name", "id"),
+    "-name": ("-sort_name", "-id"),
+}
+LISTED_FIELDS = ("id", "filename", "file_description", "file_type", "uploaded_at", "blob__thumbnails")
+
+
+def matching_files(user, query="", start=None, end=None):
+    """
+    Return the user's files matching a search text and a range of upload dates.
+
+    Args:
+    user (User): The owner of the files.
+    query (str, optional): Text the name or the description has to contain.
+    start (date, optional): The first upload day.
+    end (date, optional): The last upload day, included; ``date.max`` sets no limit.
+
+    Returns:
+    QuerySet: The matching files of every type.
+    """
+    files = UserFile.objects.filter(user=user)
+    query = query.strip()
+    if query:
+        files = files.filter(Q(filename__icontains=query) | Q(file_description__icontains=query))
+    # Compared as datetimes, so the (user, file_type, uploaded_at) index still applies.
+    if start:
+        files = files.filter(uploaded_at__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    # The day after the last possible one does not exist, and every upload is before it.
+    if end and end < date.max:
+        files = files.filter(uploaded_at__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+    return files
+
+
+def type_counts(files):
+    """
+    Count files by type in a single query.
+
+    Args:
+    files (QuerySet): The files, as returned by ``matching_files``.
+
+    Returns:
+    dict: The number of files of every type in FILE_TYPES, and of all of them under "all".
+    """
+    counts = {file_type: Count("pk", filter=Q(file_type=file_type)) for file_type in FILE_TYPES}
+    return files.order_by().aggregate(all=Count("pk"), **counts)
+
+
+def listed_files(files, file_type=None, sort="newest"):
+    """
+    Narrow matching files to a type and order them for a listing.
+
+    Args:
+    files (QuerySet): The files, as returned by ``matching_files``.
+    file_type (str, optional): One of FILE_TYPES, or None for every type.
+    sort (str, optional): One of SORTS.
+
+    Returns:
+    tuple: The QuerySet, with only the listed columns and the blobs for thumbnails, and
+    its keyset ordering.
+    """
+    if file_type:
+        files = files.filter(file_type=file_type)
+    if sort in ("name", "-name"):
+        # Keyset values must not be NULL.
+        files = files.annotate(sort_name=Coalesce("filename", Value("")))
+    return files.select_related("blob").only(*LISTED_FIELDS), SORTS[sort]
@@ -0,0 +1,206 @@
+"""
+File type classification.
+
+A file is classified by its extension, looked up case-insensitively in
+``EXTENSION_TYPES``, a map built once from ``FILE_TYPES``. Files with an unknown or
+missing extension can also be classified by sniffing the first bytes of their
+content against the magic numbers in ``SIGNATURES``, which the upload handler and
+the chunked uploads keep while the file streams in.
+
+Cyrillic names are transliterated to Latin for the names files are stored under, see
+``storage_name``; the name a user gave a file is kept for display.
+"""
+import re
+from pathlib import Path
+
+CYRILLIC_SYMBOLS = "абвгдеёжзийклмнопрстуфхцчшщъыьэюяєіїґ"
+TRANSLATION = (
+    "a",
+    "b",
+    "v",
+    "g",
+    "d",
+    "e",
+    "e",
+    "j",
+    "z",
+    "i",
+    "j",
+    "k",
+    "l",
+    "m",
+    "n",
+    "o",
+    "p",
+    "r",
+    "s",
+    "t",
+    "u",
+    "f",
+    "h",
+    "ts",
+    "ch",
+    "sh",
+    "sch",
+    "",
+    "y",
+    "",
+    "e",
+    "yu",
+    "ja",
+    "je",
+    "i",
+    "ji",
+    "g",
+)
+
+image_files = {".jpeg", ".png", ".jpg", ".svg", ".bmp", ".ico", ".gif", ".webp", ".tif", ".tiff", ".heic"}
+video_files = {".mp4", ".mov", ".webm", ".avi", ".mkv", ".wmv", ".flv", ".m4v", ".mpeg", ".mpg", ".3gp"}
+audio_files = {".mp3", ".wav", ".m4a", ".aiff", ".ogg", ".cda", ".flac", ".aac", ".opus", ".wma"}
+document_files = {
+    ".docx",
+    ".doc",
+    ".pptx",
+    ".xlsx",
+    ".xls",
+    ".html",
+    ".htm",
+    ".html5",
+    ".txt",
+    ".ini",
+    ".xml",
+    ".ppt",
+    ".py",
+    ".md",
+    ".toml",
+    ".yml",
+    ".yaml",
+    ".json",
+    ".cpp",
+    ".h",
+    ".java",
+    ".css",
+    ".js",
+    ".csv",
+    ".pdf",
+    ".rtf",
+    ".odt",
+    ".ods",
+    ".odp",
+}
+archive_files = {".rar", ".rar4", ".zip", ".tar", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".apk", ".dmg", ".jar"}
+other_files = set()
+
+
+FILE_TYPES = {
+    "image": image_files,
+    "video": video_files,
+    "audio": audio_files,
+    "document": document_files,
+    "archive": archive_files,
+    "other": other_files,
+}
+
+EXTENSION_TYPES = {
+    extension: file_type for file_type, extensions in FILE_TYPES.items() for extension in extensions
+}
+
+TRANSLITERATION = str.maketrans(
+    {
+        **{ord(cyrillic): latin for cyrillic, latin in zip(CYRILLIC_SYMBOLS, TRANSLATION)},
+        **{ord(cyrillic.upper()): latin.capitalize() for cyrillic, latin in zip(CYRILLIC_SYMBOLS, TRANSLATION)},
+    }
+)
+UNSAFE_CHARACTERS = re.compile(r"[^A-Za-z0-9._-]+")
+
+# How many leading bytes sniffing needs.
+SNIFF_SIZE = 262
+# (offset, magic number, MIME type, file type), checked in order.
+SIGNATURES = (
+    (0, b"\xff\xd8\xff", "image/jpeg", "image"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png", "image"),
+    (0, b"GIF87a", "image/gif", "image"),
+    (0, b"GIF89a", "image/gif", "image"),
+    (8, b"WEBP", "image/webp", "image"),
+    (0, b"BM", "image/bmp", "image"),
+    (0, b"\x00\x00\x01\x00", "image/vnd.microsoft.icon", "image"),
+    (0, b"II*\x00", "image/tiff", "image"),
+    (0, b"MM\x00*", "image/tiff", "image"),
+    (8, b"AVI ", "video/x-msvideo", "video"),
+    (8, b"WAVE", "audio/wav", "audio"),
+    (8, b"M4A ", "audio/mp4", "audio"),
+    (4, b"ftyp", "video/mp4", "video"),
+    (0, b"\x1a\x45\xdf\xa3", "video/x-matroska", "video"),
+    (0, b"FLV", "video/x-flv", "video"),
+    (0, b"ID3", "audio/mpeg", "audio"),
+    (0, b"\xff\xfb", "audio/mpeg", "audio"),
+    (0, b"fLaC", "audio/flac", "audio"),
+    (0, b"OggS", "audio/ogg", "audio"),
+    (0, b"%PDF-", "application/pdf", "document"),
+    (0, b"{\\rtf", "application/rtf", "document"),
+    (0, b"PK\x03\x04", "application/zip", "archive"),
+    (0, b"Rar!\x1a\x07", "application/vnd.rar", "archive"),
+    (0, b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed", "archive"),
+    (0, b"\x1f\x8b", "application/gzip", "archive"),
+    (0, b"BZh", "application/x-bzip2", "archive"),
+    (0, b"\xfd7zXZ\x00", "application/x-xz", "archive"),
+    (257, b"ustar", "application/x-tar", "archive"),
+)
+
+
+def sniff(head):
+    """
+    Identify content by the magic number in its first bytes.
+
+    Args:
+    head (bytes): At least the first SNIFF_SIZE bytes of the content, or all of it.
+
+    Returns:
+    tuple: The MIME type and the file type, or (None, None) for unknown content.
+    """
+    for offset, magic, mime_type, file_type in SIGNATURES:
+        if head.startswith(magic, offset):
+            return mime_type, file_type
+    if b"<svg" in head[:SNIFF_SIZE].lower():
+        return "image/svg+xml", "image"
+    return None, None
+
+
+def get_file_type(filename, head=None):
+    """
+    Determines the file type of file based on its extension, or on its first bytes when
+    the extension is not known.
+
+    Args:
+    filename (str): The name of the file.
+    head (bytes, optional): The first bytes of the content, see ``sniff``.
+
+    Returns:
+    str: The determined file type, or 'other' if the file type cannot be determined.
+    """
+    file_type = EXTENSION_TYPES.get(Path(filename).suffix.lower())
+    if file_type is None and head:
+        file_type = sniff(head)[1]
+    return file_type or "other"
+
+
+def transliterate(text):
+    return text.translate(TRANSLITERATION)
+
+
+def storage_name(filename):
+    """
+    Turn a file name into one that is safe in storage names and URLs: Cyrillic letters
+    are transliterated, other characters outside [A-Za-z0-9._-] become "_" and the
+    extension is lowercased.
+
+    Args:
+    filename (str): The name of the file; directories are dropped.
+
+    Returns:
+    str: The safe name, "file" if nothing is left of the stem.
+    """
+    path = Path(filename)
+    stem = UNSAFE_CHARACTERS.sub("_", transliterate(path.stem)).strip("._") or "file"
+    suffix = UNSAFE_CHARACTERS.sub("", transliterate(path.suffix)).lower()
+    return f"{stem}{suffix}"
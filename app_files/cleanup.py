@@ -0,0 +1,155 @@
+"""
+Deletion of stored files.
+
+Files are never deleted from the storage inside a request. The transaction that stops
+referencing a file queues its name as a ``StorageDeletion`` instead, so the deletion
+is recorded exactly when the reference is gone, whether the transaction deleted one
+file, a blob or a whole user.
+
+Once the transaction commits, a background thread of the process drains the due
+deletions (with ``STORAGE_CLEANUP_ON_COMMIT``), and the ``process_storage_deletions``
+command drains whatever is left, e.g. after a crash. Deletions are taken in batches
+locked with SKIP LOCKED, so several workers can run at once, and go through the
+storage API, in one call per batch where the storage has ``delete_many``. Failed
+deletions are retried with exponential backoff up to ``MAX_ATTEMPTS`` times.
+
+A name that is referenced again when its deletion comes up, e.g. the thumbnail of
+content uploaded anew, is dropped from the queue without being deleted.
+"""
+import logging
+import threading
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .models import FileBlob, StorageDeletion, UserFile
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 12
+MAX_RETRY_DELAY = timedelta(days=1)
+
+_drain_lock = threading.Lock()
+
+
+def queue_deletion(names, delay=None):
+    """
+    Queue stored files for deletion once the current transaction commits.
+
+    Args:
+    names (iterable): The names of the files in the storage.
+    delay (timedelta, optional): How long to wait before deleting them.
+    """
+    names = {name for name in names if name}
+    if not names:
+        return
+    due = timezone.now() + (delay or timedelta())
+    StorageDeletion.objects.bulk_create(
+        [StorageDeletion(name=name, next_attempt_at=due) for name in names], ignore_conflicts=True
+    )
+    if settings.STORAGE_CLEANUP_ON_COMMIT and not delay:
+        transaction.on_commit(start_drain)
+
+
+def start_drain():
+    # One draining thread per process is enough; it picks up what is queued meanwhile.
+    if not _drain_lock.acquire(blocking=False):
+        return
+    if connection.vendor == "sqlite":
+        # SQLite has a single writer, which a thread would have to wait for.
+        drain()
+    else:
+        threading.Thread(target=drain, kwargs={"in_thread": True}, daemon=True).start()
+
+
+def drain(in_thread=False):
+    try:
+        while process_deletions()[0]:
+            pass
+    except Exception:
+        logger.exception("Deleting stored files failed")
+    finally:
+        if in_thread:
+            connections.close_all()
+        _drain_lock.release()
+
+
+def retry_delay(attempts):
+    return min(timedelta(minutes=2 ** attempts), MAX_RETRY_DELAY)
+
+
+def referenced_names(names):
+    """
+    Return those of the names that user files, blobs or thumbnails refer to.
+    """
+    referenced = set(FileBlob.objects.filter(file__in=names).values_list("file", flat=True))
+    referenced |= set(UserFile.objects.filter(filepath__in=names).values_list("filepath", flat=True))
+    # Blob files and thumbnails are named after the content, see blobs.blob_name and thumbnails.thumbnail_name.
+    digests = {Path(name).stem.split("-")[0] for name in names}
+    for thumbnails in FileBlob.objects.filter(sha256__in=digests).values_list("thumbnails", flat=True):
+        referenced |= set(thumbnails.values())
+    return referenced & set(names)
+
+
+def delete_stored(storage, names):
+    """
+    Delete files from a storage.
+
+    Returns:
+    dict: The error of every file that could not be deleted by name.
+    """
+    if hasattr(storage, "delete_many"):
+        try:
+            return storage.delete_many(names)
+        except Exception as error:
+            return {name: repr(error) for name in names}
+    errors = {}
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception as error:
+            errors[name] = repr(error)
+    return errors
+
+
+def process_deletions(batch_size=BATCH_SIZE, storage=default_storage):
+    """
+    Delete one batch of the due stored files.
+
+    Args:
+    batch_size (int, optional): The most files to delete.
+    storage (Storage, optional): The storage of the files.
+
+    Returns:
+    tuple: The number of files processed and of them failed.
+    """
+    with transaction.atomic():
+        batch = list(
+            StorageDeletion.objects.select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=timezone.now(), attempts__lt=MAX_ATTEMPTS)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+        names = [entry.name for entry in batch]
+        referenced = referenced_names(names)
+        errors = delete_stored(storage, [name for name in names if name not in referenced])
+
+        failed = []
+        now = timezone.now()
+        for entry in batch:
+            if entry.name in errors:
+                entry.attempts += 1
+                entry.last_error = str(errors[entry.name])
+                entry.next_attempt_at = now + retry_delay(entry.attempts)
+                failed.append(entry)
+        StorageDeletion.objects.filter(pk__in=[entry.pk for entry in batch if entry.name not in errors]).delete()
+        StorageDeletion.objects.bulk_update(failed, ["attempts", "last_error", "next_attempt_at"])
+    for entry in failed:
+        logger.warning("Deleting %s failed (attempt %s): %s", entry.name, entry.attempts, entry.last_error)
+    return len(batch), len(failed)
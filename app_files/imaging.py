@@ -0,0 +1,126 @@
+"""
+Rendering of image thumbnails and video poster frames.
+
+The functions here only turn a source file into encoded images. They import nothing
+from Django, so they can run in worker processes started with "spawn", which do not
+set Django up (see ``app_files.thumbnails``).
+
+Thumbnails need Pillow and posters additionally the ``ffmpeg`` binary. Without them
+nothing is rendered and the listings keep showing the originals.
+"""
+import io
+import shutil
+import subprocess
+import tempfile
+import urllib.request
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_QUALITY = 80
+POSTER_TIMEOUT = 60
+
+
+def open_source(source):
+    """
+    Open a source for reading: a local path, or an URL that is downloaded to a
+    temporary file first.
+    """
+    if "://" not in source:
+        return open(source, "rb")
+    downloaded = tempfile.TemporaryFile()
+    with urllib.request.urlopen(source, timeout=POSTER_TIMEOUT) as response:
+        shutil.copyfileobj(response, downloaded)
+    downloaded.seek(0)
+    return downloaded
+
+
+def render_thumbnails(file, widths):
+    """
+    Render thumbnails of an image at the given widths.
+
+    The image is decoded once, at a reduced scale where the format allows it, and every
+    thumbnail is resized from the next larger one. Widths not smaller than the image
+    are skipped, so images are never upscaled.
+
+    Args:
+    file: File-like object with the image.
+    widths (iterable): The widths of the thumbnails in pixels.
+
+    Returns:
+    dict: The encoded thumbnails by width; empty if Pillow is missing or the image
+    cannot be read.
+    """
+    if Image is None:
+        return {}
+    try:
+        image = Image.open(file)
+        largest = max(widths)
+        image.draft("RGB", (largest, largest * image.height // max(image.width, 1)))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return {}
+
+    thumbnails = {}
+    for width in sorted(widths, reverse=True):
+        if width >= image.width:
+            continue
+        image = image.resize((width, max(round(image.height * width / image.width), 1)), Image.LANCZOS)
+        encoded = io.BytesIO()
+        image.save(encoded, THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY, method=4)
+        thumbnails[width] = encoded.getvalue()
+    return thumbnails
+
+
+def render_poster(source, widths):
+    """
+    Render thumbnails of a frame one second into a video, or of its first frame for
+    shorter videos.
+
+    Args:
+    source (str): Local path or URL of the video, passed to ffmpeg as is.
+    widths (iterable): The widths of the thumbnails in pixels.
+
+    Returns:
+    dict: The encoded thumbnails by width; empty if ffmpeg or Pillow is missing or no
+    frame could be extracted.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None or Image is None:
+        return {}
+    for seek in ("1", "0"):
+        try:
+            result = subprocess.run(
+                [ffmpeg, "-v", "error", "-ss", seek, "-i", source, "-frames:v", "1"]
+                + ["-f", "image2pipe", "-vcodec", "png", "-"],
+                capture_output=True,
+                timeout=POSTER_TIMEOUT,
+            )
+        except subprocess.TimeoutExpired:
+            return {}
+        if result.returncode == 0 and result.stdout:
+            return render_thumbnails(io.BytesIO(result.stdout), widths)
+    return {}
+
+
+def render_derivatives(source, kind, widths):
+    """
+    Render the thumbnails of an image or the poster thumbnails of a video. Runs in a
+    worker process.
+
+    Args:
+    source (str): Local path or URL of the original.
+    kind (str): "image" or "video".
+    widths (iterable): The widths of the thumbnails in pixels.
+
+    Returns:
+    dict: The encoded thumbnails by width.
+    """
+    if kind == "video":
+        return render_poster(source, widths)
+    with open_source(source) as file:
+        return render_thumbnails(file, widths)
@@ -0,0 +1,59 @@
+import timeit
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from app_files.classifier import CYRILLIC_SYMBOLS, FILE_TYPES, SIGNATURES, TRANSLATION, get_file_type, sniff
+
+
+def linear_file_type(filename):
+    """
+    The classifier as it was before the extension map: it builds the transliteration table
+    on every call and scans every type's extensions in turn, case-sensitively.
+    """
+    extension = Path(filename).suffix
+    trans = {}
+    for cyrillic, latin in zip(CYRILLIC_SYMBOLS, TRANSLATION):
+        trans[ord(cyrillic)] = latin
+        trans[ord(cyrillic.lower())] = latin.lower()
+
+    for file_type, extensions in FILE_TYPES.items():
+        if extension in extensions:
+            return file_type
+    return "other"
+
+
+def synthetic_names(count=1000):
+    """
+    Build file names with a spread of known, upper-case, Cyrillic and unknown extensions.
+    """
+    extensions = sorted(set().union(*FILE_TYPES.values()))
+    extensions += [extension.upper() for extension in extensions[::4]] + [".bin", ".dat", ""]
+    return [f"Файл_{n}{extensions[n % len(extensions)]}" for n in range(count)]
+
+
+class Command(BaseCommand):
+    help = "Compare the time per file name of the file type classifier with the linear scan it replaced."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=1000, help="File names to classify.")
+        parser.add_argument("--repeat", type=int, default=20, help="Passes over the file names.")
+
+    def handle(self, *args, count, repeat, **options):
+        names = synthetic_names(count)
+        heads = [magic.rjust(offset + len(magic), b"\0").ljust(64, b"\0") for offset, magic, _, _ in SIGNATURES]
+        benchmarks = {
+            "linear scan": lambda: [linear_file_type(name) for name in names],
+            "extension map": lambda: [get_file_type(name) for name in names],
+            "sniffing": lambda: [sniff(head) for head in heads],
+        }
+        fixed = sum(linear_file_type(name) != get_file_type(name) for name in names)
+        self.stdout.write(f"{fixed} of {len(names)} names classified differently from the linear scan.")
+
+        baseline = None
+        for label, benchmark in benchmarks.items():
+            calls = len(heads) if label == "sniffing" else len(names)
+            per_call = timeit.timeit(benchmark, number=repeat) / repeat / calls * 1_000_000
+            baseline = baseline or per_call
+            speedup = "" if label == "sniffing" else f"  x{baseline / per_call:.1f} vs linear scan"
+            self.stdout.write(f"{label:14} {per_call:8.3f} µs/call{speedup}")
@@ -0,0 +1,88 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from app_files.blobs import content_sha256
+from app_files.cleanup import queue_deletion
+from app_files.models import FileBlob, UserFile
+
+
+class Command(BaseCommand):
+    help = (
+        "Hash the user files stored before deduplication, point them at content-addressed "
+        "blobs, delete the duplicate copies and recount the references of every blob."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report what would be deduplicated."
+        )
+
+    def handle(self, *args, dry_run=False, **options):
+        legacy = (
+            UserFile.objects.filter(blob__isnull=True)
+            .exclude(filepath="")
+            .order_by("pk")
+            .values_list("pk", "filepath")
+        )
+        seen = {}
+        adopted = duplicates = missing = freed = 0
+        for pk, name in legacy.iterator():
+            try:
+                with default_storage.open(name) as content:
+                    sha256 = content_sha256(content)
+                    size = content.size
+            except OSError as error:
+                self.stderr.write(f"Skipped file {pk}: {error}")
+                missing += 1
+                continue
+
+            if dry_run:
+                if sha256 not in seen:
+                    seen[sha256] = FileBlob.objects.filter(sha256=sha256).values_list("file", flat=True).first()
+                blob_file = seen[sha256]
+                seen[sha256] = blob_file or name
+            else:
+                blob_file = self.move_to_blob(pk, name, sha256, size)
+            if blob_file and blob_file != name:
+                duplicates += 1
+                freed += size
+            elif not blob_file:
+                adopted += 1
+
+        if not dry_run:
+            references = (
+                UserFile.objects.filter(blob=OuterRef("pk"))
+                .order_by()
+                .values("blob")
+                .annotate(count=Count("pk"))
+                .values("count")
+            )
+            FileBlob.objects.update(ref_count=Coalesce(Subquery(references), 0))
+
+        prefix = "Would free" if dry_run else "Freed"
+        self.stdout.write(
+            f"{adopted} files became blobs, {duplicates} duplicates, {missing} missing. "
+            f"{prefix} {freed} bytes."
+        )
+
+    def move_to_blob(self, pk, name, sha256, size):
+        """
+        Point a legacy file at the blob of its content, adopting its stored file as the
+        blob when the content is new and deleting it when a blob already holds it.
+
+        Returns:
+        str: The stored file of the existing blob, or None if the file became the blob.
+        """
+        with transaction.atomic():
+            blob = FileBlob.objects.select_for_update().filter(sha256=sha256).first()
+            blob_file = blob.file.name if blob else None
+            if blob is None:
+                blob = FileBlob.objects.create(sha256=sha256, file=name, size=size)
+            UserFile.objects.filter(pk=pk).update(blob=blob, filepath=blob.file.name)
+            FileBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") + 1)
+            if blob_file and blob_file != name:
+                queue_deletion([name])
+        return blob_file
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from app_files.uploads import discard_expired_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete the resumable uploads that received nothing for FILE_UPLOAD_SESSION_HOURS and their staged data."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Discarded {discard_expired_uploads()} uploads.")
@@ -0,0 +1,47 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app_files.imaging import render_derivatives
+from app_files.models import UserFile
+from app_files.thumbnails import THUMBNAIL_WIDTHS, has_thumbnails, save_thumbnails, source_of
+
+
+class Command(BaseCommand):
+    help = "Render the missing thumbnails of image files and the poster thumbnails of video files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=max(settings.THUMBNAIL_WORKERS, 1),
+            help="The number of rendering processes.",
+        )
+
+    def handle(self, *args, workers, **options):
+        files = (
+            UserFile.objects.filter(blob__isnull=False, blob__thumbnails={}, file_type__in=("image", "video"))
+            .select_related("blob")
+            .only("filename", "file_type", "blob__sha256", "blob__file")
+        )
+        pending = {}
+        for user_file in files.iterator():
+            if has_thumbnails(user_file.file_type, user_file.filename):
+                pending.setdefault(user_file.blob_id, (user_file.blob, user_file.file_type))
+
+        rendered = 0
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {
+                pool.submit(render_derivatives, source_of(blob), file_type, THUMBNAIL_WIDTHS): blob.pk
+                for blob, file_type in pending.values()
+            }
+            for future in as_completed(futures):
+                try:
+                    names = save_thumbnails(futures[future], future.result())
+                except Exception as error:
+                    self.stderr.write(f"Skipped blob {futures[future]}: {error}")
+                    continue
+                rendered += bool(names)
+        self.stdout.write(f"Rendered the thumbnails of {rendered} of {len(pending)} blobs.")
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_files.cleanup import BATCH_SIZE, process_deletions
+
+
+class Command(BaseCommand):
+    help = "Delete the queued stored files that are due, retrying failed deletions later."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=BATCH_SIZE, help="The most files to delete per batch."
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running and look for due deletions every INTERVAL seconds.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = failed = 0
+            while True:
+                batch, batch_failed = process_deletions(options["batch_size"])
+                if not batch:
+                    break
+                processed += batch
+                failed += batch_failed
+            if processed:
+                self.stdout.write(f"Processed {processed} deletions, {failed} failed and will be retried.")
+
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
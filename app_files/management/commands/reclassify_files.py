@@ -0,0 +1,64 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from app_connective.cache import bump_version
+from app_files.classifier import SNIFF_SIZE, get_file_type
+from app_files.models import UserFile
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Classify the stored user files again, e.g. after the extension map changed, "
+        "and update the types that differ in batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sniff",
+            action="store_true",
+            help="Read the first bytes of the files with unknown extensions to classify them by content.",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Files updated per query.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would change.")
+
+    def handle(self, *args, sniff, batch_size, dry_run, **options):
+        files = UserFile.objects.order_by("pk").only("pk", "user_id", "filename", "filepath", "file_type", "blob__file")
+        changed = {}
+        batch = []
+        checked = 0
+        for user_file in files.select_related("blob").iterator(chunk_size=batch_size):
+            checked += 1
+            file_type = get_file_type(user_file.filename or user_file.filepath.name)
+            if file_type == "other" and sniff:
+                file_type = get_file_type(user_file.filename or "", self.head(user_file))
+            if file_type == user_file.file_type:
+                continue
+            changed[(user_file.file_type, file_type)] = changed.get((user_file.file_type, file_type), 0) + 1
+            user_file.file_type = file_type
+            batch.append(user_file)
+            if len(batch) == batch_size:
+                self.update(batch, dry_run)
+                batch = []
+        self.update(batch, dry_run)
+
+        for (old, new), count in sorted(changed.items()):
+            self.stdout.write(f"{old} -> {new}: {count}")
+        verb = "Would reclassify" if dry_run else "Reclassified"
+        self.stdout.write(f"{verb} {sum(changed.values())} of {checked} files.")
+
+    def head(self, user_file):
+        name = user_file.blob.file.name if user_file.blob_id else user_file.filepath.name
+        try:
+            with default_storage.open(name) as content:
+                return content.read(SNIFF_SIZE)
+        except OSError as error:
+            self.stderr.write(f"Skipped sniffing file {user_file.pk}: {error}")
+            return None
+
+    def update(self, batch, dry_run):
+        if batch and not dry_run:
+            UserFile.objects.bulk_update(batch, ["file_type"])
+            for user_id in {user_file.user_id for user_file in batch if user_file.user_id}:
+                bump_version(user_id, UserFile)
@@ -0,0 +1,116 @@
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from app_files.cleanup import BATCH_SIZE, MAX_ATTEMPTS, queue_deletion, referenced_names
+from app_files.models import FileBlob, StorageDeletion, UserFile
+
+# The storage directories holding content-addressed files, see app_files.blobs and app_files.thumbnails.
+SCANNED_DIRECTORIES = ("blobs", "thumbs")
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the blobs no user file refers to, correct the reference counts of the others and "
+        "queue their stored files for deletion. Works in short batches, so requests are not blocked."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=60,
+            help="Leave blobs and stored files younger than MIN_AGE minutes alone.",
+        )
+        parser.add_argument(
+            "--scan-storage",
+            action="store_true",
+            help="Also queue the stored files in the blob and thumbnail directories that nothing refers to. "
+            "Needs a storage with local paths.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be done.")
+
+    def handle(self, *args, min_age, scan_storage, dry_run, **options):
+        grace = timedelta(minutes=min_age)
+        self.stdout.write(f"{self.purge_orphaned_blobs(timezone.now() - grace, dry_run)} orphaned blobs.")
+        if not dry_run:
+            self.stdout.write(f"Corrected the reference count of {self.recount()} blobs.")
+        if scan_storage:
+            self.stdout.write(f"{self.scan_storage(grace, dry_run)} unreferenced stored files.")
+        stuck = StorageDeletion.objects.filter(attempts__gte=MAX_ATTEMPTS).count()
+        if stuck:
+            self.stderr.write(f"{stuck} queued deletions failed {MAX_ATTEMPTS} times; see their last_error.")
+
+    def purge_orphaned_blobs(self, created_before, dry_run):
+        orphans = FileBlob.objects.filter(created_at__lt=created_before).exclude(
+            Exists(UserFile.objects.filter(blob=OuterRef("pk")))
+        )
+        if dry_run:
+            return orphans.count()
+
+        purged = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    orphans.select_for_update(skip_locked=True).order_by("pk").values_list("pk", "file", "thumbnails")[
+                        :BATCH_SIZE
+                    ]
+                )
+                if not batch:
+                    return purged
+                FileBlob.objects.filter(pk__in=[pk for pk, _, _ in batch]).delete()
+                queue_deletion([name for _, file, thumbnails in batch for name in (file, *thumbnails.values())])
+            purged += len(batch)
+
+    def recount(self):
+        references = Coalesce(
+            Subquery(
+                UserFile.objects.filter(blob=OuterRef("pk"))
+                .order_by()
+                .values("blob")
+                .annotate(count=Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+        return FileBlob.objects.exclude(ref_count=references).update(ref_count=references)
+
+    def scan_storage(self, grace, dry_run):
+        try:
+            default_storage.path("")
+        except NotImplementedError:
+            self.stderr.write("The storage has no local paths; skipped the storage scan.")
+            return 0
+
+        unreferenced = 0
+        batch = []
+        for name in self.stored_names(SCANNED_DIRECTORIES, timezone.now() - grace):
+            batch.append(name)
+            if len(batch) == BATCH_SIZE:
+                unreferenced += self.queue_unreferenced(batch, grace, dry_run)
+                batch = []
+        return unreferenced + self.queue_unreferenced(batch, grace, dry_run)
+
+    def stored_names(self, directories, modified_before):
+        for directory in directories:
+            if not default_storage.exists(directory):
+                continue
+            subdirectories, files = default_storage.listdir(directory)
+            for file in files:
+                name = f"{directory}/{file}"
+                if default_storage.get_modified_time(name) < modified_before:
+                    yield name
+            yield from self.stored_names([os.path.join(directory, sub) for sub in subdirectories], modified_before)
+
+    def queue_unreferenced(self, names, grace, dry_run):
+        unreferenced = set(names) - referenced_names(names)
+        if unreferenced and not dry_run:
+            # Queued for later, so the worker checks the references again once uploads in progress commit.
+            queue_deletion(unreferenced, delay=grace)
+        return len(unreferenced)
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+from app_connective.db_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("app_files", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="userfile",
+            index=models.Index(
+                fields=["user", "file_type", "uploaded_at", "id"],
+                name="userfile_user_type_date_idx",
+            ),
+        ),
+    ]
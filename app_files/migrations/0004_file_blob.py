@@ -0,0 +1,44 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_files", "0003_upload_session"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FileBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                ("file", models.FileField(max_length=255, upload_to="")),
+                ("size", models.BigIntegerField()),
+                ("ref_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="userfile",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="user_files",
+                to="app_files.fileblob",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_files", "0004_file_blob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fileblob",
+            name="thumbnails",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -1,111 +1,12 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from pathlib import Path
 from datetime import datetime
 import os
+import uuid
 
-
-CYRILLIC_SYMBOLS = "абвгдеёжзийклмнопрстуфхцчшщъыьэюяєіїґ"
-TRANSLATION = (
-    "a",
-    "b",
-    "v",
-    "g",
-    "d",
-    "e",
-    "e",
-    "j",
-    "z",
-    "i",
-    "j",
-    "k",
-    "l",
-    "m",
-    "n",
-    "o",
-    "p",
-    "r",
-    "s",
-    "t",
-    "u",
-    "f",
-    "h",
-    "ts",
-    "ch",
-    "sh",
-    "sch",
-    "",
-    "y",
-    "",
-    "e",
-    "yu",
-    "u",
-    "ja",
-    "je",
-    "ji",
-    "g",
-)
-
-image_files = {".jpeg", ".png", ".jpg", ".svg", ".bmp", ".ico", ".gif"}
-video_files = {".mp4", ".mov", ".webm", ".avi", "mkv", ".wmv", ".flv"}
-audio_files = {".mp3", ".wav", ".m4a", ".aiff", ".ogg", ".cda"}
-document_files = {
-    ".docx",
-    ".doc",
-    ".pptx",
-    ".xlsx",
-    ".html",
-    ".htm",
-    ".html5",
-    ".txt",
-    ".ini",
-    ".xml",
-    ".ppt",
-    ".py",
-    ".md",
-    ".toml",
-    "yml",
-    ".cpp",
-    ".h",
-    ".java",
-    ".css",
-    ".js",
-    ".csv",
-}
-archive_files = {".rar", ".rar4", ".zip", ".tar", ".bz2", ".7z", ".apk", ".dmg", ".jar"}
-other_files = {}
-
-
-FILE_TYPES = {
-    "image": image_files,
-    "video": video_files,
-    "audio": audio_files,
-    "document": document_files,
-    "archive": archive_files,
-    "other": other_files,
-}
-
-
-def get_file_type(filename):
-    """
-    Determines the file type of file based on its extension.
-
-    Args:
-    filename (str): The name of the file.
-
-    Returns:
-    str: The determined file type, or 'other' if the file type cannot be determined.
-    """
-    extension = Path(filename).suffix
-    TRANS = {}
-    for cyrillic, latin in zip(CYRILLIC_SYMBOLS, TRANSLATION):
-        TRANS[ord(cyrillic)] = latin
-        TRANS[ord(cyrillic.lower())] = latin.lower()
-
-    for file_type, extensions in FILE_TYPES.items():
-        if extension in extensions:
-            return file_type
-    return "other"
+from .classifier import FILE_TYPES, get_file_type, storage_name
 
 
 def update_filename(instance, filename):
@@ -121,17 +22,39 @@ def update_filename(instance, filename):
     """
     filepath = Path(filename)
     now = datetime.now().strftime("%Y%m%d-%H%M")
-    filename = f"{now}_{filepath.name}"
+    filename = f"{now}_{storage_name(filepath.name)}"
     type_id = get_file_type(filepath.name)
     return os.path.join(type_id, filename)
 
 
+class FileBlob(models.Model):
+    """
+    The stored content of user files, shared by all the files with the same content.
+
+    Attributes:
+    sha256 (CharField): The SHA-256 hex digest of the content.
+    file (FileField): The stored content.
+    size (BigIntegerField): The size of the content in bytes.
+    ref_count (PositiveIntegerField): The number of user files pointing at the blob.
+    thumbnails (JSONField): The stored names of the thumbnails of the content by width.
+    created_at (DateTimeField): The datetime when the content was first stored.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=255)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    thumbnails = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
 class UserFile(models.Model):
     """
     Model representing a user's file including metadata about the file.
 
     Attributes:
-    filepath (FileField): Path to the file including the filename.
+    filepath (FileField): Path to the file including the filename; the file of the blob for deduplicated files.
+    blob (ForeignKey): Reference to the FileBlob holding the content, unset for files stored before deduplication.
     file_description (CharField): Optional description of the file.
     uploaded_at (DateTimeField): The datetime when the file was uploaded, set automatically.
     user (ForeignKey): Reference to the User who owns the file.
@@ -147,11 +70,78 @@ class UserFile(models.Model):
     )
     filename = models.CharField(max_length=255, null=True)
     file_type = models.CharField("File type", max_length=50, default="other")
+    blob = models.ForeignKey(
+        FileBlob, related_name="user_files", on_delete=models.PROTECT, null=True, blank=True
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "file_type", "uploaded_at", "id"],
+                name="userfile_user_type_date_idx",
+            ),
+        ]
 
     def save(self, **kwargs):
         """
-        Overwrites the save method to ensure the filename and file type are set when the file is saved.
+        Overwrites the save method to ensure the filename and file type are set when the file is first saved.
+
+        Files stored in a blob keep the original name they were given. Files classified before
+        saving, e.g. by sniffing their content in ``blobs.attach``, keep their type.
         """
-        self.filename = self.filepath.name
-        self.file_type = get_file_type(self.filepath.name)
+        if self._state.adding:
+            if not (self.blob_id and self.filename):
+                self.filename = self.filepath.name
+            if self.file_type == "other":
+                self.file_type = get_file_type(self.filename)
         super().save(**kwargs)
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload in progress, staged in a local file until it is finalized.
+
+    Attributes:
+    id (UUIDField): The unguessable ID of the upload.
+    user (ForeignKey): Reference to the User who uploads the file.
+    filename (CharField): The original name of the file.
+    file_description (CharField): Optional description for the file.
+    size (BigIntegerField): The announced size of the file in bytes.
+    received (BigIntegerField): The number of bytes staged so far.
+    created_at (DateTimeField): The datetime when the upload started.
+    updated_at (DateTimeField): The datetime of the last received chunk.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, related_name="upload_sessions", on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    file_description = models.CharField(max_length=255, null=True, blank=True)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class StorageDeletion(models.Model):
+    """
+    A stored file waiting to be deleted from the storage, queued in the transaction that
+    stopped referencing it.
+
+    Attributes:
+    name (CharField): The name of the file in the storage.
+    attempts (PositiveSmallIntegerField): The number of failed deletion attempts.
+    next_attempt_at (DateTimeField): The datetime from which the deletion is due.
+    last_error (TextField): The error of the last failed attempt.
+    created_at (DateTimeField): The datetime when the deletion was queued.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_attempt_at", "id"], name="storagedeletion_due_idx"),
+        ]
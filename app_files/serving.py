@@ -0,0 +1,176 @@
+"""
+Serving user files.
+
+Every download is authorized by the view and answered with validators: the ETag is
+the SHA-256 of the content (or, for files stored before deduplication, derived from
+the file, whose content never changes) and Last-Modified its upload time, so a
+client revalidating an unchanged file gets a 304 without any file being opened.
+
+How the bytes are sent depends on the storage and on ``FILE_SERVE_MODE``:
+
+* "x-accel-redirect" hands local files to nginx through an internal location under
+  ``FILE_SERVE_ACCEL_PREFIX``, "x-sendfile" hands them to Apache or lighttpd. The
+  front server then handles Range requests itself.
+* "django" answers from the process with ``FileResponse``. A single byte range
+  gets a 206 with the file positioned at its start and its length as the
+  Content-Length, so WSGI servers with a file wrapper (e.g. gunicorn) still use
+  ``sendfile``.
+* Storages without local paths, such as Cloudinary, are redirected to, as their
+  CDN supports ranges and validators.
+
+Thumbnails (see ``app_files.thumbnails``) are served the same way, but may be cached
+by browsers for a day without revalidation.
+"""
+import mimetypes
+import os
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_etags, quote_etag
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+THUMBNAIL_MAX_AGE = 24 * 60 * 60
+
+
+class RangeFile:
+    """
+    File wrapper reading at most length bytes from the current position, which keeps
+    ``fileno`` and ``tell`` so file wrappers can send the range with ``sendfile``.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def tell(self):
+        return self.file.tell()
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def file_etag(user_file):
+    if user_file.blob_id:
+        return quote_etag(user_file.blob.sha256)
+    return quote_etag(f"{user_file.pk}-{user_file.uploaded_at.timestamp():.0f}")
+
+
+def byte_range(header, size):
+    """
+    Parse a Range header.
+
+    Args:
+    header (str): The Range header.
+    size (int): The size of the file.
+
+    Returns:
+    tuple: (start, end) of the single byte range asked for, end included; None to send
+    the whole file, as for multiple ranges; or False if the range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.replace(" ", ""))
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def serve_file(request, user_file, as_attachment=False, width=None):
+    """
+    Answer a request for the content of a user file or for one of its thumbnails.
+
+    Args:
+    request (HttpRequest): The request, with the Range and conditional headers.
+    user_file (UserFile): The file, already authorized.
+    as_attachment (bool, optional): Whether browsers should save the file instead of
+    showing it.
+    width (int, optional): The width of the thumbnail to send instead of the file. The
+    thumbnail has to exist.
+
+    Returns:
+    HttpResponse: A 304, 206, 416, 200, redirect or hand-off response.
+    """
+    name = user_file.filepath.name
+    filename = Path(user_file.filename or name).name
+    etag = file_etag(user_file)
+    if width is not None:
+        name = user_file.blob.thumbnails[str(width)]
+        filename = f"{Path(filename).stem}-{width}.webp"
+        etag = quote_etag(f"{user_file.blob.sha256}-{width}")
+    last_modified = user_file.uploaded_at.timestamp()
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = file_response(request, name, filename, etag, as_attachment)
+    if response.status_code in (200, 206, 304, 416):
+        response.headers.setdefault("ETag", etag)
+        response.headers.setdefault("Last-Modified", http_date(last_modified))
+    if width is None:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        # Thumbnails are named after the content they show, so they never change.
+        patch_cache_control(response, private=True, max_age=THUMBNAIL_MAX_AGE)
+    return response
+
+
+def file_response(request, name, filename, etag, as_attachment):
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        return HttpResponseRedirect(default_storage.url(name))
+
+    mode = settings.FILE_SERVE_MODE
+    if mode in ("x-accel-redirect", "x-sendfile"):
+        response = HttpResponse(content_type=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+        response.headers["Content-Disposition"] = content_disposition_header(as_attachment, filename)
+        if mode == "x-accel-redirect":
+            response.headers["X-Accel-Redirect"] = settings.FILE_SERVE_ACCEL_PREFIX + quote(
+                name
+            )
+        else:
+            response.headers["X-Sendfile"] = path
+        return response
+
+    file = open(path, "rb")
+    size = os.fstat(file.fileno()).st_size
+    requested = None
+    if_range = request.headers.get("If-Range")
+    if "Range" in request.headers and (not if_range or etag in parse_etags(if_range)):
+        requested = byte_range(request.headers["Range"], size)
+    if requested is False:
+        file.close()
+        response = HttpResponse(status=416)
+        response.headers["Content-Range"] = f"bytes */{size}"
+        return response
+    if requested is None:
+        response = FileResponse(file, as_attachment=as_attachment, filename=filename)
+    else:
+        start, end = requested
+        file.seek(start)
+        response = FileResponse(
+            RangeFile(file, end - start + 1), status=206, as_attachment=as_attachment, filename=filename
+        )
+        response.headers["Content-Length"] = end - start + 1
+        response.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response.headers["Accept-Ranges"] = "bytes"
+    return response
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app_connective.cache import bump_version
+from .blobs import release
+from .cleanup import queue_deletion
+from .models import UserFile
+
+
+@receiver(post_save, sender=UserFile)
+def user_file_saved(sender, instance, **kwargs):
+    if instance.user_id:
+        bump_version(instance.user_id, UserFile)
+
+
+@receiver(post_delete, sender=UserFile)
+def user_file_deleted(sender, instance, **kwargs):
+    if instance.user_id:
+        bump_version(instance.user_id, UserFile)
+    if instance.blob_id:
+        release(instance.blob_id)
+    else:
+        queue_deletion([instance.filepath.name])
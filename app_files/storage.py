@@ -0,0 +1,53 @@
+"""
+Storage backends for user files.
+"""
+import os
+
+import cloudinary.api
+import cloudinary.uploader
+from cloudinary_storage.storage import RawMediaCloudinaryStorage
+
+# Cloudinary accepts chunks of 5 MB and more, except for the last one.
+CHUNK_SIZE = 6 * 1024 * 1024
+# The most resources the Admin API deletes per call.
+DELETE_BATCH_SIZE = 100
+
+
+class ChunkedRawMediaCloudinaryStorage(RawMediaCloudinaryStorage):
+    """
+    Raw Cloudinary storage that sends files in chunks with the upload_large API, so
+    large files are neither read into memory at once nor rejected by the upload API,
+    and that deletes files in batches.
+    """
+
+    def _upload(self, name, content):
+        options = {
+            "use_filename": True,
+            "resource_type": self._get_resource_type(name),
+            "tags": self.TAG,
+            "chunk_size": CHUNK_SIZE,
+        }
+        folder = os.path.dirname(name)
+        if folder:
+            options["folder"] = folder
+        return cloudinary.uploader.upload_large(content, **options)
+
+    def delete_many(self, names):
+        """
+        Delete files with one Admin API call per DELETE_BATCH_SIZE names.
+
+        Args:
+        names (list): The names of the files.
+
+        Returns:
+        dict: The error of every file that could not be deleted by name. Files that do
+        not exist count as deleted.
+        """
+        errors = {}
+        for start in range(0, len(names), DELETE_BATCH_SIZE):
+            batch = names[start:start + DELETE_BATCH_SIZE]
+            response = cloudinary.api.delete_resources(batch, resource_type=self.RESOURCE_TYPE, invalidate=True)
+            for name, result in response.get("deleted", {}).items():
+                if result not in ("deleted", "not_found"):
+                    errors[name] = result
+        return errors
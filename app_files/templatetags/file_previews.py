@@ -0,0 +1,38 @@
+from django import template
+from django.urls import reverse
+
+register = template.Library()
+
+
+def thumbnail_widths(user_file):
+    if user_file.blob is None:
+        return []
+    return sorted(int(width) for width in user_file.blob.thumbnails)
+
+
+@register.simple_tag
+def thumbnail_url(user_file, width=320):
+    """
+    Return the URL of the smallest thumbnail of a file at least width pixels wide, or of
+    its largest one.
+
+    Images without thumbnails fall back to the file itself, videos to an empty string.
+    The listings select the blobs along with the files, so no query is made.
+    """
+    widths = thumbnail_widths(user_file)
+    if not widths:
+        return reverse("app_files:download_file", args=[user_file.pk]) if user_file.file_type == "image" else ""
+    chosen = next((candidate for candidate in widths if candidate >= width), widths[-1])
+    return reverse("app_files:file_thumbnail", args=[user_file.pk, chosen])
+
+
+@register.simple_tag
+def thumbnail_srcset(user_file):
+    """
+    Return the srcset attribute value listing every thumbnail of a file by width, or an
+    empty string.
+    """
+    return ", ".join(
+        f"{reverse('app_files:file_thumbnail', args=[user_file.pk, width])} {width}w"
+        for width in thumbnail_widths(user_file)
+    )
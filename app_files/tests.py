@@ -1,3 +1,232 @@
-from django.test import TestCase
+import hashlib
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .blobs import attach
+from .models import FileBlob, StorageDeletion, UploadSession, UserFile
+
+CONTENT = b"0123456789abcdef"
+
+
+class LocalStorageTestCase(TestCase):
+    """
+    Runs against the local file system storage in a temporary MEDIA_ROOT.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        media_root = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(
+            override_settings(
+                MEDIA_ROOT=media_root,
+                FILE_UPLOAD_STAGING_DIR=f"{media_root}/staging",
+                FILE_SERVE_MODE="django",
+                STORAGES={
+                    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+                },
+            )
+        )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="files", password="password")
+        self.client.force_login(self.user)
+
+
+class LocalStorageTests(LocalStorageTestCase):
+    """
+    Uploads, deletes and downloads user files.
+    """
+
+    def upload(self, name, content=CONTENT):
+        response = self.client.post(reverse("app_files:upload_files"), {"filepath": SimpleUploadedFile(name, content)})
+        self.assertRedirects(response, reverse("app_files:files_page"), fetch_redirect_response=False)
+        return UserFile.objects.filter(user=self.user).latest("pk")
+
+    def delete(self, user_file):
+        # The stored content is deleted once the deleting transaction commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse("app_files:delete_file", args=[user_file.pk]))
+
+    def download(self, user_file, **headers):
+        return self.client.get(reverse("app_files:download_file", args=[user_file.pk]), headers=headers)
+
+    def test_same_content_is_stored_once(self):
+        first = self.upload("report.txt")
+        second = self.upload("copy of report.txt")
+        other = self.upload("other.txt", b"other content")
+
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertNotEqual(first.blob_id, other.blob_id)
+        blob = FileBlob.objects.get(pk=first.blob_id)
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual((first.filename, second.filename), ("report.txt", "copy of report.txt"))
+        self.assertTrue(default_storage.exists(blob.file.name))
+
+    def test_content_is_deleted_with_the_last_file(self):
+        first = self.upload("report.txt")
+        second = self.upload("copy.txt")
+        name = first.blob.file.name
+
+        self.delete(first)
+        self.assertEqual(FileBlob.objects.get(pk=second.blob_id).ref_count, 1)
+        self.assertTrue(default_storage.exists(name))
+
+        self.delete(second)
+        self.assertFalse(FileBlob.objects.filter(pk=second.blob_id).exists())
+        self.assertFalse(default_storage.exists(name))
+        self.assertFalse(StorageDeletion.objects.exists())
+
+    def test_content_of_a_rolled_back_upload_is_queued_for_deletion(self):
+        with mock.patch.object(UserFile, "save", side_effect=DatabaseError("failed")):
+            with self.assertRaises(DatabaseError):
+                attach(UserFile(user=self.user), ContentFile(CONTENT, name="report.txt"))
+
+        self.assertFalse(FileBlob.objects.exists())
+        deletion = StorageDeletion.objects.get()
+        self.assertTrue(default_storage.exists(deletion.name))
+        self.assertGreater(deletion.next_attempt_at, timezone.now())
+
+    def test_release_goes_by_the_reference_count(self):
+        first = self.upload("report.txt")
+        second = self.upload("copy.txt")
+        # A count that drifted below the references does not delete content still in use.
+        FileBlob.objects.filter(pk=first.blob_id).update(ref_count=1)
+
+        with self.assertLogs("app_files.blobs", "WARNING"):
+            self.delete(first)
+        blob = FileBlob.objects.get(pk=second.blob_id)
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(default_storage.exists(blob.file.name))
+
+    def test_range(self):
+        user_file = self.upload("report.txt")
+        response = self.download(user_file, range="bytes=2-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), CONTENT[2:6])
+        self.assertEqual(response["Content-Range"], f"bytes 2-5/{len(CONTENT)}")
+        self.assertEqual(response["Content-Length"], "4")
+
+        response = self.download(user_file, range="bytes=-3")
+        self.assertEqual(b"".join(response.streaming_content), CONTENT[-3:])
+
+        response = self.download(user_file, range=f"bytes={len(CONTENT)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(CONTENT)}")
+
+    def test_if_range(self):
+        user_file = self.upload("report.txt")
+        etag = self.download(user_file)["ETag"]
+
+        response = self.download(user_file, range="bytes=0-3", if_range=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), CONTENT[:4])
+
+        # A range of a changed file would mix two versions, so the whole file is sent.
+        response = self.download(user_file, range="bytes=0-3", if_range='"changed"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), CONTENT)
+
+    def test_revalidation(self):
+        user_file = self.upload("report.txt")
+        etag = self.download(user_file)["ETag"]
+        self.assertEqual(self.download(user_file, if_none_match=etag).status_code, 304)
+
+
+class ChunkedUploadTests(LocalStorageTestCase):
+    """
+    The start, append and finish steps of resumable uploads.
+    """
+
+    def start(self, size=len(CONTENT), filename="video.txt"):
+        return self.client.post(reverse("app_files:start_upload"), {"filename": filename, "size": size})
+
+    def append(self, upload, offset, chunk, sha256=None):
+        headers = {"Upload-Offset": str(offset)}
+        if sha256:
+            headers["Upload-SHA256"] = sha256
+        return self.client.post(upload["url"], chunk, content_type="application/octet-stream", headers=headers)
+
+    def finish(self, upload, sha256=None):
+        return self.client.post(upload["finish_url"], {"sha256": sha256} if sha256 else {})
+
+    def staged_files(self, upload):
+        return sorted(path.name for path in Path(settings.FILE_UPLOAD_STAGING_DIR).glob(f"{upload['id']}.*"))
+
+    def test_upload_in_chunks(self):
+        response = self.start()
+        self.assertEqual(response.status_code, 201)
+        upload = response.json()
+        self.assertEqual(upload["offset"], 0)
+
+        response = self.append(upload, 0, CONTENT[:6], hashlib.sha256(CONTENT[:6]).hexdigest())
+        self.assertEqual(response.json()["offset"], 6)
+        # A chunk sent again, e.g. after a lost response, is refused with the offset to resume from.
+        response = self.append(upload, 0, CONTENT[:6])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["offset"], 6)
+        self.assertEqual(self.client.get(upload["url"]).json()["offset"], 6)
+        self.assertEqual(self.append(upload, 6, CONTENT[6:]).json()["offset"], len(CONTENT))
+
+        response = self.finish(upload, hashlib.sha256(CONTENT).hexdigest().upper())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["sha256"], hashlib.sha256(CONTENT).hexdigest())
+        user_file = UserFile.objects.get(pk=response.json()["id"], user=self.user)
+        self.assertEqual(user_file.filename, "video.txt")
+        with default_storage.open(user_file.filepath.name) as stored:
+            self.assertEqual(stored.read(), CONTENT)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(self.staged_files(upload), [])
+
+    def test_chunk_not_matching_its_digest(self):
+        upload = self.start().json()
+        response = self.append(upload, 0, CONTENT[:6], hashlib.sha256(b"other").hexdigest())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["offset"], 0)
+        self.assertEqual(self.staged_files(upload), [f"{upload['id']}.part"])
+        self.assertEqual(self.append(upload, 0, CONTENT[:6]).json()["offset"], 6)
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=len(CONTENT), FILE_UPLOAD_CHUNK_MAX_SIZE=6)
+    def test_size_limits(self):
+        self.assertEqual(self.start(size=len(CONTENT) + 1).status_code, 413)
+        self.assertEqual(self.start(size=0).status_code, 400)
+
+        upload = self.start(size=10).json()
+        self.assertEqual(self.append(upload, 0, CONTENT[:7]).status_code, 413)
+        self.assertEqual(self.append(upload, 0, CONTENT[:6]).json()["offset"], 6)
+        response = self.append(upload, 6, CONTENT[6:12])
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json()["offset"], 6)
+
+    def test_finish(self):
+        upload = self.start().json()
+        self.append(upload, 0, CONTENT[:6])
+        self.assertEqual(self.finish(upload).status_code, 409)
+
+        self.append(upload, 6, CONTENT[6:])
+        # A file that does not match its digest is discarded.
+        self.assertEqual(self.finish(upload, hashlib.sha256(b"other").hexdigest()).status_code, 400)
+        self.assertFalse(UserFile.objects.exists())
+        self.assertFalse(FileBlob.objects.exists())
+        self.assertEqual(self.client.get(upload["url"]).status_code, 404)
+        self.assertEqual(self.staged_files(upload), [])
+
+    def test_unknown_upload(self):
+        upload = self.start().json()
+        other = User.objects.create_user(username="other", password="password")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(upload["url"]).status_code, 404)
+        self.assertEqual(self.append(upload, 0, CONTENT).status_code, 404)
+        self.assertEqual(self.finish(upload).status_code, 404)
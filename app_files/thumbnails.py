@@ -0,0 +1,132 @@
+"""
+Thumbnails of image files and poster thumbnails of video files.
+
+Thumbnails are derived from a blob, so files sharing content share them too. They are
+stored next to the blobs as ``thumbs/<sha256>-<width>.webp`` and their names recorded
+in ``FileBlob.thumbnails`` by width, which lets listings build ``srcset`` attributes
+without asking the storage. ``release`` queues them for deletion along with their blob.
+
+Rendering runs in a pool of ``THUMBNAIL_WORKERS`` processes once the upload is
+committed, so neither the request nor the web workers wait for it; the results are
+stored from the parent process. With ``THUMBNAIL_WORKERS = 0`` they are rendered in
+the committing thread instead. Missing thumbnails, e.g. of files uploaded before, are
+rendered by the ``generate_thumbnails`` command.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from app_connective.cache import bump_version
+from .cleanup import queue_deletion
+from .imaging import render_derivatives
+from .models import FileBlob, UserFile
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTHS = (160, 320, 640)
+# Pillow cannot rasterize SVG, and vector images are small anyway.
+SKIPPED_EXTENSIONS = {".svg"}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                settings.THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+    return _executor
+
+
+def thumbnail_name(sha256, width):
+    return f"thumbs/{sha256[:2]}/{sha256}-{width}.webp"
+
+
+def has_thumbnails(file_type, filename):
+    return file_type in ("image", "video") and Path(filename).suffix.lower() not in SKIPPED_EXTENSIONS
+
+
+def source_of(blob):
+    try:
+        return blob.file.path
+    except NotImplementedError:
+        return blob.file.url
+
+
+def save_thumbnails(blob_id, rendered):
+    """
+    Store rendered thumbnails and record them on their blob.
+
+    Args:
+    blob_id (int): The ID of the blob.
+    rendered (dict): The encoded thumbnails by width.
+
+    Returns:
+    dict: The stored names of the thumbnails by width, empty if none was stored.
+    """
+    blob = FileBlob.objects.filter(pk=blob_id).only("sha256").first()
+    if blob is None or not rendered:
+        return {}
+    names = {}
+    for width, data in rendered.items():
+        name = thumbnail_name(blob.sha256, width)
+        default_storage.delete(name)
+        names[str(width)] = default_storage.save(name, ContentFile(data))
+    if not FileBlob.objects.filter(pk=blob_id).update(thumbnails=names):
+        # The blob was released meanwhile.
+        queue_deletion(names.values())
+        return {}
+    # The file listings show the thumbnails.
+    for user_id in UserFile.objects.filter(blob_id=blob_id).values_list("user_id", flat=True).distinct():
+        bump_version(user_id, UserFile)
+    return names
+
+
+def generate_thumbnails(blob, file_type):
+    """
+    Render and store the thumbnails of a blob in the calling process.
+    """
+    return save_thumbnails(blob.pk, render_derivatives(source_of(blob), file_type, THUMBNAIL_WIDTHS))
+
+
+def thumbnails_rendered(blob_id, future):
+    try:
+        save_thumbnails(blob_id, future.result())
+    except Exception:
+        logger.exception("Generating the thumbnails of blob %s failed", blob_id)
+    finally:
+        # Runs in a thread of the executor, which keeps its own connections.
+        connections.close_all()
+
+
+def schedule_thumbnails(user_file):
+    """
+    Render the thumbnails of a new user file after the transaction commits, unless its
+    blob already has them.
+
+    Args:
+    user_file (UserFile): The saved user file.
+    """
+    blob = user_file.blob
+    if blob is None or blob.thumbnails or not has_thumbnails(user_file.file_type, user_file.filename):
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(partial(generate_thumbnails, blob, user_file.file_type))
+        return
+
+    def submit():
+        future = executor().submit(render_derivatives, source_of(blob), user_file.file_type, THUMBNAIL_WIDTHS)
+        future.add_done_callback(partial(thumbnails_rendered, blob.pk))
+
+    transaction.on_commit(submit)
@@ -0,0 +1,264 @@
+"""
+Streaming and resumable uploads of user files.
+
+Form uploads go through ``HashingFileUploadHandler``, which streams the file to a
+temporary file on disk, hashes it on the way and stops the request once the file
+exceeds ``FILE_UPLOAD_MAX_SIZE``.
+
+Large files can also be sent in chunks:
+
+1. ``start_upload`` creates an ``UploadSession`` for the announced size and an empty
+   staging file in ``FILE_UPLOAD_STAGING_DIR``.
+2. ``append_chunk`` appends the raw body of a request at the offset the client gives,
+   which has to be the number of bytes received so far. A client that lost track of
+   the offset asks for it and resumes from there. A chunk can carry its SHA-256, and a
+   chunk that does not match it is dropped.
+3. ``finish_upload`` hashes the staged file, checks it against the SHA-256 the client
+   may give, streams it to the storage unless a blob with the same content exists (see
+   ``app_files.blobs``), creates the ``UserFile`` and removes the staging file.
+
+The uploads are locked only while their bookkeeping changes. Receiving a chunk and
+storing the finished file happen outside of database transactions, however long they
+take.
+
+Every step reads and writes in blocks of ``BLOCK_SIZE``, so memory use does not
+depend on the size of the file.
+"""
+import hashlib
+import shutil
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+from django.db import transaction
+from django.utils import timezone
+
+from .blobs import attach, content_sha256
+from .classifier import SNIFF_SIZE
+from .models import UploadSession, UserFile
+
+BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """
+    A rejected upload request.
+
+    Attributes:
+    message (str): The reason.
+    status (int): The HTTP status of the response.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Upload handler that streams files to disk, computes their SHA-256 as the chunks
+    arrive and aborts the upload of files larger than ``FILE_UPLOAD_MAX_SIZE``.
+
+    The uploaded files get a ``sha256`` attribute with the hex digest and a ``head``
+    attribute with their first bytes, for sniffing their type.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+        self.head = b""
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.FILE_UPLOAD_MAX_SIZE:
+            self.file.close()
+            raise StopUpload(connection_reset=True)
+        self.sha256.update(raw_data)
+        if len(self.head) < SNIFF_SIZE:
+            self.head += raw_data[: SNIFF_SIZE - len(self.head)]
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.sha256.hexdigest()
+        uploaded.head = self.head
+        return uploaded
+
+
+def staging_path(session, suffix="part"):
+    return Path(settings.FILE_UPLOAD_STAGING_DIR) / f"{session.pk}.{suffix}"
+
+
+def check_size(size):
+    if size <= 0:
+        raise UploadError("The file is empty.")
+    if size > settings.FILE_UPLOAD_MAX_SIZE:
+        raise UploadError(f"Files may not exceed {settings.FILE_UPLOAD_MAX_SIZE} bytes.", status=413)
+
+
+def check_offset(session, offset, length):
+    if offset != session.received:
+        raise UploadError(f"Expected offset {session.received}.", status=409)
+    if offset + length > session.size:
+        raise UploadError("The chunk goes past the announced size of the file.", status=413)
+
+
+def start_upload(user, filename, size, file_description=None):
+    """
+    Start a resumable upload.
+
+    Args:
+    user (User): The owner of the file.
+    filename (str): The name of the file; directories are dropped.
+    size (int): The size of the whole file in bytes.
+    file_description (str, optional): The description of the file.
+
+    Returns:
+    UploadSession: The new upload.
+
+    Raises:
+    UploadError: If the name is missing or the size is not accepted.
+    """
+    filename = Path(filename or "").name
+    if not filename:
+        raise UploadError("The file name is missing.")
+    check_size(size)
+    session = UploadSession.objects.create(
+        user=user, filename=filename[:255], file_description=file_description, size=size
+    )
+    path = staging_path(session)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return session
+
+
+def append_chunk(user, session_id, offset, stream, length, sha256=None):
+    """
+    Stage a chunk of a resumable upload.
+
+    The chunk is received into a file of its own first, outside any transaction, so a
+    slow client holds no lock. Only appending the received chunk to the staged file and
+    advancing the offset lock the upload, and a concurrent chunk for the same offset
+    that comes second gets the 409.
+
+    Args:
+    user (User): The owner of the upload.
+    session_id (UUID): The ID of the upload.
+    offset (int): Where the chunk starts, the number of bytes received so far.
+    stream: File-like object to read the chunk from, e.g. the request.
+    length (int): The size of the chunk in bytes.
+    sha256 (str, optional): Hex digest the chunk has to match.
+
+    Returns:
+    UploadSession: The upload with the new number of received bytes.
+
+    Raises:
+    UploadError: With status 409 and the expected offset in the message if the offset is
+    not the number of received bytes, 413 if the chunk is too large, or 400 if the chunk
+    is incomplete or does not match its digest.
+    """
+    session = UploadSession.objects.get(pk=session_id, user=user)
+    if length > settings.FILE_UPLOAD_CHUNK_MAX_SIZE:
+        raise UploadError(f"Chunks may not exceed {settings.FILE_UPLOAD_CHUNK_MAX_SIZE} bytes.", status=413)
+    check_offset(session, offset, length)
+
+    chunk_path = staging_path(session, f"{uuid.uuid4().hex}.chunk")
+    try:
+        digest = hashlib.sha256()
+        remaining = length
+        with open(chunk_path, "wb") as chunk:
+            while remaining:
+                block = stream.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    break
+                chunk.write(block)
+                digest.update(block)
+                remaining -= len(block)
+        if remaining or (sha256 and sha256.lower() != digest.hexdigest()):
+            raise UploadError("The chunk is incomplete or does not match its SHA-256.")
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session_id, user=user)
+            check_offset(session, offset, length)
+            with open(staging_path(session), "r+b") as staged, open(chunk_path, "rb") as chunk:
+                # Drops what a chunk interrupted while being appended left behind.
+                staged.seek(offset)
+                staged.truncate()
+                shutil.copyfileobj(chunk, staged, BLOCK_SIZE)
+            session.received = offset + length
+            session.save(update_fields=["received", "updated_at"])
+    finally:
+        chunk_path.unlink(missing_ok=True)
+    return session
+
+
+def finish_upload(user, session_id, sha256=None):
+    """
+    Store the staged file of a completely received upload as a user file.
+
+    The upload is claimed by renaming its staged file in a short transaction. Hashing the
+    file and storing it happen outside of it, and ``attach`` records the new file in a
+    transaction of its own. A failed upload gets its staged file back and can be finished
+    again.
+
+    Args:
+    user (User): The owner of the upload.
+    session_id (UUID): The ID of the upload.
+    sha256 (str, optional): Hex digest the whole file has to match.
+
+    Returns:
+    tuple: The new UserFile and the SHA-256 hex digest of its content.
+
+    Raises:
+    UploadError: With status 409 if parts of the file are still missing or the upload is
+    being finished already, or 400 if the file does not match its digest, which discards
+    the upload.
+    """
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session_id, user=user)
+        if session.received != session.size:
+            raise UploadError(f"Received {session.received} of {session.size} bytes.", status=409)
+        path, finishing = staging_path(session), staging_path(session, "finishing")
+        try:
+            path.rename(finishing)
+        except FileNotFoundError:
+            raise UploadError("The upload is being finished already.", status=409)
+
+    try:
+        with File(open(finishing, "rb"), session.filename) as content:
+            digest = content_sha256(content)
+            if not sha256 or sha256.lower() == digest:
+                user_file = attach(UserFile(user=user, file_description=session.file_description), content, digest)
+    except BaseException:
+        finishing.rename(path)
+        raise
+    session.delete()
+    finishing.unlink(missing_ok=True)
+    if sha256 and sha256.lower() != digest:
+        raise UploadError("The file does not match its SHA-256.")
+    return user_file, digest
+
+
+def discard_expired_uploads():
+    """
+    Delete the uploads that received nothing for ``FILE_UPLOAD_SESSION_HOURS`` and their
+    staging files, including the chunks and claimed files of interrupted requests.
+
+    Returns:
+    int: The number of deleted uploads.
+    """
+    expired = UploadSession.objects.filter(
+        updated_at__lt=timezone.now() - timedelta(hours=settings.FILE_UPLOAD_SESSION_HOURS)
+    )
+    count = 0
+    for session in expired:
+        for path in Path(settings.FILE_UPLOAD_STAGING_DIR).glob(f"{session.pk}.*"):
+            path.unlink(missing_ok=True)
+        session.delete()
+        count += 1
+    return count
@@ -6,13 +6,19 @@ app_name = "app_files"
 urlpatterns = [
     path("", views.main, name="files_page"),
     path("upload/", views.upload_file, name="upload_files"),
-    path("image/", views.images, name="image_files"),
-    path("video/", views.videos, name="video_files"),
-    path("audio/", views.audios, name="audio_files"),
-    path("document/", views.docs, name="docs_files"),
-    path("archive/", views.archives, name="archives"),
-    path("other/", views.other, name="other_files"),
+    path("uploads/", views.start_chunked_upload, name="start_upload"),
+    path("uploads/<uuid:upload_id>/", views.upload_chunks, name="upload_chunks"),
+    path("uploads/<uuid:upload_id>/finish/", views.finish_chunked_upload, name="finish_upload"),
+    path("browse/", views.browse, name="browse"),
+    path("image/", views.browse, {"file_type": "image"}, name="image_files"),
+    path("video/", views.browse, {"file_type": "video"}, name="video_files"),
+    path("audio/", views.browse, {"file_type": "audio"}, name="audio_files"),
+    path("document/", views.browse, {"file_type": "document"}, name="docs_files"),
+    path("archive/", views.browse, {"file_type": "archive"}, name="archives"),
+    path("other/", views.browse, {"file_type": "other"}, name="other_files"),
 
+    path("download/<int:f_id>/", views.download_file, name="download_file"),
+    path("download/<int:f_id>/thumbnail/<int:width>/", views.file_thumbnail, name="file_thumbnail"),
     path("delete-file/<int:f_id>", views.delete_file, name='delete_file'),
     path("edit-description/<int:f_id>", views.edit_description, name='edit_description'),
 ]
\ No newline at end of file
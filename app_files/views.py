@@ -1,32 +1,22 @@
-import os
+from datetime import date
 
 from django.shortcuts import render, redirect
+from django.http import Http404, JsonResponse
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_http_methods, require_POST
 from app_connective import settings
+from app_connective.cache import bump_version, cached_page
+from app_connective.pagination import paginate
+from .blobs import attach
+from .browse import SORTS, listed_files, matching_files, type_counts
 from .forms import UploadFileForm
-from .models import UserFile
+from .models import FILE_TYPES, UploadSession, UserFile
+from .serving import serve_file
+from .uploads import HashingFileUploadHandler, UploadError, append_chunk, finish_upload, start_upload
 from django.contrib.auth.decorators import login_required
 
 
-def search_files_by_type(request, file_type: str):
-    """
-    Searches and returns files filtered by the specified type for the logged-in user.
-    If no files are found, returns an empty list.
-
-    Args:
-    request: The HTTP request object.
-    file_type (str): The type of files to search for.
-
-    Returns:
-    list: A list of UserFile instances that match the type.
-    """
-    try:
-        files = UserFile.objects.filter(user=request.user)
-        result = files.filter(file_type=file_type)
-    except UserFile.DoesNotExist:
-        result = []
-    return result
-
-
 @login_required
 def main(request):
     """
@@ -41,159 +31,276 @@ def main(request):
     return render(request, "app_files/files_page.html", context={'title': 'Download files'})
 
 
+@csrf_exempt
 @login_required
 def upload_file(request):
     """
     Handles the uploading of files. If the request method is POST and the form is valid,
     saves the new file associated with the current user and redirects to a specified URL.
 
+    The file is streamed to disk and hashed by HashingFileUploadHandler instead of the
+    default handlers, and files larger than FILE_UPLOAD_MAX_SIZE are rejected.
+
     Args:
     request: The HTTP request object.
 
     Returns:
     HttpResponse: The upload file page, potentially with a form populated with previous input.
     """
+    # The upload handlers have to be replaced before the CSRF check reads request.POST.
+    request.upload_handlers = [HashingFileUploadHandler(request)]
+    return _upload_file(request)
+
+
+@csrf_protect
+def _upload_file(request):
     form = UploadFileForm(instance=UserFile())
+    error = None
     if request.method == 'POST':
-        form = UploadFileForm(request.POST, request.FILES, instance=UserFile())
-        if form.is_valid():
-            new_form = form.save(commit=False)
-            new_form.user = request.user
-            new_form.save()
-            return redirect('app_files:files_page')
+        if int(request.META.get("CONTENT_LENGTH") or 0) > settings.FILE_UPLOAD_MAX_SIZE:
+            error = f"Файл не може перевищувати {settings.FILE_UPLOAD_MAX_SIZE} байт."
+        else:
+            form = UploadFileForm(request.POST, request.FILES, instance=UserFile())
+            if form.is_valid():
+                new_form = form.save(commit=False)
+                new_form.user = request.user
+                content = request.FILES['filepath']
+                attach(new_form, content, getattr(content, 'sha256', None), getattr(content, 'head', None))
+                return redirect('app_files:files_page')
     return render(request, 'app_files/upload_files.html', context=
     {
         'title': 'Download files',
         'form': form,
+        'error': error,
         'media_url': settings.MEDIA_URL
     })
 
 
+def upload_state(session):
+    return {
+        "id": str(session.pk),
+        "filename": session.filename,
+        "size": session.size,
+        "offset": session.received,
+        "chunk_size": settings.FILE_UPLOAD_CHUNK_MAX_SIZE,
+        "url": reverse("app_files:upload_chunks", args=[session.pk]),
+        "finish_url": reverse("app_files:finish_upload", args=[session.pk]),
+    }
+
+
 @login_required
-def images(request):
+@require_POST
+def start_chunked_upload(request):
     """
-    Displays a page with all image files uploaded by the logged-in user.
+    Start a resumable upload of the file announced by the ``filename``, ``size`` and
+    optional ``file_description`` POST parameters.
 
     Args:
     request: The HTTP request object.
 
     Returns:
-    HttpResponse: The image files page with the list of image files.
+    JsonResponse: The state of the new upload with status 201, see ``upload_chunks``.
     """
-    type = 'image'
-    image_list = search_files_by_type(request, type)
-    print(image_list)
-    return render(request, 'app_files/image_files.html', context=
-    {
-        'title': 'Download files',
-        'image_list': image_list,
-        'media_url': settings.MEDIA_URL
-    })
+    try:
+        size = int(request.POST.get("size", ""))
+        session = start_upload(
+            request.user, request.POST.get("filename"), size, request.POST.get("file_description")
+        )
+    except ValueError:
+        return JsonResponse({"error": "The size must be an integer."}, status=400)
+    except UploadError as error:
+        return JsonResponse({"error": error.message}, status=error.status)
+    return JsonResponse(upload_state(session), status=201)
 
 
 @login_required
-def videos(request):
+@require_http_methods(["GET", "POST"])
+def upload_chunks(request, upload_id):
     """
-    Displays a page with all video files uploaded by the logged-in user.
+    Return the state of a resumable upload, or append the raw request body to it.
+
+    A chunk is sent as the body of a POST request, with the ``Upload-Offset`` header set
+    to the offset the last state returned and optionally ``Upload-SHA256`` to the hex
+    digest of the chunk. A 409 response carries the expected offset to resume from.
 
     Args:
     request: The HTTP request object.
+    upload_id (UUID): The ID of the upload.
 
     Returns:
-    HttpResponse: The video files page with the list of video files.
+    JsonResponse: The state of the upload: its id, filename, size, the offset of the next
+    chunk, the largest chunk size, and the URLs of its chunks and of its completion.
     """
-    type = 'video'
-    video_list = search_files_by_type(request, type)
-    return render(request, 'app_files/video_files.html', context=
-    {
-        'title': 'Download files',
-        'video_list': video_list,
-        'media_url': settings.MEDIA_URL
-    })
+    if request.method == "GET":
+        try:
+            session = UploadSession.objects.get(pk=upload_id, user=request.user)
+        except UploadSession.DoesNotExist:
+            raise Http404
+        return JsonResponse(upload_state(session))
+
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        return JsonResponse({"error": "The Upload-Offset header must be an integer."}, status=400)
+    try:
+        session = append_chunk(
+            request.user, upload_id, offset, request, length, request.headers.get("Upload-SHA256")
+        )
+    except UploadSession.DoesNotExist:
+        raise Http404
+    except UploadError as error:
+        session = UploadSession.objects.get(pk=upload_id, user=request.user)
+        return JsonResponse({"error": error.message, **upload_state(session)}, status=error.status)
+    return JsonResponse(upload_state(session))
 
 
 @login_required
-def audios(request):
+@require_POST
+def finish_chunked_upload(request, upload_id):
     """
-    Displays a page with all audio files uploaded by the logged-in user.
+    Store a completely received resumable upload as a user file, checking it against the
+    optional ``sha256`` POST parameter, the hex digest of the whole file.
 
     Args:
     request: The HTTP request object.
+    upload_id (UUID): The ID of the upload.
 
     Returns:
-    HttpResponse: The audio files page with the list of audio files.
+    JsonResponse: The id, filename, file type and SHA-256 of the new file with status 201.
     """
-    type = 'audio'
-    audio_list = search_files_by_type(request, type)
-    return render(request, 'app_files/audio_files.html', context=
-    {
-        'title': 'Download files',
-        'audio_list': audio_list,
-        'media_url': settings.MEDIA_URL
-    })
+    try:
+        user_file, sha256 = finish_upload(request.user, upload_id, request.POST.get("sha256"))
+    except UploadSession.DoesNotExist:
+        raise Http404
+    except UploadError as error:
+        return JsonResponse({"error": error.message}, status=error.status)
+    return JsonResponse(
+        {"id": user_file.pk, "filename": user_file.filename, "file_type": user_file.file_type, "sha256": sha256},
+        status=201,
+    )
+
+
+FILE_TYPE_LABELS = {
+    "image": "Зображення",
+    "document": "Документи",
+    "audio": "Аудіо",
+    "video": "Відео",
+    "archive": "Архіви",
+    "other": "Інші",
+}
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
 
 
 @login_required
-def docs(request):
+@cached_page("files", UserFile)
+def browse(request, file_type=None):
     """
-    Displays a page with all document files uploaded by the logged-in user.
+    Displays a page of the logged-in user's files, filtered and sorted by the GET parameters,
+    with the number of matching files of every type.
+
+    The GET parameters are ``type`` (one of FILE_TYPES, all types if missing), ``q`` (text in
+    the name or description), ``from`` and ``to`` (upload dates as YYYY-MM-DD) and ``sort``
+    (one of SORTS).
 
     Args:
     request: The HTTP request object.
+    file_type (str, optional): The type listed by the per-type URLs, instead of ``type``.
 
     Returns:
-    HttpResponse: The document files page with the list of document files.
+    HttpResponse: The file browser page.
     """
-    type = 'document'
-    document_list = search_files_by_type(request, type)
-    return render(request, 'app_files/docs_files.html', context=
+    file_type = file_type or request.GET.get("type")
+    if file_type not in FILE_TYPES:
+        file_type = None
+    query = request.GET.get("q", "")
+    start = parse_date(request.GET.get("from"))
+    end = parse_date(request.GET.get("to"))
+    sort = request.GET.get("sort")
+    if sort not in SORTS:
+        sort = "newest"
+
+    files = matching_files(request.user, query, start, end)
+    counts = type_counts(files)
+    listed, ordering = listed_files(files, file_type, sort)
+    page = paginate(request, listed, ordering, per_page=20)
+
+    params = request.GET.copy()
+    params.pop("cursor", None)
+    facets = []
+    for value, label in [(None, "Усі"), *FILE_TYPE_LABELS.items()]:
+        params["type"] = value or ""
+        facets.append(
+            {
+                "label": label,
+                "count": counts[value or "all"],
+                "url": reverse("app_files:browse") + "?" + params.urlencode(),
+                "selected": value == file_type,
+            }
+        )
+    return render(request, 'app_files/file_browser.html', context=
     {
         'title': 'Download files',
-        'document_list': document_list,
-        'media_url': settings.MEDIA_URL
+        'files': page,
+        'facets': facets,
+        'file_type': file_type or "",
+        'type_label': FILE_TYPE_LABELS.get(file_type),
+        'query': query,
+        'start': start,
+        'end': end,
+        'sort': sort,
     })
 
 
 @login_required
-def archives(request):
+@require_http_methods(["GET", "HEAD"])
+def download_file(request, f_id):
     """
-    Displays a page with all archive files uploaded by the logged-in user.
+    Send the content of a specified file associated with the current user.
+
+    Supports single byte ranges and conditional requests, see app_files.serving.
 
     Args:
-    request: The HTTP request object.
+    request (HttpRequest): The request object. ``?download=1`` asks browsers to save the file.
+    f_id (int): The ID of the file to send.
 
     Returns:
-    HttpResponse: The archives page with the list of archive files.
+    HttpResponse: The file, part of it, a 304 Not Modified, or a hand-off to the front server.
     """
-    type = 'archive'
-    archive_list = search_files_by_type(request, type)
-    return render(request, 'app_files/archives.html', context=
-    {
-        'title': 'Download files',
-        'archive_list': archive_list,
-        'media_url': settings.MEDIA_URL
-    })
+    try:
+        user_file = UserFile.objects.select_related("blob").get(pk=f_id, user=request.user)
+    except UserFile.DoesNotExist:
+        raise Http404
+    return serve_file(request, user_file, as_attachment=bool(request.GET.get("download")))
 
 
 @login_required
-def other(request):
+@require_http_methods(["GET", "HEAD"])
+def file_thumbnail(request, f_id, width):
     """
-    Displays a page with all files categorized as 'other' uploaded by the logged-in user.
+    Send a thumbnail of a specified image or video file associated with the current user.
 
     Args:
-    request: The HTTP request object.
+    request (HttpRequest): The request object.
+    f_id (int): The ID of the file.
+    width (int): The width of the thumbnail, one of THUMBNAIL_WIDTHS.
 
     Returns:
-    HttpResponse: The other files page with the list of other files.
+    HttpResponse: The thumbnail or a 304 Not Modified.
     """
-    type = 'other'
-    other_list = search_files_by_type(request, type)
-    return render(request, 'app_files/other_files.html', context=
-    {
-        'title': 'Download files',
-        'other_list': other_list,
-        'media_url': settings.MEDIA_URL
-    })
+    try:
+        user_file = UserFile.objects.select_related("blob").get(pk=f_id, user=request.user)
+    except UserFile.DoesNotExist:
+        raise Http404
+    if user_file.blob is None or str(width) not in user_file.blob.thumbnails:
+        raise Http404
+    return serve_file(request, user_file, width=width)
 
 
 @login_required
@@ -208,12 +315,9 @@ def delete_file(request, f_id):
     Returns:
     HttpResponse: Redirect to the files page.
     """
-    file = UserFile.objects.filter(pk=f_id, user=request.user)
-    try:
-        os.unlink(os.path.join(settings.MEDIA_ROOT, str(file.first().filepath)))
-    except OSError as e:
-        print(e)
-    file.delete()
+    # The post_delete signal releases the blob in the same transaction, and the stored
+    # content is deleted in the background once no file shares it (see app_files.cleanup).
+    UserFile.objects.filter(pk=f_id, user=request.user).delete()
     return redirect(to="app_files:files_page")
 
 
@@ -231,7 +335,8 @@ def edit_description(request, f_id):
     """
     if request.method == "POST":
         file_description = request.POST["file_description"]
-        UserFile.objects.filter(pk=f_id, user=request.user).update(file_description=file_description)
+        if UserFile.objects.filter(pk=f_id, user=request.user).update(file_description=file_description):
+            bump_version(request.user.pk, UserFile)
         return redirect(to="app_files:files_page")
 
     file = UserFile.objects.filter(pk=f_id, user=request.user).first()
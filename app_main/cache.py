@@ -0,0 +1,205 @@
+"""
+Stale-while-revalidate cache for the upstream providers of the main page.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+STATS_COUNTERS = ("hits", "misses", "refreshes", "errors")
+REFRESH_LOCK_TIMEOUT = 30
+# Seconds a provider is left alone after a failed refresh.
+FAILURE_TTL = 60
+
+
+class ProviderCache:
+    """
+    Cache for the results of a single upstream provider.
+
+    Every entry is stored with the time it was fetched. An entry younger than ``ttl``
+    is returned as is; an older one is still returned, but a background thread
+    refreshes it. A missing entry is fetched in the background too, and the default is
+    returned meanwhile, so a request never waits for a provider; the ``dashboard_cache``
+    command warms the cache before the first requests. Only one process refreshes an
+    entry at a time. When a refresh fails the last good value stays in the cache until
+    ``stale_ttl`` runs out, and the provider is not asked again for FAILURE_TTL seconds.
+
+    Async views use ``aget``, which refreshes with the coroutine ``afetch`` and gives
+    up on the provider after ``timeout`` seconds.
+
+    Attributes:
+    name (str): The provider name, used in the cache keys and the TTL settings.
+    fetch (callable): Function that downloads a fresh value for the given key arguments.
+    afetch (callable): Coroutine function doing the same as ``fetch``.
+    ttl (int): Seconds after which an entry is refreshed.
+    stale_ttl (int): Seconds for which the last good value is kept.
+    timeout (float): Seconds an async refresh may take.
+    """
+
+    background_tasks = set()
+
+    def __init__(self, name, fetch, afetch, ttl, stale_ttl=None, timeout=5):
+        overrides = getattr(settings, "DASHBOARD_CACHE_TTL", {})
+        self.name = name
+        self.fetch = fetch
+        self.afetch = afetch
+        self.ttl = overrides.get(name, ttl)
+        self.stale_ttl = stale_ttl or self.ttl * 24
+        self.timeout = timeout
+
+    def key(self, *args):
+        return ":".join(["dashboard", self.name, *(str(arg) for arg in args)])
+
+    def get(self, *args, default=None):
+        """
+        Return the cached value for the key arguments.
+
+        A miss returns ``default`` and a stale entry is served; both are refreshed in the
+        background.
+
+        Args:
+        *args: The key arguments, passed to the fetch function as well.
+        default: Value returned when there is neither a cached nor a fresh value.
+
+        Returns:
+        The cached value or ``default``.
+        """
+        entry = cache.get(self.key(*args))
+        if entry is None:
+            self.count("misses")
+            self.refresh_in_background(*args)
+            return default
+
+        self.count("hits")
+        if time.time() - entry["fetched_at"] > self.ttl:
+            self.refresh_in_background(*args)
+        return entry["value"]
+
+    def refresh(self, *args):
+        """
+        Fetch a fresh value and store it, keeping the last good value on failure.
+
+        Args:
+        *args: The key arguments.
+
+        Returns:
+        The fresh value, the last good value, or None if there is neither.
+        """
+        key = self.key(*args)
+        self.count("refreshes")
+        try:
+            value = self.fetch(*args)
+        except Exception as e:
+            logger.warning("Refreshing %s failed: %s", key, e)
+            value = None
+
+        if value is None:
+            self.count("errors")
+            cache.set(self.key("failed", *args), True, FAILURE_TTL)
+            entry = cache.get(key)
+            return entry["value"] if entry else None
+
+        cache.set(key, {"value": value, "fetched_at": time.time()}, self.stale_ttl)
+        return value
+
+    def refresh_in_background(self, *args):
+        """
+        Refresh the entry in a daemon thread unless another worker is already doing it
+        or the last refresh failed less than FAILURE_TTL seconds ago.
+        """
+        lock_key = self.key("lock", *args)
+        if cache.get(self.key("failed", *args)) or not cache.add(lock_key, True, REFRESH_LOCK_TIMEOUT):
+            return
+
+        def run():
+            try:
+                self.refresh(*args)
+            finally:
+                cache.delete(lock_key)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    async def aget(self, *args, default=None):
+        """
+        Async variant of ``get``: a missing or stale entry is refreshed in a task.
+        """
+        entry = await cache.aget(self.key(*args))
+        if entry is None:
+            await self.acount("misses")
+            await self.arefresh_in_background(*args)
+            return default
+
+        await self.acount("hits")
+        if time.time() - entry["fetched_at"] > self.ttl:
+            await self.arefresh_in_background(*args)
+        return entry["value"]
+
+    async def arefresh_in_background(self, *args):
+        """
+        Async variant of ``refresh_in_background``, refreshing in a task of the event loop.
+        """
+        if await cache.aget(self.key("failed", *args)) or not await cache.aadd(
+            self.key("lock", *args), True, REFRESH_LOCK_TIMEOUT
+        ):
+            return
+        task = asyncio.create_task(self.arefresh(*args, unlock=True))
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def arefresh(self, *args, unlock=False):
+        """
+        Async variant of ``refresh``, bounded by the provider timeout.
+        """
+        key = self.key(*args)
+        await self.acount("refreshes")
+        try:
+            value = await asyncio.wait_for(self.afetch(*args), self.timeout)
+        except Exception as e:
+            logger.warning("Refreshing %s failed: %r", key, e)
+            value = None
+
+        if value is not None:
+            await cache.aset(key, {"value": value, "fetched_at": time.time()}, self.stale_ttl)
+        else:
+            await self.acount("errors")
+            await cache.aset(self.key("failed", *args), True, FAILURE_TTL)
+            entry = await cache.aget(key)
+            value = entry["value"] if entry else None
+
+        if unlock:
+            await cache.adelete(self.key("lock", *args))
+        return value
+
+    def count(self, counter):
+        key = self.key("stats", counter)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+    async def acount(self, counter):
+        """
+        Async variant of ``count``, which does not block the event loop.
+        """
+        key = self.key("stats", counter)
+        await cache.aadd(key, 0, None)
+        try:
+            await cache.aincr(key)
+        except ValueError:
+            await cache.aset(key, 1, None)
+
+    def stats(self):
+        """
+        Return the hit, miss, refresh and error counters of the provider.
+        """
+        values = cache.get_many([self.key("stats", counter) for counter in STATS_COUNTERS])
+        return {
+            counter: values.get(self.key("stats", counter), 0)
+            for counter in STATS_COUNTERS
+        }
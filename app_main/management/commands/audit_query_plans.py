@@ -0,0 +1,272 @@
+import json
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from app_connective.cache import bump_version
+from app_connective.pagination import CursorPaginator
+from app_contacts.selectors import contact_list
+from app_contacts.models import Address, Contact, birthday_ordinal
+from app_files.models import UserFile
+from app_news.models import NewsArticle
+from app_notes.models import Note, Tag
+
+# A contact of the user is looked up by its primary key or, with few rows, by a (user, ...) index.
+CONTACT_LOOKUP_INDEXES = {
+    "postgresql": ["app_contacts_contact_pkey", "contact_user_name_idx", "contact_user_birthday_idx"],
+    "sqlite": ["PRIMARY KEY"],
+}
+
+# (name, URL name, GET parameters, indexes at least one of the endpoint's queries must use,
+# optionally per database vendor). The URL name of a page of one object comes with the
+# command method that picks the URL arguments for the audit user, and GET parameters
+# depending on the user's data are the name of the command method that picks them.
+ENDPOINTS = [
+    ("contacts", "app_contacts:contacts", {}, ["contact_user_name_idx"]),
+    ("contacts-deep-page", "app_contacts:contacts", "middle_contacts_cursor", ["contact_user_name_idx"]),
+    (
+        "contacts-search",
+        "app_contacts:contacts",
+        {"q": "olena"},
+        ["contact_search_vector_idx", "contact_user_name_idx", "contact_user_birthday_idx"],
+    ),
+    ("contact-details", ("app_contacts:contact_details", "first_contact"), {}, CONTACT_LOOKUP_INDEXES),
+    ("contact-update", ("app_contacts:contact_update", "first_contact"), {}, CONTACT_LOOKUP_INDEXES),
+    (
+        "contact-duplicates",
+        "app_contacts:duplicates",
+        {},
+        ["contact_user_name_idx", "contact_user_birthday_idx", "app_contacts_contact_user_id_0c730d13"],
+    ),
+    ("birthdays-today", "app_contacts:contact_birthday", {"period": "today"}, ["contact_user_birthday_idx"]),
+    ("birthdays-week", "app_contacts:contact_birthday", {"period": "week"}, ["contact_user_birthday_idx"]),
+    ("birthdays-month", "app_contacts:contact_birthday", {"period": "month"}, ["contact_user_birthday_idx"]),
+    ("birthdays-upcoming", "app_contacts:contact_birthday", {"period": "upcoming"}, ["contact_user_birthday_idx"]),
+    ("calendar", "app_contacts:calendar", {}, ["contact_user_birthday_idx"]),
+    ("notes", "app_notes:notes", {}, ["note_user_created_idx", "tag_user_name_idx"]),
+    (
+        "notes-search",
+        "app_notes:search",
+        {"query": "note", "state": "undone"},
+        {"postgresql": ["note_search_vector_idx", "note_user_created_idx"], "sqlite": ["app_notes_note_fts"]},
+    ),
+    ("notes-by-tag", "app_notes:sort", {"selected_tags": "audit"}, ["tag_user_name_idx"]),
+    ("image-files", "app_files:image_files", {}, ["userfile_user_type_date_idx"]),
+    ("video-files", "app_files:video_files", {}, ["userfile_user_type_date_idx"]),
+    ("audio-files", "app_files:audio_files", {}, ["userfile_user_type_date_idx"]),
+    ("document-files", "app_files:docs_files", {}, ["userfile_user_type_date_idx"]),
+    ("archive-files", "app_files:archives", {}, ["userfile_user_type_date_idx"]),
+    ("other-files", "app_files:other_files", {}, ["userfile_user_type_date_idx"]),
+    (
+        "browse-files",
+        "app_files:browse",
+        {"q": "audit", "sort": "name"},
+        ["userfile_user_type_date_idx", "app_files_userfile_user_id_7f55908c"],
+    ),
+    ("sport-news", "app_news:sport_news", {}, ["news_section_published_idx"]),
+]
+
+# Columns the expected index of an endpoint must be read by as a range, so that a page
+# starts reading at its cursor instead of skipping the rows before it.
+INDEX_RANGES = {"contacts-deep-page": "name"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Request the user-scoped pages as a throwaway user, EXPLAIN every query they run and "
+        "fail when a project table is read with a sequential scan, an expected index is not "
+        "used or a page runs more queries as the user's data grows. Sequential scans are "
+        "disabled for the audit, so a plan only falls back to one when no index fits the "
+        "query. The data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "endpoints",
+            nargs="*",
+            metavar="endpoint",
+            help=f"Endpoints to audit, all by default: {', '.join(name for name, *_ in ENDPOINTS)}.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ("postgresql", "sqlite"):
+            raise CommandError(f"Query plans of {connection.vendor} are not supported.")
+        selected = options["endpoints"] or [name for name, *_ in ENDPOINTS]
+        unknown = set(selected) - {name for name, *_ in ENDPOINTS}
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+        failures = []
+        with transaction.atomic():
+            user = User.objects.create_user(username="audit_query_plans")
+            client = Client(HTTP_HOST="localhost")
+            client.force_login(user)
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            # A first pass over a few rows counts the queries of every endpoint, the second
+            # one, over more rows than fit on a page, must not run more of them.
+            self.create_sample_data(user, 0, 5)
+            query_counts = {}
+            for name, url_name, params, expected in ENDPOINTS:
+                if name in selected:
+                    url, data = self.url(url_name, user), self.params(params, user)
+                    with CaptureQueriesContext(connection) as queries:
+                        client.get(url, data)
+                    query_counts[name] = len(queries)
+            self.create_sample_data(user, 5, 25)
+
+            for name, url_name, params, expected in ENDPOINTS:
+                if name not in selected:
+                    continue
+                if isinstance(expected, dict):
+                    expected = expected[connection.vendor]
+                url, data = self.url(url_name, user), self.params(params, user)
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url, data)
+                if response.status_code != 200:
+                    failures.append(f"{name}: HTTP {response.status_code}")
+                    continue
+                if len(queries) > query_counts[name]:
+                    failures.append(
+                        f"{name}: {len(queries)} queries for 25 rows, {query_counts[name]} for 5"
+                    )
+
+                used = set()
+                ranged = False
+                for query in queries.captured_queries:
+                    if not query["sql"].lstrip().upper().startswith("SELECT"):
+                        continue
+                    for table, index, condition in self.accesses(query["sql"]):
+                        if not table.startswith("app_"):
+                            continue
+                        if index is None:
+                            failures.append(f"{name}: sequential scan on {table}")
+                        else:
+                            used.add(index)
+                            ranged = ranged or (index in expected and self.is_range(condition, INDEX_RANGES.get(name)))
+                if not used.intersection(expected):
+                    failures.append(f"{name}: none of {', '.join(expected)} used")
+                elif name in INDEX_RANGES and not ranged:
+                    failures.append(f"{name}: {', '.join(expected)} not read as a range of {INDEX_RANGES[name]}")
+                self.stdout.write(f"{name}: {len(queries)} queries, {', '.join(sorted(used)) or '-'}")
+
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError("Query plan audit failed:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All audited queries use indexes."))
+
+    def url(self, url_name, user):
+        if isinstance(url_name, tuple):
+            url_name, lookup = url_name
+            return reverse(url_name, args=getattr(self, lookup)(user))
+        return reverse(url_name)
+
+    def params(self, params, user):
+        return getattr(self, params)(user) if isinstance(params, str) else params
+
+    @staticmethod
+    def first_contact(user):
+        return [Contact.objects.filter(user=user).order_by("pk").values_list("pk", flat=True).first()]
+
+    @staticmethod
+    def middle_contacts_cursor(user):
+        contacts = contact_list(user)
+        middle = contacts[contacts.count() // 2]
+        return {"cursor": CursorPaginator(contacts).encode("next", middle)}
+
+    @staticmethod
+    def is_range(condition, column):
+        """
+        Whether an index condition compares a column with < or >, e.g. "name>?" on SQLite
+        or "((name)::text >= 'Olena 12'::text)" on PostgreSQL.
+        """
+        return bool(condition and column and re.search(rf"\b{column}\b[)\w: ]*[<>]", condition))
+
+    @staticmethod
+    def create_sample_data(user, start, stop):
+        now = timezone.now()
+        contacts = Contact.objects.bulk_create(
+            Contact(
+                name=f"Olena {n}",
+                surname="Audit",
+                email=f"olena{n}@example.com",
+                mobile_phone=f"+38050{n:07}",
+                birthdate=now.date().replace(year=1990),
+                birthday_ordinal=birthday_ordinal(now.date()),
+                user=user,
+            )
+            for n in range(start, stop)
+        )
+        Address.objects.bulk_create(
+            Address(country="Україна", city="Київ", address=f"Audit {n}", contact=contact)
+            for n, contact in enumerate(contacts, start)
+        )
+        tag, _ = Tag.objects.get_or_create(name="audit", user=user)
+        for n in range(start, stop):
+            Note.objects.create(title=f"Note {n}", body="Audit", user=user).tag.add(tag)
+        UserFile.objects.bulk_create(
+            UserFile(user=user, filepath=f"image/audit-{n}.jpg", filename=f"image/audit-{n}.jpg", file_type="image")
+            for n in range(start, stop)
+        )
+        # bulk_create() skips the signals that would drop the cached pages and calendar.
+        bump_version(user.pk, Contact, Address, UserFile)
+        NewsArticle.objects.bulk_create(
+            NewsArticle(
+                section=NewsArticle.SPORT,
+                title=f"Audit {n}",
+                url=f"https://suspilne.media/sport/audit-{n}/",
+                published_at=now,
+                fetched_at=now,
+            )
+            for n in range(start, stop)
+        )
+        if connection.vendor == "postgresql":
+            from app_contacts.search import update_search_vectors
+
+            update_search_vectors(Contact.objects.filter(user=user))
+
+    @staticmethod
+    def accesses(sql):
+        """
+        Yield (table, index, condition) for every table the plan of a query reads, with None
+        as the index of a sequential scan. The condition is the one the index is searched
+        with, if any.
+        """
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                nodes = [plan[0]["Plan"]]
+                while nodes:
+                    node = nodes.pop()
+                    nodes.extend(node.get("Plans", []))
+                    if node["Node Type"] == "Seq Scan":
+                        yield node["Relation Name"], None, None
+                    elif "Index Name" in node:
+                        yield node.get("Relation Name", "app_"), node["Index Name"], node.get("Index Cond")
+            else:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                for *_, detail in cursor.fetchall():
+                    words = detail.split()
+                    if words[0] not in ("SCAN", "SEARCH") or len(words) < 2:
+                        continue
+                    index = None
+                    if "VIRTUAL" in words:
+                        index = words[1]
+                    elif "INDEX" in words:
+                        index = words[words.index("INDEX") + 1]
+                    elif "PRIMARY" in words or "INTEGER" in words:
+                        index = "PRIMARY KEY"
+                    condition = detail[detail.index("(") :] if "(" in detail else None
+                    yield words[1], index, condition
@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from app_main.providers import (
+    DEFAULT_CITY,
+    PROVIDER_CACHES,
+    public_ip_cache,
+    city_cache,
+    weather_cache,
+    exchange_cache,
+)
+
+
+class Command(BaseCommand):
+    help = "Warm the main page provider caches and show their hit/miss/refresh counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--warm",
+            action="store_true",
+            help="Fetch fresh values for the current location and day before printing the counters.",
+        )
+
+    def handle(self, *args, **options):
+        if options["warm"]:
+            public_ip = public_ip_cache.refresh("public")
+            city = (city_cache.refresh(public_ip) if public_ip else None) or DEFAULT_CITY
+            weather_cache.refresh(city)
+            exchange_cache.refresh(date.today().strftime("%d.%m.%Y"))
+
+        for provider_cache in PROVIDER_CACHES:
+            counters = ", ".join(f"{name}={value}" for name, value in provider_cache.stats().items())
+            self.stdout.write(f"{provider_cache.name}: {counters}")
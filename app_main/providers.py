@@ -0,0 +1,151 @@
+"""
+Upstream providers of the main page: public IP, geolocation, weather and exchange rates.
+"""
+import environ
+
+from app_connective.http_client import async_client, client
+from .cache import ProviderCache
+
+env = environ.Env(
+    # set casting, default value
+    DEBUG=(bool, False)
+)
+
+DEFAULT_CITY = "Kyiv"
+CURRENCIES = ("USD", "EUR")
+
+IPIFY_URL = "https://api.ipify.org"
+GEOLOCATION_URL = "https://ipgeolocation.abstractapi.com/v1/"
+WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather"
+EXCHANGE_URL = "https://api.privatbank.ua/p24api/exchange_rates"
+
+
+def fetch_public_ip(_key):
+    """
+    Fetch the public IP address of the server.
+
+    Returns:
+    str: The public IP address.
+    """
+    response = client.get(IPIFY_URL, params={"format": "json"})
+    response.raise_for_status()
+    return response.json()["ip"]
+
+
+async def afetch_public_ip(_key):
+    async with async_client() as http:
+        response = await http.get(IPIFY_URL, params={"format": "json"})
+    response.raise_for_status()
+    return response.json()["ip"]
+
+
+def geolocation_params(ip_address):
+    return {"api_key": env("ABSTRACT_API_KEY"), "ip_address": ip_address}
+
+
+def fetch_city(ip_address):
+    """
+    Fetch the city of an IP address from the abstractapi geolocation service.
+
+    Args:
+    ip_address (str): The IP address to locate.
+
+    Returns:
+    str: The city name, or None if it is unknown.
+    """
+    response = client.get(GEOLOCATION_URL, params=geolocation_params(ip_address))
+    response.raise_for_status()
+    return response.json()["city"] or None
+
+
+async def afetch_city(ip_address):
+    async with async_client() as http:
+        response = await http.get(GEOLOCATION_URL, params=geolocation_params(ip_address))
+    response.raise_for_status()
+    return response.json()["city"] or None
+
+
+def weather_params(city):
+    return {"q": city, "units": "metric", "appid": env("API_WEATHER_KEY")}
+
+
+def weather_from_json(city, city_weather):
+    return {
+        "city": city,
+        "temperature": city_weather["main"]["temp"],
+        "description": city_weather["weather"][0]["description"],
+        "icon": city_weather["weather"][0]["icon"],
+        "temperature_max": city_weather["main"]["temp_max"],
+        "temperature_min": city_weather["main"]["temp_min"],
+        "feelslike_weather": city_weather["main"]["feels_like"],
+    }
+
+
+def fetch_weather(city):
+    """
+    Fetch the current weather for a city from OpenWeatherMap.
+
+    Args:
+    city (str): The city name.
+
+    Returns:
+    dict: The weather information shown on the main page.
+    """
+    response = client.get(WEATHER_URL, params=weather_params(city))
+    response.raise_for_status()
+    return weather_from_json(city, response.json())
+
+
+async def afetch_weather(city):
+    async with async_client() as http:
+        response = await http.get(WEATHER_URL, params=weather_params(city))
+    response.raise_for_status()
+    return weather_from_json(city, response.json())
+
+
+def exchange_rates_from_json(day, currency_exchange):
+    exchange_rates = {}
+    for item in currency_exchange["exchangeRate"]:
+        currency = item.get("currency")
+        if currency in CURRENCIES:
+            exchange_rates.setdefault(day, {})[currency] = {
+                "sale": float(item["saleRate"]),
+                "purchase": float(item["purchaseRate"]),
+            }
+    return exchange_rates or None
+
+
+def fetch_exchange_rates(day):
+    """
+    Fetch the PrivatBank USD and EUR exchange rates for a day.
+
+    Args:
+    day (str): The day in the DD.MM.YYYY format.
+
+    Returns:
+    dict: The rates keyed by day and currency, or None if the bank has no rates yet.
+    """
+    response = client.get(EXCHANGE_URL, params={"json": "", "date": day}, conditional=True)
+    response.raise_for_status()
+    exchange_rates = exchange_rates_from_json(day, response.json())
+    client.save_validators(response)
+    return exchange_rates
+
+
+async def afetch_exchange_rates(day):
+    async with async_client() as http:
+        response = await http.get(EXCHANGE_URL, params={"json": "", "date": day})
+    response.raise_for_status()
+    return exchange_rates_from_json(day, response.json())
+
+
+public_ip_cache = ProviderCache("ip", fetch_public_ip, afetch_public_ip, ttl=60 * 60, timeout=3)
+city_cache = ProviderCache(
+    "geo", fetch_city, afetch_city, ttl=24 * 60 * 60, stale_ttl=7 * 24 * 60 * 60, timeout=3
+)
+weather_cache = ProviderCache("weather", fetch_weather, afetch_weather, ttl=10 * 60, timeout=5)
+exchange_cache = ProviderCache(
+    "exchange", fetch_exchange_rates, afetch_exchange_rates, ttl=60 * 60, stale_ttl=24 * 60 * 60, timeout=5
+)
+
+PROVIDER_CACHES = (public_ip_cache, city_cache, weather_cache, exchange_cache)
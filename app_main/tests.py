@@ -1,3 +1,19 @@
+from io import StringIO
+
+from django.core.management import CommandError, call_command
 from django.test import TestCase
 
-# Create your tests here.
+
+class QueryPlanTests(TestCase):
+    """
+    Runs the ``audit_query_plans`` command, so a page whose queries read a table with a
+    sequential scan, miss their expected index or grow with the data fails the tests.
+    """
+
+    def test_query_plans(self):
+        output = StringIO()
+        try:
+            call_command("audit_query_plans", stdout=output)
+        except CommandError as error:
+            self.fail(f"{error}\n{output.getvalue()}")
+        self.assertIn("All audited queries use indexes.", output.getvalue())
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 
 from . import views
@@ -5,5 +6,5 @@ from . import views
 app_name = "app_main"
 
 urlpatterns = [
-    path("", views.main, name="root"),
+    path("", views.main_async if settings.ASYNC_VIEWS else views.main, name="root"),
 ]
@@ -0,0 +1,99 @@
+import timeit
+from pathlib import Path
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from app_connective.http_client import client
+from app_news.parser import BACKENDS, parse_cards
+from app_news.scraper import CARD_CLASSES, SECTIONS
+
+# Section pages named after their section, e.g. "sport.html". --save replaces them with the live ones.
+PAGES_DIR = Path(__file__).resolve().parents[2] / "bench_pages"
+
+
+def synthetic_page(cards=60, filler=400):
+    """
+    Build a page shaped like a Suspilne.Media section: article cards among a lot of other markup.
+    """
+    card = (
+        '<div class="c-article-card c-article-card--big-headline">'
+        '<div class="c-article-card__content"><time datetime="2024-06-03T10:{minute:02d}:00+03:00">'
+        "10:{minute:02d}</time>"
+        '<a class="c-article-card__headline" href="https://suspilne.media/{n}-article/">'
+        '<h3 class="c-article-card__headline-inner">Article number {n}</h3></a></div></div>'
+    )
+    noise = '<li class="menu-item"><a href="/tag/{n}/">Tag {n}</a><span>{n}</span></li>'
+    body = "".join(card.format(n=n, minute=n % 60) for n in range(cards))
+    menu = "<ul>" + "".join(noise.format(n=n) for n in range(filler)) + "</ul>"
+    return f"<html><head><title>Suspilne</title></head><body>{menu}<main>{body}</main>{menu}</body></html>"
+
+
+def card_classes(page):
+    """
+    Return the card classes the scraper parses a saved page with, by its section name.
+    """
+    return SECTIONS[page][1] if page in SECTIONS else CARD_CLASSES
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the parse time per page of the news parser backends over saved Suspilne.Media "
+        "section pages. With --save the live section pages are downloaded into bench_pages first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            help="Saved Suspilne.Media pages, or directories of .html files. Defaults to the pages "
+                 "in bench_pages, or a synthetic page if there are none.",
+        )
+        parser.add_argument("--repeat", type=int, default=20, help="Parses per page and backend.")
+        parser.add_argument("--save", action="store_true", help="Save the live section pages into bench_pages.")
+
+    def save_pages(self):
+        for section, (url, _) in SECTIONS.items():
+            try:
+                response = client.get(url)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise CommandError(f"Downloading {url} failed: {e}")
+            PAGES_DIR.mkdir(exist_ok=True)
+            (PAGES_DIR / f"{section}.html").write_text(response.text, encoding="utf-8")
+            self.stdout.write(f"Saved {url} as bench_pages/{section}.html")
+
+    def handle(self, *args, **options):
+        if options["save"]:
+            self.save_pages()
+        paths = options["paths"] or ([PAGES_DIR] if PAGES_DIR.is_dir() else [])
+
+        pages = {}
+        for path in map(Path, paths):
+            files = sorted(path.glob("*.html")) if path.is_dir() else [path]
+            for file in files:
+                pages[file.stem] = file.read_text(encoding="utf-8")
+        if options["paths"] and not pages:
+            raise CommandError("No HTML pages found.")
+        if not pages:
+            self.stderr.write("No saved section pages, timing a synthetic page. Save the live ones with --save.")
+            pages = {"synthetic": synthetic_page()}
+
+        baseline = {}
+        for backend in BACKENDS:
+            total = 0
+            for name, html in pages.items():
+                classes = card_classes(name)
+                cards = parse_cards(html, classes, backend)
+                baseline.setdefault(name, cards)
+                if cards != baseline[name]:
+                    self.stderr.write(f"{backend}: {name} parsed differently from html.parser")
+                total += timeit.timeit(
+                    lambda: parse_cards(html, classes, backend), number=options["repeat"]
+                )
+            per_page = total / options["repeat"] / len(pages) * 1000
+            baseline.setdefault("per_page", per_page)
+            self.stdout.write(
+                f"{backend:12} {per_page:8.2f} ms/page  "
+                f"x{baseline['per_page'] / per_page:.1f} vs html.parser"
+            )
@@ -0,0 +1,41 @@
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from app_news.scraper import SECTIONS, fetch_sections
+
+
+class Command(BaseCommand):
+    help = "Scrape the Suspilne.Media news sections and store their articles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--section",
+            action="append",
+            choices=list(SECTIONS),
+            help="Section to fetch, may be repeated. Defaults to all sections.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=0,
+            help="Keep running and fetch again every INTERVAL seconds.",
+        )
+
+    def handle(self, *args, **options):
+        sections = options["section"] or list(SECTIONS)
+        while True:
+            for section, stored in fetch_sections(sections).items():
+                if isinstance(stored, requests.exceptions.RequestException):
+                    self.stderr.write(f"{section}: could not get response from server: {stored}")
+                elif isinstance(stored, Exception):
+                    raise stored
+                elif stored is None:
+                    self.stdout.write(f"{section}: not modified")
+                else:
+                    self.stdout.write(f"{section}: {stored} articles stored")
+
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="NewsArticle",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "section",
+                    models.CharField(
+                        choices=[
+                            ("sport", "Sport"),
+                            ("politics", "Politics"),
+                            ("culture", "Culture"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("title", models.CharField(max_length=255)),
+                ("url", models.URLField(max_length=500)),
+                ("published_at", models.DateTimeField()),
+                ("fetched_at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["section", "-published_at"],
+                        name="news_section_published_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="newsarticle",
+            constraint=models.UniqueConstraint(
+                fields=("section", "url"), name="unique_news_article_section_url"
+            ),
+        ),
+    ]
@@ -1,3 +1,33 @@
 from django.db import models
 
-# Create your models here.
+"""
+Basic models for news
+"""
+
+
+class NewsArticle(models.Model):
+    SPORT = "sport"
+    POLITICS = "politics"
+    CULTURE = "culture"
+    SECTIONS = [
+        (SPORT, "Sport"),
+        (POLITICS, "Politics"),
+        (CULTURE, "Culture"),
+    ]
+
+    section = models.CharField(max_length=20, choices=SECTIONS)
+    title = models.CharField(max_length=255)
+    url = models.URLField(max_length=500)
+    published_at = models.DateTimeField()
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["section", "url"], name="unique_news_article_section_url"),
+        ]
+        indexes = [
+            models.Index(fields=["section", "-published_at"], name="news_section_published_idx"),
+        ]
+
+    def __str__(self):
+        return self.title
@@ -0,0 +1,140 @@
+"""
+Parser for the article cards of Suspilne.Media pages.
+
+The parsing backend is pluggable: ``html.parser`` builds the whole document with the
+standard library parser and is always available, ``lxml`` builds only the card
+subtrees through a SoupStrainer and ``selectolax`` matches the cards with the Lexbor
+CSS selector engine. The
+fastest installed backend is used unless another one is asked for explicitly.
+"""
+import re
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+SUSPILNE_TIME_ZONE = ZoneInfo("Europe/Kyiv")
+
+TITLE_CLASS = "c-article-card__headline-inner"
+LINK_CLASS = "c-article-card__headline"
+
+Card = namedtuple("Card", ["title", "url", "published_at"])
+
+
+def parse_published_at(value):
+    """
+    Parse the ``datetime`` attribute of a card's time tag into an aware UTC datetime.
+
+    Timestamps without an offset are taken to be Kyiv local time.
+
+    Args:
+    value (str): The ISO 8601 timestamp.
+
+    Returns:
+    datetime: The timestamp in UTC, or None if it cannot be parsed.
+    """
+    try:
+        published_at = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if published_at.tzinfo is None:
+        published_at = published_at.replace(tzinfo=SUSPILNE_TIME_ZONE)
+    return published_at.astimezone(dt_timezone.utc)
+
+
+def make_card(title, url, published_at):
+    if not (title and url and published_at):
+        return None
+    published_at = parse_published_at(published_at)
+    if published_at is None:
+        return None
+    return Card(title.strip(), url, published_at)
+
+
+@lru_cache(maxsize=None)
+def card_strainer(card_classes):
+    # The strainer sees the raw class attribute, so match the classes as whole words.
+    pattern = re.compile(r"(?:^|\s)(?:{})(?:\s|$)".format("|".join(map(re.escape, card_classes))))
+    return SoupStrainer("div", class_=pattern)
+
+
+def cards_from_soup(containers):
+    cards = []
+    for container in containers:
+        time_tag = container.find("time")
+        title_tag = container.find("h3", class_=TITLE_CLASS)
+        url_tag = container.find("a", class_=LINK_CLASS)
+        if not (time_tag and title_tag and url_tag):
+            continue
+        card = make_card(title_tag.get_text(), url_tag.get("href"), time_tag.get("datetime"))
+        if card:
+            cards.append(card)
+    return cards
+
+
+def parse_with_html_parser(html, card_classes):
+    soup = BeautifulSoup(html, "html.parser")
+    return cards_from_soup(soup.find_all("div", class_=list(card_classes)))
+
+
+def parse_with_lxml(html, card_classes):
+    soup = BeautifulSoup(html, "lxml", parse_only=card_strainer(card_classes))
+    return cards_from_soup(soup.find_all("div", class_=list(card_classes)))
+
+
+def parse_with_selectolax(html, card_classes):
+    cards = []
+    selector = ", ".join(f"div.{card_class}" for card_class in card_classes)
+    for container in LexborHTMLParser(html).css(selector):
+        time_tag = container.css_first("time")
+        title_tag = container.css_first(f"h3.{TITLE_CLASS}")
+        url_tag = container.css_first(f"a.{LINK_CLASS}")
+        if not (time_tag and title_tag and url_tag):
+            continue
+        card = make_card(
+            title_tag.text(), url_tag.attributes.get("href"), time_tag.attributes.get("datetime")
+        )
+        if card:
+            cards.append(card)
+    return cards
+
+
+BACKENDS = {"html.parser": parse_with_html_parser}
+if lxml is not None:
+    BACKENDS["lxml"] = parse_with_lxml
+if LexborHTMLParser is not None:
+    BACKENDS["selectolax"] = parse_with_selectolax
+
+DEFAULT_BACKEND = next(
+    backend for backend in ("selectolax", "lxml", "html.parser") if backend in BACKENDS
+)
+
+
+def parse_cards(html, card_classes, backend=None):
+    """
+    Extract the article cards of a Suspilne.Media page.
+
+    Args:
+    html (str): The page HTML.
+    card_classes (tuple): The CSS classes of the card containers.
+    backend (str, optional): One of BACKENDS. Defaults to the fastest installed backend.
+
+    Returns:
+    list: Card tuples with the title, url and UTC published_at of each article, one per URL.
+    """
+    unique = {}
+    for card in BACKENDS[backend or DEFAULT_BACKEND](html, tuple(card_classes)):
+        unique.setdefault(card.url, card)
+    return list(unique.values())
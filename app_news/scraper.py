@@ -0,0 +1,96 @@
+"""
+Scraping of the Suspilne.Media news sections into NewsArticle rows.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django.utils import timezone
+
+from app_connective.http_client import client
+from .models import NewsArticle
+from .parser import parse_cards
+
+CARD_CLASSES = (
+    "c-article-card-bgimage",
+    "c-article-card",
+    "c-article-card--big-headline",
+)
+
+SECTIONS = {
+    NewsArticle.SPORT: ("https://suspilne.media/sport/", CARD_CLASSES),
+    NewsArticle.POLITICS: ("https://suspilne.media/", CARD_CLASSES),
+    NewsArticle.CULTURE: ("https://suspilne.media/culture/", ("c-article-card__content",)),
+}
+
+
+def fetch_section(section):
+    """
+    Download a news section and upsert its articles by URL.
+
+    The page is revalidated with its stored validators, and an unchanged page is not parsed again.
+    The validators are stored only once the articles are, so a page that failed to be parsed
+    or stored is processed again on the next run.
+
+    Args:
+    section (str): One of the NewsArticle sections.
+
+    Returns:
+    int: The number of articles stored, or None if the page has not changed.
+    """
+    url, card_classes = SECTIONS[section]
+    response = client.get(url, conditional=True)
+    response.raise_for_status()
+    if response.from_cache:
+        return None
+    stored = store_articles(section, parse_cards(response.text, card_classes))
+    client.save_validators(response)
+    return stored
+
+
+def fetch_sections(sections):
+    """
+    Fetch several news sections concurrently.
+
+    A failing section does not stop the others: its result is the raised exception.
+
+    Args:
+    sections (list): NewsArticle sections.
+
+    Returns:
+    dict: The fetch_section result or the exception of every section.
+    """
+
+    def fetch(section):
+        try:
+            return fetch_section(section)
+        except Exception as e:
+            return e
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=len(sections) or 1) as executor:
+        return dict(zip(sections, executor.map(fetch, sections)))
+
+
+def store_articles(section, articles):
+    """
+    Upsert parsed article cards of a section, recording the fetch time.
+
+    Args:
+    section (str): One of the NewsArticle sections.
+    articles (list): Card tuples returned by parse_cards.
+
+    Returns:
+    int: The number of articles stored.
+    """
+    fetched_at = timezone.now()
+    NewsArticle.objects.bulk_create(
+        [
+            NewsArticle(section=section, fetched_at=fetched_at, **article._asdict())
+            for article in articles
+        ],
+        update_conflicts=True,
+        unique_fields=["section", "url"],
+        update_fields=["title", "published_at", "fetched_at"],
+    )
+    return len(articles)
@@ -1,3 +1,62 @@
-from django.test import TestCase
+from datetime import datetime, timezone
+from pathlib import Path
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .parser import BACKENDS, parse_cards, parse_published_at
+from .scraper import CARD_CLASSES, SECTIONS
+
+PAGES_DIR = Path(__file__).resolve().parent / "bench_pages"
+
+
+def card(classes, n=1, published_at="2024-06-03T10:00:00+03:00"):
+    return (
+        f'<div class="{classes}"><time datetime="{published_at}">10:00</time>'
+        f'<a class="c-article-card__headline" href="https://suspilne.media/{n}/">'
+        f'<h3 class="c-article-card__headline-inner"> Article {n} </h3></a></div>'
+    )
+
+
+class ParserTests(SimpleTestCase):
+    def parse_with_every_backend(self, html, card_classes=CARD_CLASSES):
+        results = {backend: parse_cards(html, card_classes, backend) for backend in BACKENDS}
+        for backend, cards in results.items():
+            self.assertEqual(cards, results["html.parser"], backend)
+        return results["html.parser"]
+
+    def test_backends_agree_on_the_section_pages(self):
+        pages = sorted(PAGES_DIR.glob("*.html"))
+        self.assertTrue(pages)
+        for page in pages:
+            with self.subTest(page=page.stem):
+                cards = self.parse_with_every_backend(page.read_text(encoding="utf-8"), SECTIONS[page.stem][1])
+                self.assertGreater(len(cards), 10)
+                self.assertEqual(len({card.url for card in cards}), len(cards))
+
+    def test_card(self):
+        [parsed] = self.parse_with_every_backend(card("c-article-card"))
+        self.assertEqual(parsed.title, "Article 1")
+        self.assertEqual(parsed.url, "https://suspilne.media/1/")
+        self.assertEqual(parsed.published_at, datetime(2024, 6, 3, 7, tzinfo=timezone.utc))
+
+    def test_classes_match_as_whole_words(self):
+        html = "".join(
+            [
+                card("news c-article-card--big-headline wide", 1),
+                card("c-article-cardx", 2),
+                card("c-article-card-bgimage__overlay", 3),
+                card("xc-article-card", 4),
+            ]
+        )
+        cards = self.parse_with_every_backend(html)
+        self.assertEqual([parsed.url for parsed in cards], ["https://suspilne.media/1/"])
+
+    def test_cards_without_a_time_are_skipped(self):
+        html = card("c-article-card", 1, published_at="") + card("c-article-card", 2, published_at="soon")
+        self.assertEqual(self.parse_with_every_backend(html), [])
+
+    def test_timestamps_without_offset_are_kyiv_time(self):
+        self.assertEqual(parse_published_at("2024-06-03T10:00:00"), datetime(2024, 6, 3, 7, tzinfo=timezone.utc))
+        self.assertEqual(parse_published_at("2024-01-10T10:00:00"), datetime(2024, 1, 10, 8, tzinfo=timezone.utc))
+        self.assertEqual(parse_published_at("2024-01-10T10:00:00Z"), datetime(2024, 1, 10, 10, tzinfo=timezone.utc))
+        self.assertIsNone(parse_published_at("yesterday"))
@@ -9,4 +9,5 @@ urlpatterns = [
     path('sport-news/', views.sport_news, name='sport_news'),
     path('politic-news/', views.politic_news, name='politic_news'),
     path('culture-news/', views.culture_news, name='culture_news'),
+    path('feed/', views.news_feed, name='news_feed'),
 ]
\ No newline at end of file
@@ -1,10 +1,14 @@
-from datetime import datetime, timedelta
+from collections import defaultdict
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.shortcuts import render
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from bs4 import BeautifulSoup
-import requests
+from django.db.models import Window
+from django.db.models.functions import RowNumber
+
+from .models import NewsArticle
 
 
 @login_required
@@ -12,145 +16,65 @@ def main(request):
     return render(request, "app_news/news_page.html")
 
 
-@login_required
-def sport_news(request):
+def get_news_page(request, section):
     """
-    The sport_news function scrapes the Suspilne.Media website for sport news,
-        and returns a list of dictionaries containing the following information:
-        - time (datetime)
-        - url (str)
-        - news (str)
+    Return the requested page of the stored articles of a section, newest first.
 
-    :param request: Get the request object
-    :return: The sport_news
-    :doc-author: Trelent
+    Args:
+    request (HttpRequest): The request object.
+    section (str): One of the NewsArticle sections.
+
+    Returns:
+    Page: The page of articles, or None if the section has no articles yet.
     """
-    sport_news = []
-    base_url = "https://suspilne.media/sport/"
+    articles = (
+        NewsArticle.objects.filter(section=section)
+        .only("section", "title", "url", "published_at")
+        .order_by("-published_at", "-id")
+    )
+    paginator = Paginator(articles, 5)
+    if not paginator.count:
+        return None
 
+    page_number = request.GET.get("page")
     try:
-        response = requests.get(base_url)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        return render(
-            request,
-            "app_news/error.html",
-            {"message": "Could not get response from server."},
-        )
+        return paginator.page(page_number)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
 
-    soup = BeautifulSoup(response.text, "html.parser")
 
-    news_containers = soup.find_all(
-        "div",
-        class_=[
-            "c-article-card-bgimage",
-            "c-article-card",
-            "c-article-card--big-headline",
-        ],
-    )
+@login_required
+def sport_news(request):
+    """
+    The sport_news function shows the Suspilne.Media sport news stored by the fetch_news command.
 
-    for container in news_containers:
-        result = {}
-        time_tag = container.find("time")
-        title_tag = container.find("h3", class_="c-article-card__headline-inner")
-        url_tag = container.find("a", class_="c-article-card__headline")
-
-        if time_tag and title_tag and url_tag:
-            original_datetime_str = time_tag.get("datetime", "")
-            hours_offset = int(original_datetime_str[-6:-3])
-            original_datetime = datetime.fromisoformat(
-                original_datetime_str.replace("T", " ").split("+")[0]
-            )
-            original_datetime = original_datetime + timedelta(hours=hours_offset)
-            new_datetime_str = original_datetime.strftime("%Y-%m-%d %H:%M")
-
-            result["time"] = new_datetime_str
-            result["sport"] = ("Sport")
-            result["url"] = url_tag.get("href", "")
-            result["news"] = title_tag.text.strip()
-
-            sport_news.append(result)
-
-    if not sport_news:
+    :param request: Get the request object
+    :return: The sport_news
+    """
+    sport_news_page = get_news_page(request, NewsArticle.SPORT)
+    if sport_news_page is None:
         return render(
             request, "app_news/error.html", {"message": "Не знайдено спортивних новин."}
         )
 
-    paginator = Paginator(sport_news, 5)
-    page_number = request.GET.get("page")
-    try:
-        sport_news_page = paginator.page(page_number)
-    except PageNotAnInteger:
-        sport_news_page = paginator.page(1)
-    except EmptyPage:
-        sport_news_page = paginator.page(paginator.num_pages)
-
     return render(request, "app_news/sport_news.html", {"sport_news": sport_news_page})
 
 
 @login_required
 def politic_news(request):
     """
-    The politic_news function scrapes the Suspilne.Media website for political news and
-    returns a list of dictionaries containing the title, url, and time of each article.
+    The politic_news function shows the Suspilne.Media political news stored by the fetch_news command.
 
     :param request: Get the request object that is sent from the user to your server
     :return: A render function
-    :doc-author: Trelent
     """
-    politic_news = []
-    base_url = "https://suspilne.media/"
-    try:
-        response = requests.get(base_url)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
-        return render(
-            request,
-            "app_news/error.html",
-            {"message": "Could not get response from server."},
-        )
-    soup = BeautifulSoup(response.text, "html.parser")
-    news_containers = soup.find_all(
-        "div",
-        class_=[
-            "c-article-card-bgimage",
-            "c-article-card",
-            "c-article-card--big-headline",
-        ],
-    )
-
-    for container in news_containers:
-        result = {}
-        try:
-            original_datetime_str = container.find("time")["datetime"]
-            hours_offset = int(original_datetime_str[-6:-3])
-            original_datetime = datetime.fromisoformat(
-                original_datetime_str.replace("T", " ").split("+")[0]
-            )
-            original_datetime = original_datetime + timedelta(hours=hours_offset)
-            new_datetime_str = original_datetime.strftime("%Y-%m-%d %H:%M")
-            result["time"] = new_datetime_str
-            result["title"] = container.find(
-                "h3", class_="c-article-card__headline-inner"
-            ).text.strip()
-            result["url"] = container.find("a", class_="c-article-card__headline")[
-                "href"
-            ]
-        except AttributeError as e:
-            continue
-        politic_news.append(result)
-    if not politic_news:
+    politic_news_page = get_news_page(request, NewsArticle.POLITICS)
+    if politic_news_page is None:
         return render(
             request, "app_news/error.html", {"message": "Політичні новини недоступні."}
         )
-    paginator = Paginator(politic_news, 5)
-    page_number = request.GET.get("page")
-    try:
-        politic_news_page = paginator.page(page_number)
-    except PageNotAnInteger:
-        politic_news_page = paginator.page(1)
-    except EmptyPage:
-        politic_news_page = paginator.page(paginator.num_pages)
 
     return render(request, "app_news/politic_news.html", {"news": politic_news_page})
 
@@ -158,64 +82,64 @@ def politic_news(request):
 @login_required
 def culture_news(request):
     """
-    The culture_news function scrapes the Suspilne.Media website for culture news,
-        and then renders a template with the results.
+    The culture_news function shows the Suspilne.Media culture news stored by the fetch_news command.
 
     :param request: Get the request object
     :return: A render function, not a dictionary
-    :doc-author: Trelent
     """
-    culture_news = []
-    base_url = "https://suspilne.media/culture/"
-
-    try:
-        response = requests.get(base_url)
-        response.raise_for_status()
-    except requests.exceptions.RequestException as e:
+    culture_news_page = get_news_page(request, NewsArticle.CULTURE)
+    if culture_news_page is None:
         return render(
-            request,
-            "app_news/error.html",
-            {"message": "Could not get response from server."},
+            request, "app_news/error.html", {"message": "Новини культури недоступні."}
         )
 
-    soup = BeautifulSoup(response.text, "html.parser")
+    return render(request, "app_news/culture_news.html", {"culture_news": culture_news_page})
 
-    news_containers = soup.find_all("div", class_=["c-article-card__content"])
 
-    for container in news_containers:
-        result = {}
-        time_tag = container.find("time")
-        title_tag = container.find("h3", class_="c-article-card__headline-inner")
-        url_tag = container.find("a", class_="c-article-card__headline")
+async def latest_articles(limit):
+    """
+    Return the latest articles of every section, read in one query.
 
-        if time_tag and title_tag and url_tag:
-            original_datetime_str = time_tag.get("datetime", "")
-            hours_offset = int(original_datetime_str[-6:-3])
-            original_datetime = datetime.fromisoformat(
-                original_datetime_str.replace("T", " ").split("+")[0]
-            )
-            original_datetime = original_datetime + timedelta(hours=hours_offset)
-            new_datetime_str = original_datetime.strftime("%Y-%m-%d %H:%M")
+    Args:
+    limit (int): The number of articles per section.
 
-            result["time"] = new_datetime_str
-            result["culture"] = ("Culture")
-            result["url"] = url_tag.get("href", "")
-            result["news"] = title_tag.text.strip()
+    Returns:
+    dict: The lists of articles by section, newest first.
+    """
+    articles = (
+        NewsArticle.objects.annotate(
+            rank=Window(RowNumber(), partition_by="section", order_by=("-published_at", "-id"))
+        )
+        .filter(rank__lte=limit)
+        .only("section", "title", "url", "published_at")
+        .order_by("section", "rank")
+    )
+    by_section = defaultdict(list)
+    async for article in articles:
+        by_section[article.section].append(article)
+    return by_section
 
-            culture_news.append(result)
 
-    if not culture_news:
-        return render(
-            request, "app_news/error.html", {"message": "Новини культури недоступні."}
-        )
+async def news_feed(request):
+    """
+    The news_feed function shows the latest articles of all sections on one page.
 
-    paginator = Paginator(culture_news, 5)
-    page_number = request.GET.get("page")
-    try:
-        culture_news_page = paginator.page(page_number)
-    except PageNotAnInteger:
-        culture_news_page = paginator.page(1)
-    except EmptyPage:
-        culture_news_page = paginator.page(paginator.num_pages)
+    The articles of all sections are read in a single query, which the event loop
+    awaits without blocking; a section without articles is left out.
 
-    return render(request, "app_news/culture_news.html", {"culture_news": culture_news_page})
+    :param request: Get the request object
+    :return: A render function
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    by_section = await latest_articles(5)
+    feed = [(label, by_section[section]) for section, label in NewsArticle.SECTIONS if by_section[section]]
+    if not feed:
+        return await sync_to_async(render)(
+            request, "app_news/error.html", {"message": "Новини недоступні."}
+        )
+
+    # The base template reads request.user, which may only be loaded synchronously.
+    return await sync_to_async(render)(request, "app_news/news_feed.html", {"feed": feed})
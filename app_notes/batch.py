@@ -0,0 +1,73 @@
+"""
+Batch operations on notes.
+
+Every operation touches all the selected notes of a user with a fixed number of
+queries inside one transaction: an UPDATE for done/undone, a cascading DELETE, and
+bulk DELETE/INSERT statements on the note-tag table for the tag operations.
+"""
+from django.db import transaction
+
+from app_connective.cache import bump_version
+from .models import Note, Tag
+
+ACTIONS = ("done", "undone", "delete", "tag", "untag", "retag")
+MAX_BATCH_SIZE = 1000
+
+
+class BatchError(ValueError):
+    pass
+
+
+def apply_batch(user, action, note_ids, tag_names=()):
+    """
+    Apply an action to many notes of a user at once.
+
+    Args:
+    user (User): The owner of the notes. Notes of other users are ignored.
+    action (str): "done", "undone", "delete", "tag" (add the tags), "untag" (remove the tags)
+    or "retag" (replace the tags of the notes with the given ones).
+    note_ids (list): IDs of the notes.
+    tag_names (list, optional): Names of the user's tags for the tag actions.
+
+    Returns:
+    int: The number of notes the action was applied to.
+
+    Raises:
+    BatchError: If the action, the number of notes or a tag name is not valid.
+    """
+    if action not in ACTIONS:
+        raise BatchError(f"Unknown action: {action}")
+    if len(note_ids) > MAX_BATCH_SIZE:
+        raise BatchError(f"At most {MAX_BATCH_SIZE} notes can be changed at once.")
+
+    tags = []
+    if action in ("tag", "untag", "retag"):
+        tags = list(Tag.objects.filter(user=user, name__in=tag_names).only("id", "name"))
+        unknown = set(tag_names) - {tag.name for tag in tags}
+        if unknown:
+            raise BatchError(f"Unknown tags: {', '.join(sorted(unknown))}")
+
+    notes = Note.objects.filter(user=user, pk__in=note_ids)
+    with transaction.atomic():
+        # The updates and the note-tag statements bypass the signals.
+        bump_version(user.pk, Note)
+        if action == "done":
+            return notes.update(is_done=True)
+        if action == "undone":
+            return notes.update(is_done=False)
+        if action == "delete":
+            _, deleted = notes.delete()
+            return deleted.get(Note._meta.label, 0)
+
+        ids = list(notes.values_list("pk", flat=True))
+        note_tags = Note.tag.through.objects.filter(note_id__in=ids)
+        if action == "untag":
+            note_tags.filter(tag__in=tags).delete()
+        elif action == "retag":
+            note_tags.exclude(tag__in=tags).delete()
+        if action in ("tag", "retag"):
+            Note.tag.through.objects.bulk_create(
+                [Note.tag.through(note_id=note_id, tag_id=tag.pk) for note_id in ids for tag in tags],
+                ignore_conflicts=True,
+            )
+        return len(ids)
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+from app_connective.db_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("app_notes", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="note",
+            index=models.Index(
+                fields=["user", "created_at", "id"], name="note_user_created_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tag",
+            index=models.Index(fields=["user", "name"], name="tag_user_name_idx"),
+        ),
+    ]
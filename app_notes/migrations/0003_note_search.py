@@ -0,0 +1,72 @@
+# Generated by Django 5.0.14 on 2026-10-18 11:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+from app_connective.db_operations import AddIndexConcurrently, postgres_only, sqlite_only
+
+CREATE_FTS = [
+    "CREATE VIRTUAL TABLE app_notes_note_fts USING fts5("
+    "title, body, content='app_notes_note', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER app_notes_note_fts_insert AFTER INSERT ON app_notes_note BEGIN "
+    "INSERT INTO app_notes_note_fts (rowid, title, body) VALUES (new.id, new.title, new.body); "
+    "END",
+    "CREATE TRIGGER app_notes_note_fts_delete AFTER DELETE ON app_notes_note BEGIN "
+    "INSERT INTO app_notes_note_fts (app_notes_note_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    "END",
+    "CREATE TRIGGER app_notes_note_fts_update AFTER UPDATE OF title, body ON app_notes_note BEGIN "
+    "INSERT INTO app_notes_note_fts (app_notes_note_fts, rowid, title, body) "
+    "VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO app_notes_note_fts (rowid, title, body) VALUES (new.id, new.title, new.body); "
+    "END",
+    "INSERT INTO app_notes_note_fts (app_notes_note_fts) VALUES ('rebuild')",
+]
+
+DROP_FTS = [
+    "DROP TRIGGER IF EXISTS app_notes_note_fts_update",
+    "DROP TRIGGER IF EXISTS app_notes_note_fts_delete",
+    "DROP TRIGGER IF EXISTS app_notes_note_fts_insert",
+    "DROP TABLE IF EXISTS app_notes_note_fts",
+]
+
+
+def backfill_search_vectors(apps, schema_editor):
+    from app_notes.search import update_search_vectors
+
+    Note = apps.get_model("app_notes", "Note")
+    update_search_vectors(Note.objects.all())
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("app_notes", "0002_user_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="note",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(
+            backfill_search_vectors, migrations.RunPython.noop, atomic=True
+        ),
+        postgres_only(
+            AddIndexConcurrently(
+                model_name="note",
+                index=django.contrib.postgres.indexes.GinIndex(
+                    fields=["search_vector"], name="note_search_vector_idx"
+                ),
+            )
+        ),
+        sqlite_only(migrations.RunSQL(CREATE_FTS, DROP_FTS)),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 """
 Basic models for notes and tags
@@ -13,6 +15,11 @@ class Tag(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "name"], name="tag_user_name_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -24,10 +31,17 @@ class Note(models.Model):
     is_done = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True, null=True)
     updated_at = models.DateTimeField(auto_now=True, null=True)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     tag = models.ManyToManyField(Tag)
     objects = models.Manager()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at", "id"], name="note_user_created_idx"),
+            GinIndex(fields=["search_vector"], name="note_search_vector_idx"),
+        ]
+
     def __str__(self):
         return self.title
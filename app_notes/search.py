@@ -0,0 +1,135 @@
+"""
+Note search.
+
+On PostgreSQL every note keeps a ``search_vector`` over its title and body, kept up to
+date by the signals in ``app_notes.signals`` and matched through a GIN index. On SQLite
+the same search runs against ``app_notes_note_fts``, an FTS5 table over the notes kept
+in sync by triggers (see migration 0003). Note that migrations which make SQLite
+rebuild the notes table drop those triggers, so they have to create them again.
+
+A search combines the text, tags the notes must all have and their done state in one
+query, ranks the matches and counts the tags of all matching notes as facets. Filtering
+by tags alone, like the tag filter of the notes page, can take the notes with any of
+the tags instead.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import Note, Tag
+
+SEARCH_CONFIG = "simple"
+WORD_RE = re.compile(r"\w+")
+
+
+def search_vector():
+    return SearchVector("title", weight="A", config=SEARCH_CONFIG) + SearchVector(
+        "body", weight="B", config=SEARCH_CONFIG
+    )
+
+
+def update_search_vectors(notes):
+    """
+    Recompute the search vector of the given notes in a single UPDATE.
+
+    Args:
+    notes (QuerySet): The notes to update.
+    """
+    if connection.vendor == "postgresql":
+        notes.update(search_vector=search_vector())
+
+
+def text_filter(query):
+    """
+    Build the filter and rank expression of a text query.
+
+    Every word of the query has to match the prefix of a word of the note.
+
+    Args:
+    query (str): The search text.
+
+    Returns:
+    tuple: (Q, rank expression), or (None, None) for a query without words.
+    """
+    words = WORD_RE.findall(query)
+    if not words:
+        return None, None
+    if connection.vendor == "postgresql":
+        text_query = SearchQuery(" & ".join(f"{word}:*" for word in words), search_type="raw", config=SEARCH_CONFIG)
+        # ts_rank() is a real; as a double precision it survives the round trip through page cursors.
+        return Q(search_vector=text_query), Cast(SearchRank(F("search_vector"), text_query), FloatField())
+
+    match = " ".join(f'"{word}"*' for word in words)
+    matches = RawSQL("SELECT rowid FROM app_notes_note_fts WHERE app_notes_note_fts MATCH %s", (match,))
+    # bm25() is lower for better matches.
+    rank = RawSQL(
+        "SELECT -bm25(app_notes_note_fts, 2.0, 1.0) FROM app_notes_note_fts "
+        "WHERE app_notes_note_fts MATCH %s AND rowid = app_notes_note.id",
+        (match,),
+        output_field=FloatField(),
+    )
+    return Q(pk__in=matches), rank
+
+
+def search_notes(user, query="", tags=(), done=None, any_tag=False):
+    """
+    Find the user's notes matching a text query, tags and done state.
+
+    Args:
+    user (User): The owner of the notes.
+    query (str, optional): The search text. Without words every note matches.
+    tags (list, optional): Names of tags the notes must all have.
+    done (bool, optional): Only done notes for True, only open ones for False, any for None.
+    any_tag (bool, optional): Whether the notes need only one of the tags instead, so
+    no note matches without tags.
+
+    Returns:
+    QuerySet: The matching notes, best matches first, then newest first.
+    """
+    notes = Note.objects.filter(user=user)
+    if done is not None:
+        notes = notes.filter(is_done=done)
+
+    tags = sorted(set(tags))
+    if any_tag:
+        notes = notes.filter(pk__in=Note.tag.through.objects.filter(tag__user=user, tag__name__in=tags).values("note_id"))
+    elif tags:
+        tagged = (
+            Note.tag.through.objects.filter(tag__user=user, tag__name__in=tags)
+            .values("note_id")
+            .annotate(matched=Count("tag_id"))
+            .filter(matched=len(tags))
+            .values("note_id")
+        )
+        notes = notes.filter(pk__in=tagged)
+
+    condition, rank = text_filter(query)
+    if condition is None:
+        return notes.order_by("-created_at", "-id")
+    return notes.filter(condition).annotate(rank=rank).order_by("-rank", "-created_at", "-id")
+
+
+def tag_facets(user, notes):
+    """
+    Count the matching notes of each of the user's tags.
+
+    Args:
+    user (User): The owner of the tags.
+    notes (QuerySet): The matching notes, as returned by ``search_notes``.
+
+    Returns:
+    list: (tag name, number of matching notes) pairs, most used first, including tags
+    without matches.
+    """
+    matching = notes.order_by().values("pk")
+    facets = (
+        Tag.objects.filter(user=user)
+        .annotate(count=Count("note", filter=Q(note__in=matching)))
+        .order_by("-count", "name")
+        .values_list("name", "count")
+    )
+    return list(facets)
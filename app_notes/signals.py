@@ -0,0 +1,31 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from app_connective.cache import bump_version
+from .models import Note, Tag
+from .search import update_search_vectors
+
+
+@receiver(post_save, sender=Note)
+def note_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {"title", "body"} & set(update_fields):
+        update_search_vectors(Note.objects.filter(pk=instance.pk))
+    bump_version(instance.user_id, Note)
+
+
+@receiver(post_delete, sender=Note)
+def note_deleted(sender, instance, **kwargs):
+    bump_version(instance.user_id, Note)
+
+
+@receiver(m2m_changed, sender=Note.tag.through)
+def note_tags_changed(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        # Either side of the relation can be changed; both belong to the same user.
+        bump_version(instance.user_id, Note)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    bump_version(instance.user_id, Tag)
@@ -1,3 +1,210 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from app_connective.testing import ConstantQueriesMixin
+
+from .batch import MAX_BATCH_SIZE, BatchError, apply_batch
+from .models import Note, Tag
+
+
+class NoteQueryCountTests(ConstantQueriesMixin, TestCase):
+    """
+    The notes pages load the tags of all listed notes at once, so their number of
+    queries does not grow with the notes and tags of the user.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="notes", password="password")
+        self.client.force_login(self.user)
+        self.created = 0
+
+    def create_rows(self, count):
+        # Every batch of notes shares up to three new tags.
+        tags = [Tag.objects.create(user=self.user, name=f"tag{self.created}-{n}") for n in range(min(count, 3))]
+        for _ in range(count):
+            note = Note.objects.create(user=self.user, title=f"note {self.created}", body="note body")
+            note.tag.add(*tags)
+            self.created += 1
+
+    def test_notes_list(self):
+        response = self.assertConstantQueries(reverse("app_notes:notes"))
+        self.assertContains(response, "tag2-2")
+
+    def test_search(self):
+        response = self.assertConstantQueries(reverse("app_notes:search"), {"query": "note", "state": "undone"})
+        self.assertContains(response, "tag2-2")
+
+    def test_tag_filter(self):
+        self.assertConstantQueries(reverse("app_notes:sort"), {"selected_tags": "tag0-0"})
+
+
+class NoteSearchTests(TestCase):
+    """
+    The text search, tag and state filters, facets and pages of the note search.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="notes", password="password")
+        self.client.force_login(self.user)
+        self.tags = {name: Tag.objects.create(user=self.user, name=name) for name in ("work", "home", "urgent")}
+
+    def note(self, title, body="", tags=(), is_done=False, user=None):
+        note = Note.objects.create(user=user or self.user, title=title, body=body, is_done=is_done)
+        note.tag.add(*(self.tags[name] for name in tags))
+        return note
+
+    def search(self, url="app_notes:search", **params):
+        response = self.client.get(reverse(url), params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def titles(self, response):
+        return [note.title for note in response.context["notes"]]
+
+    def test_text_tags_and_state(self):
+        self.note("Quarterly report", tags=["work", "urgent"])
+        self.note("Report draft", tags=["work"])
+        self.note("Old report", tags=["work", "urgent"], is_done=True)
+        self.note("Groceries", body="milk, bread", tags=["home", "urgent"])
+        other = User.objects.create_user(username="other", password="password")
+        self.note("Report of another user", user=other)
+
+        response = self.search(query="repo", tags=["work", "urgent"], state="undone")
+        self.assertEqual(self.titles(response), ["Quarterly report"])
+        self.assertEqual(self.titles(self.search(query="repo", tags=["work"], state="done")), ["Old report"])
+        self.assertEqual(self.titles(self.search(query="bread milk")), ["Groceries"])
+        self.assertEqual(self.titles(self.search(query="report bread")), [])
+
+    def test_title_matches_rank_first(self):
+        self.note("Shopping", body="plan the trip")
+        self.note("Trip plan")
+        self.assertEqual(self.titles(self.search(query="trip")), ["Trip plan", "Shopping"])
+
+    def test_edited_and_deleted_notes(self):
+        note = self.note("Meeting notes")
+        note.title = "Call notes"
+        note.save()
+        self.assertEqual(self.titles(self.search(query="meeting")), [])
+        self.assertEqual(self.titles(self.search(query="call")), ["Call notes"])
+
+        note.delete()
+        self.assertEqual(self.titles(self.search(query="call")), [])
+
+    def test_facets(self):
+        self.note("Report", tags=["work", "urgent"])
+        self.note("Report draft", tags=["work"])
+        self.note("Groceries", tags=["home"])
+
+        response = self.search(query="report", tags=["work"])
+        facets = {facet["name"]: facet for facet in response.context["facets"]}
+        self.assertEqual({name: facet["count"] for name, facet in facets.items()}, {"work": 2, "urgent": 1, "home": 0})
+        self.assertTrue(facets["work"]["selected"])
+        self.assertFalse(facets["urgent"]["selected"])
+
+        # A facet adds its tag to the search, a selected one removes it.
+        self.assertEqual(self.titles(self.client.get(facets["urgent"]["url"])), ["Report"])
+        self.assertEqual(sorted(self.titles(self.client.get(facets["work"]["url"]))), ["Report", "Report draft"])
+
+    def test_pages(self):
+        for n in range(15):
+            self.note(f"Report {n}")
+
+        first = self.search(query="report")
+        self.assertEqual(len(self.titles(first)), 12)
+        second = self.client.get(f"{reverse('app_notes:search')}{first.context['notes'].next_url}")
+        self.assertEqual(len(self.titles(second)), 3)
+        self.assertEqual(set(self.titles(first)) | set(self.titles(second)), {f"Report {n}" for n in range(15)})
+
+    def test_tag_filter_takes_notes_with_any_of_the_tags(self):
+        self.note("Report", tags=["work"])
+        self.note("Groceries", tags=["home"])
+        self.note("Holiday")
+
+        response = self.search("app_notes:sort", selected_tags=["work", "home"])
+        self.assertEqual(sorted(self.titles(response)), ["Groceries", "Report"])
+        self.assertEqual(self.titles(self.search("app_notes:sort", selected_tags="")), [])
+        facets = {facet["name"]: facet["url"] for facet in response.context["facets"]}
+        self.assertTrue(facets["urgent"].startswith(f"{reverse('app_notes:sort')}?"))
+
+
+class NoteBatchTests(TestCase):
+    """
+    Batch actions change only the notes of the requesting user.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="notes", password="password")
+        self.client.force_login(self.user)
+        self.tags = {name: Tag.objects.create(user=self.user, name=name) for name in ("work", "home", "urgent")}
+        self.notes = [Note.objects.create(user=self.user, title=f"note {n}") for n in range(3)]
+        self.other = User.objects.create_user(username="other", password="password")
+        self.other_note = Note.objects.create(user=self.other, title="other note")
+        Tag.objects.create(user=self.other, name="private")
+
+    def batch(self, action, notes, tags=()):
+        return self.client.post(
+            reverse("app_notes:batch"), {"action": action, "notes": [note.pk for note in notes], "tags": list(tags)}
+        )
+
+    def tag_names(self, note):
+        return sorted(note.tag.values_list("name", flat=True))
+
+    def test_done_undone_and_delete(self):
+        response = self.batch("done", self.notes[:2] + [self.other_note])
+        self.assertEqual(response.json(), {"action": "done", "count": 2})
+        self.assertEqual(list(Note.objects.filter(is_done=True)), self.notes[:2])
+
+        self.assertEqual(self.batch("undone", self.notes).json()["count"], 3)
+        self.assertFalse(Note.objects.filter(is_done=True).exists())
+
+        self.assertEqual(self.batch("delete", [self.notes[0], self.other_note]).json()["count"], 1)
+        self.assertEqual(list(Note.objects.order_by("pk")), self.notes[1:] + [self.other_note])
+
+    def test_tag_actions(self):
+        self.assertEqual(self.batch("tag", self.notes + [self.other_note], ["work", "home"]).json()["count"], 3)
+        self.assertEqual(self.tag_names(self.notes[0]), ["home", "work"])
+        self.assertEqual(self.tag_names(self.other_note), [])
+        # Tagging again keeps the existing links.
+        self.assertEqual(self.batch("tag", self.notes, ["work"]).json()["count"], 3)
+
+        self.batch("untag", self.notes[:1], ["home"])
+        self.assertEqual(self.tag_names(self.notes[0]), ["work"])
+        self.assertEqual(self.tag_names(self.notes[1]), ["home", "work"])
+
+    def test_retag_changes_only_the_differences(self):
+        for note in self.notes:
+            note.tag.add(self.tags["work"], self.tags["home"])
+        kept = set(Note.tag.through.objects.filter(tag=self.tags["work"]).values_list("pk", flat=True))
+
+        # The session, the user, the tags, the note IDs, one DELETE and one INSERT, and the savepoint.
+        with self.assertNumQueries(8):
+            self.batch("retag", self.notes, ["work", "urgent"])
+        for note in self.notes:
+            self.assertEqual(self.tag_names(note), ["urgent", "work"])
+        self.assertEqual(set(Note.tag.through.objects.filter(tag=self.tags["work"]).values_list("pk", flat=True)), kept)
+
+        self.batch("retag", self.notes[:1], [])
+        self.assertEqual(self.tag_names(self.notes[0]), [])
+
+    def test_invalid_batches(self):
+        for action, tags, error in (
+            ("archive", (), "Unknown action: archive"),
+            ("tag", ["work", "private", "missing"], "Unknown tags: missing, private"),
+        ):
+            with self.subTest(action=action):
+                response = self.batch(action, self.notes, tags)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["error"], error)
+        self.assertFalse(Note.tag.through.objects.exists())
+
+        response = self.client.post(reverse("app_notes:batch"), {"action": "done", "notes": ["1", "x"]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_size(self):
+        note_ids = [note.pk for note in self.notes] + list(range(10**6, 10**6 + MAX_BATCH_SIZE - 3))
+        self.assertEqual(apply_batch(self.user, "done", note_ids), 3)
+
+        with self.assertRaises(BatchError):
+            apply_batch(self.user, "undone", note_ids + [0])
+        self.assertEqual(Note.objects.filter(user=self.user, is_done=True).count(), 3)
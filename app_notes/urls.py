@@ -11,6 +11,7 @@ urlpatterns = [
     path("detail/<int:note_id>", views.detail, name="detail"),
     path("done/<int:note_id>", views.set_done, name="set_done"),
     path("delete/<int:note_id>", views.delete_note, name="delete"),
+    path("batch/", views.batch, name="batch"),
     path('edit/<int:note_id>', views.edit_note, name='edit_note'),
     path('search/', views.search, name='search'),
     path('sort/', views.sort, name='sort'),
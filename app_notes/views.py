@@ -1,18 +1,81 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
+from django.db.models import Prefetch
+from django.http import JsonResponse, QueryDict
+from django.views.decorators.http import require_POST
 
+from app_connective.cache import bump_version, cached_page
+from app_connective.pagination import paginate
+from .batch import BatchError, apply_batch
 from .forms import TagForm, NoteForm
 from .models import Tag, Note
+from .search import search_notes, tag_facets
+
+
+def with_tags(notes):
+    """
+    Load the tags of notes in one extra query.
+
+    Args:
+    notes (QuerySet): The notes.
+
+    Returns:
+    QuerySet: The notes, ready for the ``tag_filter`` template filter.
+    """
+    return notes.prefetch_related(Prefetch("tag", queryset=Tag.objects.only("id", "name").order_by("name")))
+
+
+def user_notes(user):
+    return with_tags(Note.objects.filter(user=user))
+
+
+def search_results(request, tags, any_tag=False):
+    """
+    Render a page of the notes matching the ``query`` and ``state`` GET parameters and
+    the given tags, all of them or with ``any_tag`` one of them, with the counts of every
+    tag among the matches.
+    """
+    query = request.GET.get("query", "")
+    state = request.GET.get("state", "")
+    tags = sorted({name for name in tags if name})
+    notes = search_notes(request.user, query, tags, {"done": True, "undone": False}.get(state), any_tag)
+
+    # The search form and the facets stay on the page they are shown on.
+    if any_tag:
+        search_url, tags_param = reverse("app_notes:sort"), "selected_tags"
+    else:
+        search_url, tags_param = reverse("app_notes:search"), "tags"
+    facets = []
+    for name, count in tag_facets(request.user, notes):
+        params = QueryDict(mutable=True)
+        params.update({"query": query, "state": state})
+        params.setlist(tags_param, [tag for tag in tags if tag != name] + ([] if name in tags else [name]))
+        facets.append({"name": name, "count": count, "selected": name in tags, "url": f"{search_url}?{params.urlencode()}"})
+
+    return render(
+        request,
+        "app_notes/search_results.html",
+        {
+            "notes": paginate(request, with_tags(notes), per_page=12),
+            "query": query,
+            "state": state,
+            "selected_tags": tags,
+            "search_url": search_url,
+            "tags_param": tags_param,
+            "facets": facets,
+        },
+    )
 
 
 @login_required
+@cached_page("notes", Note, Tag)
 def main(request):
     """
     Display the main page with a list of notes and tags.
 
-    This function retrieves all notes and tags associated with the current user and renders
-    the main page with the list of notes and tags.
+    This function retrieves a page of the current user's notes, newest first, and all
+    of their tags and renders the main page with them.
 
     Args:
     request (HttpRequest): The request object.
@@ -20,16 +83,8 @@ def main(request):
     Returns:
     HttpResponse: Rendered main page with notes and tags.
     """
-    notes = (
-        Note.objects.filter(user=request.user).all()
-        if request.user.is_authenticated
-        else []
-    )
-    tags = (
-        Tag.objects.filter(user=request.user).all()
-        if request.user.is_authenticated
-        else []
-    )
+    notes = paginate(request, user_notes(request.user), ("-created_at", "-id"), per_page=12)
+    tags = Tag.objects.filter(user=request.user).all()
     return render(request, "app_notes/notes.html", {"notes": notes, "tags": tags})
 
 
@@ -77,11 +132,9 @@ def note(request):
             new_note = form.save(commit=False)
             new_note.user = request.user
             new_note.save()
-            choice_tags = Tag.objects.filter(
-                name__in=request.POST.getlist("tags"), user=request.user
+            new_note.tag.set(
+                Tag.objects.filter(name__in=request.POST.getlist("tags"), user=request.user)
             )
-            for tag_ in choice_tags.iterator():
-                new_note.tag.add(tag_)
 
             return redirect(to="app_notes:notes")
         else:
@@ -102,7 +155,7 @@ def detail(request, note_id):
     Returns:
     HttpResponse: Rendered detail page for the specified note.
     """
-    note = get_object_or_404(Note, pk=note_id, user=request.user)
+    note = get_object_or_404(user_notes(request.user), pk=note_id)
     return render(request, "app_notes/detail.html", {"note": note})
 
 
@@ -118,7 +171,8 @@ def set_done(request, note_id):
     Returns:
     HttpResponseRedirect: Redirects to the notes page after marking the note as done.
     """
-    Note.objects.filter(pk=note_id, user=request.user).update(is_done=True)
+    if Note.objects.filter(pk=note_id, user=request.user).update(is_done=True):
+        bump_version(request.user.pk, Note)
     return redirect(to="app_notes:notes")
 
 
@@ -139,10 +193,42 @@ def delete_note(request, note_id):
 
 
 @login_required
+@require_POST
+def batch(request):
+    """
+    Mark done or undone, delete, or change the tags of many notes in one transaction.
+
+    The POST data holds the ``action`` (see ``app_notes.batch.apply_batch``), the ``notes``
+    IDs and, for the tag actions, the ``tags`` names, each repeated as needed.
+
+    Args:
+    request (HttpRequest): The request object.
+
+    Returns:
+    JsonResponse: The action and the number of notes it changed, or the error with status 400.
+    """
+    try:
+        note_ids = [int(note_id) for note_id in request.POST.getlist("notes")]
+    except ValueError:
+        return JsonResponse({"error": "Note IDs must be integers."}, status=400)
+    try:
+        count = apply_batch(
+            request.user, request.POST.get("action"), note_ids, request.POST.getlist("tags")
+        )
+    except BatchError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return JsonResponse({"action": request.POST["action"], "count": count})
+
+
+@login_required
+@cached_page("notes:search", Note, Tag)
 def search(request):
     """
     Search for notes.
 
+    The ``query`` text is combined with the ``tags`` the notes must all have and the
+    ``state`` ("done" or "undone") in one ranked query, see ``app_notes.search``.
+
     Args:
     request (HttpRequest): The request object.
 
@@ -150,12 +236,7 @@ def search(request):
     HttpResponse: Rendered search results page with matching notes.
     """
     if "query" in request.GET:
-        query = request.GET["query"]
-        notes = Note.objects.filter(
-            Q(title__icontains=query) | Q(body__icontains=query), user=request.user
-        )
-        # search_notes = pagination(request, notes)
-        return render(request, "app_notes/search_results.html", {"notes": notes})
+        return search_results(request, request.GET.getlist("tags"))
     else:
         return redirect(to="app_notes:notes")
 
@@ -181,12 +262,10 @@ def edit_note(request, note_id):
             edited_note = form.save(commit=False)
             edited_note.user = request.user
             edited_note.save()
-            edited_note.tag.clear()
-            choice_tags = Tag.objects.filter(
-                name__in=request.POST.getlist("tags"), user=request.user
+            # set() only deletes the removed tags and inserts the added ones.
+            edited_note.tag.set(
+                Tag.objects.filter(name__in=request.POST.getlist("tags"), user=request.user)
             )
-            for tag_ in choice_tags.iterator():
-                edited_note.tag.add(tag_)
 
             return redirect(to="app_notes:notes")
         else:
@@ -213,10 +292,14 @@ def edit_note(request, note_id):
 
 
 @login_required
+@cached_page("notes:sort", Note, Tag)
 def sort(request):
     """
     Sort notes by selected tags.
 
+    Shows the notes with any of the ``selected_tags``, unlike the search, which takes
+    the notes with all of its tags.
+
     Args:
     request (HttpRequest): The request object.
 
@@ -224,15 +307,7 @@ def sort(request):
     HttpResponse: Rendered search results page with sorted notes.
     """
     if request.method == "GET":
-        selected_tags = request.GET.getlist("selected_tags")
-        notes = Note.objects.filter(
-            tag__name__in=selected_tags, user=request.user
-        ).distinct()
-        return render(
-            request,
-            "app_notes/search_results.html",
-            {"notes": notes, "selected_tags": selected_tags},
-        )
+        return search_results(request, request.GET.getlist("selected_tags"), any_tag=True)
     else:
         return redirect(to="app_notes:notes")
 
@@ -1,6 +1,8 @@
 from django.urls import path
 from django.contrib.auth.views import LoginView, LogoutView
 
+from app_connective.cache import rate_limit
+
 from . import views
 from .forms import LoginForm
 
@@ -9,12 +11,14 @@ app_name = "users"
 urlpatterns = [
     path(
         "signup/",
-        views.RegisterView.as_view(),
+        rate_limit("signup", limit=5, period=60)(views.RegisterView.as_view()),
         name="signup",
     ),
     path(
         "signin/",
-        LoginView.as_view(template_name="users/signin.html", form_class=LoginForm),
+        rate_limit("signin", limit=10, period=60)(
+            LoginView.as_view(template_name="users/signin.html", form_class=LoginForm)
+        ),
         name="signin",
     ),
     path(